@@ -2,10 +2,18 @@ from django.utils.translation import gettext_lazy as _
 from django.contrib import admin
 from django.contrib.auth.admin import UserAdmin as BaseUserAdmin
 from apps.accounts.models import User
+from apps.accounts.services import reset_deposits
+from apps.core.admin import LargeTableAdminMixin
+from apps.products.services import delete_seller
 
 
 @admin.register(User)
-class UserAdmin(BaseUserAdmin):
+class UserAdmin(LargeTableAdminMixin, BaseUserAdmin):
+    list_display = ("username", "email", "role", "deposit", "is_staff")
+    list_filter = ("role", "is_staff", "is_superuser", "is_active")
+    # Exact and prefix lookups only, so searches can use the indexes
+    search_fields = ("=id", "^username", "=email")
+    actions = ["reset_selected_deposits", "delete_selected_sellers"]
 
     fieldsets = (
         (None, {"fields": ("username", "password")}),
@@ -36,3 +44,18 @@ class UserAdmin(BaseUserAdmin):
             },
         ),
     )
+
+    @admin.action(description=_("Reset deposits of selected users"))
+    def reset_selected_deposits(self, request, queryset):
+        updated = reset_deposits(queryset=queryset)
+        self.message_user(request, f"Reset {updated} deposits.")
+
+    @admin.action(description=_("Delete selected sellers in the background"))
+    def delete_selected_sellers(self, request, queryset):
+        deletions = [delete_seller(seller=seller)
+                     for seller in queryset.filter(is_active=True)]
+        self.message_user(
+            request,
+            f"Deactivated {len(deletions)} sellers; their "
+            f"{sum(d.total for d in deletions)} products are being deleted."
+        )
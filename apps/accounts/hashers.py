@@ -0,0 +1,109 @@
+import base64
+import hashlib
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from concurrent.futures.process import BrokenProcessPool
+
+from django.conf import settings
+from django.contrib.auth.hashers import PBKDF2PasswordHasher
+from django.utils.encoding import force_bytes
+from rest_framework import status
+from rest_framework.exceptions import APIException
+
+
+class PasswordHashingBusy(APIException):
+    status_code = status.HTTP_503_SERVICE_UNAVAILABLE
+    default_detail = "Too many logins right now. Please try again shortly."
+    default_code = "password_hashing_busy"
+
+
+class HashingPool:
+    """
+    Process pool for password hashing, so a burst of logins costs CPU in
+    the pool instead of stalling the worker's request threads. At most ``max_pending`` hashes are queued or running; callers
+    that can't get a slot, or whose hash takes longer than ``timeout``
+    seconds, get ``PasswordHashingBusy``.
+    """
+
+    def __init__(self, *, workers: int, max_pending: int, timeout: float):
+        self.workers = workers
+        self.timeout = timeout
+        self._slots = threading.BoundedSemaphore(max_pending)
+        self._lock = threading.Lock()
+        self._executor = None
+        self._pid = None
+
+    def executor(self) -> ProcessPoolExecutor:
+        with self._lock:
+            if self._pid != os.getpid():
+                # Forking a threaded server is unsafe, so the pool's
+                # processes come from a clean fork server.
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.workers,
+                    mp_context=multiprocessing.get_context("forkserver")
+                )
+                self._pid = os.getpid()
+            return self._executor
+
+    def _reset(self):
+        with self._lock:
+            self._pid = None
+
+    def _submit(self, func, *args):
+        try:
+            future = self.executor().submit(func, *args)
+        except BrokenProcessPool:
+            self._reset()
+            self._slots.release()
+            raise PasswordHashingBusy()
+        future.add_done_callback(lambda _: self._slots.release())
+        return future
+
+    def run(self, func, *args):
+        if not self.workers:
+            return func(*args)
+        if not self._slots.acquire(timeout=self.timeout):
+            raise PasswordHashingBusy()
+        future = self._submit(func, *args)
+        try:
+            return future.result(timeout=self.timeout)
+        except BrokenProcessPool:
+            self._reset()
+            raise PasswordHashingBusy()
+        except FutureTimeoutError:
+            raise PasswordHashingBusy()
+
+_pool = None
+
+
+def get_pool() -> HashingPool:
+    global _pool
+    if _pool is None:
+        config = settings.PASSWORD_HASHING
+        _pool = HashingPool(
+            workers=config["workers"],
+            max_pending=config["max_pending"],
+            timeout=config["timeout"],
+        )
+    return _pool
+
+
+class PooledPBKDF2PasswordHasher(PBKDF2PasswordHasher):
+    """
+    Django's PBKDF2 hasher with the key derivation run in the hashing pool.
+    The algorithm name and encoding are unchanged, so existing hashes keep
+    working and this can be swapped in and out freely.
+    """
+
+    def encode(self, password, salt, iterations=None):
+        self._check_encode_args(password, salt)
+        iterations = iterations or self.iterations
+        derived = get_pool().run(
+            hashlib.pbkdf2_hmac, self.digest().name, force_bytes(password),
+            force_bytes(salt), iterations
+        )
+        hash = base64.b64encode(derived).decode("ascii").strip()
+        return "%s$%d$%s$%s" % (self.algorithm, iterations, salt, hash)
@@ -1,10 +1,12 @@
 from django.contrib.auth.models import AbstractUser
 from django.db import models
+from django.utils.translation import gettext_lazy as _
 
 from apps.accounts.choices import UserRole
 
 
 class User(AbstractUser):
+    email = models.EmailField(_("email address"), blank=True, db_index=True)
     role = models.CharField(
         max_length=6, choices=UserRole.choices, default=UserRole.BUYER
     )
@@ -1,12 +1,15 @@
-from datetime import datetime, timedelta, timezone
-from typing import Optional, Tuple
+from datetime import datetime, timezone
+from typing import List, Optional, Tuple
 
 import jwt
 from django.conf import settings
 from django.contrib.auth import authenticate
+from django.db import transaction
+from django.db.models import F, QuerySet
 
 from apps.accounts.choices import UserRole
 from apps.accounts.models import User
+from apps.core.invalidation import invalidate_on_commit
 
 
 def create_user(*,
@@ -36,6 +39,7 @@ def update_user(*, pk, username) -> Tuple[User, dict]:
     except User.DoesNotExist:
         user.username = username
         user.save()
+        invalidate_on_commit(User, [user.pk])
     return user, errors
 
 
@@ -45,6 +49,7 @@ def change_password(*, pk, old_password, new_password) -> Tuple[User, dict]:
     if user.check_password(raw_password=old_password):
         user.password = new_password
         user.save()
+        invalidate_on_commit(User, [user.pk])
     else:  # pragma: no cover
         errors["old_password"] = ["Old password didn't match"]
     return user, errors
@@ -53,16 +58,30 @@ def change_password(*, pk, old_password, new_password) -> Tuple[User, dict]:
 def deposit_amount(*,
                    amount: int,
                    buyer: User) -> Tuple[Optional[dict], dict]:
-    deposit_response, errors = None, {}
+    return deposit_coins(amounts=[amount], buyer=buyer)
+
 
-    error_message = validate_user_deposit(amount=amount)
-    if error_message:
+def deposit_coins(*,
+                  amounts: List[int],
+                  buyer: User) -> Tuple[Optional[dict], dict]:
+    """
+    ``deposit_amount`` for a batch of coins, added with one ``UPDATE``.
+    Nothing is added if any coin is invalid.
+    """
+    deposit_response, errors = None, {}
+    error_messages = [message for amount in amounts
+                      for message in validate_user_deposit(amount=amount)]
+    if error_messages:
         errors = {
-            "amount": error_message
+            "amount": list(dict.fromkeys(error_messages))
         }
     else:
-        buyer.deposit = buyer.deposit + amount
-        buyer.save()
+        with transaction.atomic():
+            User.objects.filter(pk=buyer.pk).update(
+                deposit=F("deposit") + sum(amounts)
+            )
+            buyer.refresh_from_db(fields=["deposit"])
+            invalidate_on_commit(User, [buyer.pk])
         deposit_response = {
             "deposit": buyer.deposit
         }
@@ -79,8 +98,9 @@ def validate_user_deposit(amount: int):
 
 
 def reset_deposit(*, buyer: User) -> dict:
+    User.objects.filter(pk=buyer.pk).update(deposit=0)
     buyer.deposit = 0
-    buyer.save()
+    invalidate_on_commit(User, [buyer.pk])
     reset_deposit_response = {
         "deposit": buyer.deposit
     }
@@ -88,6 +108,13 @@ def reset_deposit(*, buyer: User) -> dict:
     return reset_deposit_response
 
 
+def reset_deposits(*, queryset: QuerySet) -> int:
+    with transaction.atomic():
+        user_ids = list(queryset.values_list("pk", flat=True))
+        invalidate_on_commit(User, user_ids)
+        return User.objects.filter(pk__in=user_ids).update(deposit=0)
+
+
 def obtain_jwt_token(*, username, password) -> Tuple[Optional[dict], dict]:
     login_response, errors = None, {}
     user = authenticate(username=username, password=password)
@@ -110,10 +137,10 @@ def obtain_jwt_token(*, username, password) -> Tuple[Optional[dict], dict]:
 def generate_jwt_token(user: User):
     expires_at = (
         datetime.now(tz=timezone.utc)
-        + timedelta(hours=settings.JWT_EXPIRY_HOURS)
+        + settings.JWT["token_lifetime"]
     )
     payload = {
-        "iss": settings.JWT_ISS,
+        "iss": settings.JWT["iss"],
         "iat": datetime.now(tz=timezone.utc),
         "exp": expires_at,
         "username": user.username,
@@ -121,6 +148,6 @@ def generate_jwt_token(user: User):
     token = jwt.encode(
         payload=payload,
         key=settings.SECRET_KEY,
-        algorithm=settings.JWT_ALGORITHM
+        algorithm=settings.JWT["algorithm"]
     )
     return token, expires_at
@@ -0,0 +1,240 @@
+import asyncio
+import json
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from rest_framework.exceptions import ValidationError
+
+from apps.accounts.choices import UserRole
+from apps.accounts.services import deposit_coins, validate_user_deposit
+from apps.accounts.views import DepositViewsSet
+from apps.core.renderers import FastJSONRenderer
+from apps.products.inventory import get_inventory_client
+from apps.products.streaming import authenticate, wait_for
+
+
+renderer = FastJSONRenderer()
+
+# Marks the end of the coins a machine sent
+END = None
+MAX_LINE = 1024
+INVALID_LINE_ERROR = "Each line must be one JSON object."
+
+
+def parse_coin(line: bytes):
+    """
+    Validates one coin event like ``/deposit`` does. Returns ``(amount,
+    None)`` or ``(None, errors)``.
+    """
+    try:
+        data = json.loads(line)
+    except ValueError:
+        return None, {"details": [INVALID_LINE_ERROR]}
+    try:
+        amount = DepositViewsSet.validate_input(data)["amount"]
+    except ValidationError as exc:
+        return None, exc.detail
+    messages = validate_user_deposit(amount=amount)
+    if messages:
+        return None, {"amount": messages}
+    return amount, None
+
+
+class CoinReader:
+    """
+    Splits the bytes a machine sends into NDJSON lines and queues a parsed
+    coin per line.
+    """
+
+    def __init__(self, coins: asyncio.Queue):
+        self.coins = coins
+        self.buffer = b""
+
+    async def feed(self, data: bytes):
+        *lines, self.buffer = (self.buffer + data).split(b"\n")
+        if len(self.buffer) > MAX_LINE:
+            lines.append(self.buffer)
+            self.buffer = b""
+        for line in lines:
+            await self.put(line)
+
+    async def close(self):
+        await self.put(self.buffer)
+        self.buffer = b""
+        await self.coins.put(END)
+
+    async def put(self, line: bytes):
+        line = line.strip()
+        if not line:
+            return
+        if len(line) > MAX_LINE:
+            await self.coins.put((None, {"details": [INVALID_LINE_ERROR]}))
+        else:
+            await self.coins.put(parse_coin(line))
+
+
+async def next_coin(coins: asyncio.Queue, timeout: float):
+    """
+    Returns the next queued coin, or ``False`` if none came in ``timeout``
+    seconds.
+    """
+    try:
+        return coins.get_nowait()
+    except asyncio.QueueEmpty:
+        pass
+    if timeout <= 0:
+        return False
+    try:
+        return await asyncio.wait_for(coins.get(), timeout)
+    except asyncio.TimeoutError:
+        return False
+
+
+def commit_coins(amounts, buyer):
+    inventory = get_inventory_client()
+    deposit = (inventory.deposit_coins if inventory is not None
+               else deposit_coins)
+    return deposit(amounts=amounts, buyer=buyer)
+
+
+async def acknowledge_coins(coins: asyncio.Queue, buyer, write):
+    """
+    Acknowledges every coin from ``coins``, in order, with ``write(ack)``.
+    Valid coins are committed in batches: a batch takes the coins that
+    arrive within ``COIN_STREAM["window"]`` seconds of its first one, up to
+    ``COIN_STREAM["max_batch"]``, and is cut short by an invalid coin so
+    acknowledgements never overtake each other.
+    """
+    config = settings.COIN_STREAM
+    loop = asyncio.get_running_loop()
+    coin = await coins.get()
+    while coin is not END:
+        amount, errors = coin
+        if errors:
+            await write({"errors": errors})
+            coin = await coins.get()
+            continue
+
+        batch = [amount]
+        deadline = loop.time() + config["window"]
+        while True:
+            coin = await next_coin(coins, deadline - loop.time())
+            if coin is False or coin is END or coin[1] is not None:
+                break
+            batch.append(coin[0])
+            if len(batch) == config["max_batch"]:
+                coin = False
+                break
+
+        result, errors = await sync_to_async(commit_coins)(batch, buyer)
+        if errors:
+            for _ in batch:
+                await write({"errors": errors})
+        else:
+            deposit = result["deposit"] - sum(batch)
+            for amount in batch:
+                deposit += amount
+                await write({"amount": amount, "deposit": deposit})
+        if coin is False:
+            coin = await coins.get()
+
+
+async def authenticate_buyer(scope):
+    user = await authenticate(scope)
+    if user is None or user.role != UserRole.BUYER:
+        return None
+    return user
+
+
+async def stream_http(scope, receive, send):
+    buyer = await authenticate_buyer(scope)
+    if buyer is None:
+        await send({"type": "http.response.start", "status": 403,
+                    "headers": [(b"content-type", b"application/json")]})
+        await send({"type": "http.response.body", "body": renderer.render(
+            {"detail": "A buyer's credentials are required."}
+        )})
+        return
+
+    await send({"type": "http.response.start", "status": 200, "headers": [
+        (b"content-type", b"application/x-ndjson"),
+        (b"cache-control", b"no-cache"),
+        (b"x-accel-buffering", b"no"),
+    ]})
+
+    async def write(ack):
+        await send({"type": "http.response.body",
+                    "body": renderer.render(ack) + b"\n",
+                    "more_body": True})
+
+    async def read():
+        reader = CoinReader(coins)
+        while True:
+            message = await receive()
+            if message["type"] == "http.disconnect":
+                break
+            await reader.feed(message.get("body", b""))
+            if not message.get("more_body"):
+                break
+        await reader.close()
+
+    coins = asyncio.Queue(settings.COIN_STREAM["max_batch"])
+    reading = asyncio.ensure_future(read())
+    try:
+        await acknowledge_coins(coins, buyer, write)
+    finally:
+        reading.cancel()
+    await send({"type": "http.response.body", "body": b""})
+
+
+async def stream_websocket(scope, receive, send):
+    await wait_for(receive, "websocket.connect")
+    buyer = await authenticate_buyer(scope)
+    if buyer is None:
+        await send({"type": "websocket.close", "code": 4403})
+        return
+
+    async def write(ack):
+        await send({"type": "websocket.send",
+                    "text": renderer.render(ack).decode()})
+
+    async def read():
+        reader = CoinReader(coins)
+        while True:
+            message = await receive()
+            if message["type"] == "websocket.disconnect":
+                break
+            data = message.get("bytes") or message.get("text", "").encode()
+            # Every message is complete, even without a trailing newline.
+            await reader.feed(data + b"\n")
+        await reader.close()
+
+    coins = asyncio.Queue(settings.COIN_STREAM["max_batch"])
+    await send({"type": "websocket.accept"})
+    reading = asyncio.ensure_future(read())
+    try:
+        await acknowledge_coins(coins, buyer, write)
+    finally:
+        reading.cancel()
+
+
+class CoinStreamApplication:
+    """
+    Serves the coin channel at ``COIN_STREAM["path"]``: a buyer's machine
+    sends one JSON object per inserted coin, ``{"amount": 5}``, as NDJSON
+    lines in a chunked ``POST`` body or as WebSocket messages, and gets an
+    ``{"amount": 5, "deposit": 35}`` or ``{"errors": {...}}`` line back
+    for each coin, in order. Everything else goes to ``application``.
+    """
+
+    def __init__(self, application):
+        self.application = application
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] in ("http", "websocket") and \
+                scope["path"] == settings.COIN_STREAM["path"]:
+            if scope["type"] == "websocket":
+                return await stream_websocket(scope, receive, send)
+            if scope["method"] == "POST":
+                return await stream_http(scope, receive, send)
+        return await self.application(scope, receive, send)
@@ -0,0 +1,36 @@
+from django.urls import reverse
+from rest_framework.test import APITestCase
+
+from apps.accounts.choices import UserRole
+from apps.accounts.models import User
+
+
+class UserAdminTestCase(APITestCase):
+
+    def setUp(self):
+        self.admin = User.objects.create_superuser(
+            username="admin", password="1234test"
+        )
+        self.buyers = [
+            User.objects.create_user(username=f"buyer{i}",
+                                     password="1234test",
+                                     role=UserRole.BUYER, deposit=50)
+            for i in range(3)
+        ]
+        self.changelist_url = reverse("admin:accounts_user_changelist")
+        self.client.force_login(self.admin)
+
+    def test_search_and_reset_deposits(self):
+        response = self.client.get(self.changelist_url, {"q": "buyer"})
+        assert response.status_code == 200
+        assert len(response.context["cl"].result_list) == 3
+
+        response = self.client.post(self.changelist_url, {
+            "action": "reset_selected_deposits",
+            "_selected_action": [self.buyers[0].pk, self.buyers[1].pk],
+        })
+        assert response.status_code == 302
+        assert list(
+            User.objects.filter(username__startswith="buyer")
+            .order_by("pk").values_list("deposit", flat=True)
+        ) == [0, 0, 50]
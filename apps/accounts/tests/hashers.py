@@ -0,0 +1,60 @@
+import time
+from unittest import mock
+
+from django.contrib.auth.hashers import (
+    PBKDF2PasswordHasher,
+    check_password,
+    make_password
+)
+from django.test import SimpleTestCase
+from rest_framework import status
+from rest_framework.reverse import reverse
+from rest_framework.test import APITestCase
+
+from apps.accounts.hashers import (
+    HashingPool,
+    PasswordHashingBusy,
+    PooledPBKDF2PasswordHasher
+)
+
+
+class PooledHasherTestCase(SimpleTestCase):
+
+    def test_hashes_match_the_stock_hasher(self):
+        pooled = PooledPBKDF2PasswordHasher()
+        stock = PBKDF2PasswordHasher()
+        assert pooled.encode("1234test", "salt", 1000) == \
+            stock.encode("1234test", "salt", 1000)
+
+        encoded = make_password("1234test")
+        assert encoded.startswith("pbkdf2_sha256$")
+        assert stock.verify("1234test", encoded)
+        assert check_password("1234test", encoded)
+        assert not check_password("wrong", encoded)
+
+
+class HashingPoolTestCase(SimpleTestCase):
+
+    def test_full_pool_rejects_instead_of_queueing_forever(self):
+        pool = HashingPool(workers=1, max_pending=1, timeout=0.1)
+        pool._slots.acquire()
+        with self.assertRaises(PasswordHashingBusy):
+            pool.run(abs, -1)
+        pool._slots.release()
+        assert pool.run(abs, -1) == 1
+
+    def test_slow_hashes_time_out(self):
+        pool = HashingPool(workers=1, max_pending=4, timeout=0.05)
+        with self.assertRaises(PasswordHashingBusy):
+            pool.run(time.sleep, 0.5)
+
+
+class LoginUnderLoadTestCase(APITestCase):
+
+    def test_login_degrades_to_503(self):
+        with mock.patch.object(HashingPool, "run",
+                               side_effect=PasswordHashingBusy()):
+            response = self.client.post(reverse("login-list"), data={
+                "username": "johndoe", "password": "1234test"
+            })
+        assert response.status_code == status.HTTP_503_SERVICE_UNAVAILABLE
@@ -0,0 +1,162 @@
+import asyncio
+import json
+from unittest import mock
+
+from asgiref.sync import async_to_sync
+from django.test import override_settings
+from rest_framework.test import APITestCase
+
+from apps.accounts import services
+from apps.accounts.choices import UserRole
+from apps.accounts.models import User
+from apps.accounts.services import generate_jwt_token
+from apps.accounts.streaming import CoinStreamApplication
+from apps.products.models import Product
+from apps.products.services import buy_product
+
+
+async def passthrough(scope, receive, send):
+    await send({"type": "passthrough"})
+
+
+@override_settings(COIN_STREAM={"path": "/api/v1/deposit/stream",
+                                "window": 1, "max_batch": 50})
+class CoinStreamTestCase(APITestCase):
+
+    def setUp(self):
+        self.buyer = User.objects.create_user(
+            username="johndoe", password="1234test", role=UserRole.BUYER
+        )
+        self.seller = User.objects.create_user(
+            username="mrsmith", password="1234test", role=UserRole.SELLER
+        )
+        self.application = CoinStreamApplication(passthrough)
+
+    def stream(self, scope_type, messages, user=None, method="POST"):
+        """
+        Runs one connection that receives ``messages`` and returns
+        everything sent back.
+        """
+        token, _ = generate_jwt_token(user or self.buyer)
+        scope = {
+            "type": scope_type,
+            "path": "/api/v1/deposit/stream",
+            "method": method,
+            "headers": [(b"authorization", f"Bearer {token}".encode())],
+            "query_string": b"",
+        }
+
+        async def run():
+            incoming, sent = asyncio.Queue(), []
+            for message in messages:
+                await incoming.put(message)
+
+            async def send(message):
+                sent.append(message)
+
+            await self.application(scope, incoming.get, send)
+            return sent
+
+        return async_to_sync(asyncio.wait_for)(run(), timeout=5)
+
+    def commits(self):
+        return mock.patch("apps.accounts.streaming.deposit_coins",
+                          wraps=services.deposit_coins)
+
+    def test_chunked_ndjson(self):
+        with self.commits() as deposit_coins:
+            sent = self.stream("http", [
+                {"type": "http.request", "more_body": True,
+                 "body": b'{"amount": 5}\n{"amo'},
+                {"type": "http.request", "more_body": True,
+                 "body": b'unt": 10}\n{"amount": 3}\nnot json\n'},
+                {"type": "http.request", "more_body": False,
+                 "body": b'{"amount": 20}'},
+            ])
+
+        assert sent[0]["status"] == 200
+        assert (b"content-type", b"application/x-ndjson") in \
+            sent[0]["headers"]
+        assert sent[-1] == {"type": "http.response.body", "body": b""}
+        acks = [json.loads(m["body"]) for m in sent[1:-1]]
+        assert acks == [
+            {"amount": 5, "deposit": 5},
+            {"amount": 10, "deposit": 15},
+            {"errors": {"amount": [
+                "Deposit amount can only be a multiple of 5."
+            ]}},
+            {"errors": {"details": ["Each line must be one JSON object."]}},
+            {"amount": 20, "deposit": 35},
+        ]
+        # The first two coins were added together.
+        assert [call.kwargs["amounts"]
+                for call in deposit_coins.call_args_list] == [[5, 10], [20]]
+        self.buyer.refresh_from_db()
+        assert self.buyer.deposit == 35
+
+    def test_websocket(self):
+        sent = self.stream("websocket", [
+            {"type": "websocket.connect"},
+            {"type": "websocket.receive", "text": '{"amount": 50}'},
+            {"type": "websocket.receive", "text": '{"amount": 0}'},
+            {"type": "websocket.receive", "text": '{"amount": 100}'},
+            {"type": "websocket.disconnect", "code": 1000},
+        ])
+
+        assert sent[0] == {"type": "websocket.accept"}
+        assert [json.loads(m["text"]) for m in sent[1:]] == [
+            {"amount": 50, "deposit": 50},
+            {"errors": {"amount": [
+                "Ensure this value is greater than or equal to 1."
+            ]}},
+            {"amount": 100, "deposit": 150},
+        ]
+        self.buyer.refresh_from_db()
+        assert self.buyer.deposit == 150
+
+    def test_buying_keeps_coins_streamed_meanwhile(self):
+        product = Product.objects.create(name="Product 0", cost=5,
+                                         amount_available=5,
+                                         seller=self.seller)
+        User.objects.filter(pk=self.buyer.pk).update(deposit=10)
+        self.buyer.refresh_from_db()
+
+        self.stream("websocket", [
+            {"type": "websocket.connect"},
+            {"type": "websocket.receive", "text": '{"amount": 50}'},
+            {"type": "websocket.disconnect", "code": 1000},
+        ])
+        # self.buyer still holds the deposit from before the coins.
+        response, errors = buy_product(product_id=product,
+                                       amount_products=1, buyer=self.buyer)
+
+        assert errors == {}
+        assert response["change"] == 55
+        self.buyer.refresh_from_db()
+        assert self.buyer.deposit == 55
+
+    def test_max_batch(self):
+        body = b'{"amount": 5}\n' * 5
+        with override_settings(COIN_STREAM={
+            "path": "/api/v1/deposit/stream", "window": 1, "max_batch": 2
+        }), self.commits() as deposit_coins:
+            sent = self.stream("http", [
+                {"type": "http.request", "more_body": False, "body": body}
+            ])
+
+        assert [json.loads(m["body"])["deposit"] for m in sent[1:-1]] == \
+            [5, 10, 15, 20, 25]
+        assert [len(call.kwargs["amounts"])
+                for call in deposit_coins.call_args_list] == [2, 2, 1]
+
+    def test_only_buyers(self):
+        sent = self.stream("http", [], user=self.seller)
+        assert sent[0]["status"] == 403
+
+        sent = self.stream("websocket", [{"type": "websocket.connect"}],
+                           user=self.seller)
+        assert sent == [{"type": "websocket.close", "code": 4403}]
+
+    def test_other_requests_pass_through(self):
+        sent = self.stream("http", [], method="GET")
+        assert sent == [{"type": "passthrough"}]
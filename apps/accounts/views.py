@@ -10,6 +10,14 @@ from apps.accounts.choices import UserRole
 from apps.accounts.permissions import BuyerAllowedOnly
 from apps.accounts.services import deposit_amount, obtain_jwt_token, \
     reset_deposit
+from apps.core.compiled import compile_serializer
+from apps.core.idempotency import idempotent
+from apps.core.throttling import (
+    IPTokenBucketThrottle,
+    UserTokenBucketThrottle,
+    UsernameTokenBucketThrottle
+)
+from apps.products.inventory import get_inventory_client
 
 
 log = logging.getLogger(__file__)
@@ -139,7 +147,11 @@ class ResetDepositViewSet(GenericViewSet):
 
     def list(self, request, *args, **kwargs):
         buyer = request.user
-        reset_deposit(buyer=buyer)
+        inventory = get_inventory_client()
+        if inventory is not None:
+            inventory.reset_deposit(buyer=buyer)
+        else:
+            reset_deposit(buyer=buyer)
 
         response_serializer = self.OutputSerializer(instance=buyer)
         return Response(
@@ -153,20 +165,25 @@ class DepositViewsSet(GenericViewSet):
     class InputSerializer(serializers.Serializer):
         amount = serializers.IntegerField(min_value=1, max_value=1000)
 
+    validate_input = staticmethod(compile_serializer(InputSerializer))
+
     class OutputSerializer(serializers.Serializer):
         deposit = serializers.IntegerField()
 
     permission_classes = [BuyerAllowedOnly]
     serializer_class = InputSerializer
+    throttle_classes = [UserTokenBucketThrottle, IPTokenBucketThrottle]
+    throttle_scope = "deposit"
 
+    @idempotent
     def create(self, request, *args, **kwargs):
         buyer = request.user
 
-        serializer = self.InputSerializer(data=request.data)
-        serializer.is_valid(raise_exception=True)
-        product, errors = deposit_amount(
-            **serializer.validated_data, buyer=buyer
-        )
+        validated_data = self.validate_input(request.data)
+        inventory = get_inventory_client()
+        deposit = (inventory.deposit_amount if inventory is not None
+                   else deposit_amount)
+        product, errors = deposit(**validated_data, buyer=buyer)
 
         if errors:
             return Response(data=errors, status=status.HTTP_400_BAD_REQUEST)
@@ -192,6 +209,8 @@ class LoginViewsSet(GenericViewSet):
 
     permission_classes = [AllowAny]
     serializer_class = InputSerializer
+    throttle_classes = [UsernameTokenBucketThrottle, IPTokenBucketThrottle]
+    throttle_scope = "login"
 
     def create(self, request, *args, **kwargs):
 
@@ -0,0 +1,124 @@
+from django.contrib.admin.helpers import ACTION_CHECKBOX_NAME
+from django.contrib.admin.views.main import PAGE_VAR, ChangeList
+from django.core.paginator import Paginator
+from django.db import connections
+from django.db.models import Max
+from django.template.response import TemplateResponse
+from django.utils.functional import cached_property
+
+
+AFTER_VAR = "after"
+
+
+def estimated_count(queryset, limit: int) -> int:
+    """
+    Counts without scanning huge tables. An unfiltered queryset is
+    estimated from the planner statistics (PostgreSQL) or the highest
+    primary key (SQLite); a filtered one is counted up to ``limit``.
+    """
+    if not queryset.query.where:
+        connection = connections[queryset.db]
+        if connection.vendor == "postgresql":
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    "SELECT reltuples::bigint FROM pg_class "
+                    "WHERE oid = %s::regclass",
+                    [queryset.model._meta.db_table]
+                )
+                row = cursor.fetchone()
+            if row and row[0] >= 0:
+                return row[0]
+        elif connection.vendor == "sqlite":
+            return queryset.aggregate(count=Max("pk"))["count"] or 0
+    return queryset.order_by()[:limit].count()
+
+
+class EstimatedCountPaginator(Paginator):
+    count_limit = 10000
+
+    @cached_property
+    def count(self):
+        return estimated_count(self.object_list, self.count_limit)
+
+
+class KeysetChangeList(ChangeList):
+    """
+    Adds ``?after=<pk>`` paging on the newest-first default ordering, so
+    deep pages seek on the primary key index instead of using OFFSET.
+    Sorted by any other column, the list pages with OFFSET as usual.
+    """
+
+    def __init__(self, request, *args, **kwargs):
+        self.after = request.GET.get(AFTER_VAR)
+        self.keyset = False
+        super().__init__(request, *args, **kwargs)
+
+    def get_filters_params(self, params=None):
+        lookup_params = super().get_filters_params(params)
+        lookup_params.pop(AFTER_VAR, None)
+        return lookup_params
+
+    def get_queryset(self, request):
+        queryset = super().get_queryset(request)
+        # The admin's ordering may be applied more than once; any other
+        # column makes pages by primary key wrong.
+        self.keyset = set(self.get_ordering(request, queryset)) == {"-pk"}
+        if self.keyset and self.after and self.after.isdigit():
+            queryset = queryset.filter(pk__lt=int(self.after))
+        return queryset
+
+    def keyset_next_url(self):
+        if not self.keyset:
+            return None
+        results = list(self.result_list)
+        if len(results) < self.list_per_page:
+            return None
+        return self.get_query_string(
+            {AFTER_VAR: results[-1].pk}, [PAGE_VAR]
+        )
+
+
+class LargeTableAdminMixin:
+    """
+    Changelist settings for tables with millions of rows: estimated counts,
+    no unfiltered full count, and keyset paging on the primary key.
+    """
+    ordering = ["-pk"]
+    show_full_result_count = False
+    paginator = EstimatedCountPaginator
+    change_list_template = "admin/core/keyset_change_list.html"
+
+    def get_changelist(self, request, **kwargs):
+        return KeysetChangeList
+
+
+def bulk_update_action(*, name, form_class, description, apply):
+    """
+    Builds an admin action that asks for ``form_class`` on an intermediate
+    page and then calls ``apply(queryset, cleaned_data)``, which must update
+    all selected rows with a single query and return the row count.
+    """
+
+    def action(modeladmin, request, queryset):
+        form = form_class(request.POST if "apply" in request.POST else None)
+        if form.is_valid():
+            updated = apply(queryset, form.cleaned_data)
+            modeladmin.message_user(
+                request, f"{description}: {updated} rows updated."
+            )
+            return None
+
+        return TemplateResponse(request, "admin/core/bulk_update.html", {
+            **modeladmin.admin_site.each_context(request),
+            "title": description,
+            "opts": modeladmin.model._meta,
+            "form": form,
+            "action": request.POST.get("action"),
+            "select_across": request.POST.get("select_across", "0"),
+            "selected": request.POST.getlist(ACTION_CHECKBOX_NAME),
+            "action_checkbox_name": ACTION_CHECKBOX_NAME,
+        })
+
+    action.__name__ = name
+    action.short_description = description
+    return action
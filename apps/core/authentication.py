@@ -0,0 +1,19 @@
+from rest_framework import authentication
+
+from apps.accounts.authentication import JWTAuthentication
+
+
+class BatchAuthentication(authentication.BaseAuthentication):
+    """
+    Authenticates the sub-requests of a batch as the batch's caller.
+    ``BatchView`` sets ``batch_auth`` on the requests it builds, after the
+    batch request itself went through authentication (and session CSRF
+    checks); clients cannot set it.
+    """
+
+    def authenticate(self, request):
+        return getattr(request._request, "batch_auth", None)
+
+    def authenticate_header(self, request):
+        # Listed first, so it answers for the bearer tokens after it.
+        return JWTAuthentication().authenticate_header(request)
@@ -0,0 +1,159 @@
+import json
+from io import BytesIO
+from urllib.parse import urlsplit
+
+from django.conf import settings
+from django.core.handlers.wsgi import WSGIRequest
+from django.db import transaction
+from django.urls import Resolver404, resolve
+from rest_framework import serializers, status
+from rest_framework.permissions import AllowAny
+from rest_framework.response import Response
+from rest_framework.views import APIView
+
+from apps.accounts.authentication import JWTAuthentication
+from apps.products.inventory import get_inventory_client
+
+
+# Request META that describes the batch itself, not its sub-requests
+BATCH_ONLY_META = {
+    "CONTENT_LENGTH", "CONTENT_TYPE", "PATH_INFO", "QUERY_STRING",
+    "REQUEST_METHOD", "HTTP_IDEMPOTENCY_KEY", "wsgi.input",
+}
+# Response headers that only describe how the sub-response would have been
+# rendered
+RENDERING_HEADERS = {"Content-Type", "Vary", "Allow"}
+
+
+class BatchView(APIView):
+    """
+    Runs an ordered list of sub-requests against the routes of
+    ``routers`` in this request: the caller is authenticated once and the
+    middleware and content negotiation run once for the whole batch. A
+    successful login sub-request authenticates the ones after it. With
+    ``atomic`` all of them share one transaction, which is rolled back and
+    the batch stopped at the first sub-request that fails.
+    """
+
+    class SubRequestSerializer(serializers.Serializer):
+        method = serializers.ChoiceField(
+            choices=["GET", "POST", "PUT", "DELETE"]
+        )
+        path = serializers.CharField()
+        body = serializers.JSONField(required=False)
+        headers = serializers.DictField(child=serializers.CharField(),
+                                        required=False)
+
+    class InputSerializer(serializers.Serializer):
+        atomic = serializers.BooleanField(default=False)
+        requests = serializers.ListField(allow_empty=False)
+
+        def validate_requests(self, value):
+            max_requests = settings.BATCH_REQUESTS["max_requests"]
+            if len(value) > max_requests:
+                raise serializers.ValidationError(
+                    f"A batch can hold at most {max_requests} requests."
+                )
+            serializer = BatchView.SubRequestSerializer(data=value, many=True)
+            serializer.is_valid(raise_exception=True)
+            return serializer.validated_data
+
+    permission_classes = [AllowAny]
+    routers = ()
+    login_viewset = None
+
+    def get_viewsets(self) -> set:
+        return {viewset for router in self.routers
+                for _, viewset, _ in router.registry}
+
+    def post(self, request, *args, **kwargs):
+        serializer = self.InputSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        atomic = serializer.validated_data["atomic"]
+        if atomic and get_inventory_client() is not None:
+            # The inventory engine applies writes outside the database.
+            return Response(
+                data={"atomic": ["Atomic batches are not available while "
+                                 "the inventory engine is enabled."]},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        self.user, self.token = request.user, request.auth
+        self.viewsets = self.get_viewsets()
+        sub_requests = serializer.validated_data["requests"]
+        if not atomic:
+            return Response(data={
+                "committed": True,
+                "responses": [self.run(request, sub_request)
+                              for sub_request in sub_requests],
+            })
+
+        responses = []
+        with transaction.atomic():
+            for sub_request in sub_requests:
+                responses.append(self.run(request, sub_request))
+                if responses[-1]["status"] >= 400:
+                    transaction.set_rollback(True)
+                    break
+        return Response(data={
+            "committed": responses[-1]["status"] < 400,
+            "responses": responses,
+        })
+
+    def run(self, request, sub_request: dict) -> dict:
+        url = urlsplit(sub_request["path"])
+        try:
+            match = resolve(url.path)
+        except Resolver404:
+            match = None
+        if match is None or getattr(match.func, "cls", None) \
+                not in self.viewsets:
+            return {"status": status.HTTP_404_NOT_FOUND,
+                    "body": {"detail": "Not found."}}
+
+        response = match.func(
+            self.build_request(request, sub_request, url),
+            *match.args, **match.kwargs
+        )
+        if hasattr(response, "data"):
+            body = response.data
+        else:  # pragma: no cover
+            body = response.content.decode()
+        if match.func.cls is self.login_viewset and \
+                response.status_code == status.HTTP_200_OK:
+            self.authenticate(body["token"])
+        return {
+            "status": response.status_code,
+            "headers": {name: value for name, value in response.items()
+                        if name not in RENDERING_HEADERS},
+            "body": body,
+        }
+
+    def build_request(self, request, sub_request: dict, url) -> WSGIRequest:
+        body = b""
+        if "body" in sub_request:
+            body = json.dumps(sub_request["body"]).encode()
+        environ = {key: value for key, value in request.META.items()
+                   if key not in BATCH_ONLY_META}
+        environ.update({
+            "REQUEST_METHOD": sub_request["method"],
+            "PATH_INFO": url.path,
+            "QUERY_STRING": url.query,
+            "CONTENT_TYPE": "application/json",
+            "CONTENT_LENGTH": str(len(body)),
+            "HTTP_ACCEPT": "application/json",
+            "wsgi.input": BytesIO(body),
+        })
+        for name, value in sub_request.get("headers", {}).items():
+            environ["HTTP_" + name.upper().replace("-", "_")] = value
+        sub = WSGIRequest(environ)
+        if self.user is not None and self.user.is_authenticated:
+            # Read by BatchAuthentication in the sub-views.
+            sub.batch_auth = (self.user, self.token)
+        return sub
+
+    def authenticate(self, token: str):
+        authentication = JWTAuthentication()
+        validated_token, _ = authentication.get_validated_token(token)
+        self.user = authentication.get_user(validated_token)
+        self.token = validated_token
@@ -0,0 +1,107 @@
+from collections.abc import Mapping
+from typing import Callable
+
+from django.core.validators import MaxValueValidator, MinValueValidator
+from rest_framework import serializers
+from rest_framework.exceptions import ErrorDetail, ValidationError
+from rest_framework.fields import SkipField
+from rest_framework.settings import api_settings
+
+
+def compile_field(field: serializers.Field) -> Callable:
+    """
+    Returns ``validate(data)`` for one bound field: ``(True, value)``,
+    ``(False, errors)``, or ``SkipField`` for a missing optional field.
+    Integer fields with at most a min and max value are checked inline;
+    everything else goes through the field's own ``run_validation``.
+    """
+    simple = type(field) is serializers.IntegerField and all(
+        type(validator) in (MinValueValidator, MaxValueValidator)
+        for validator in field.validators
+    )
+    if not simple:
+        def validate(data):
+            try:
+                return True, field.run_validation(field.get_value(data))
+            except ValidationError as exc:
+                return False, exc.detail
+
+        return validate
+
+    bounds = []
+    for validator in field.validators:
+        low, high = (validator.limit_value, None) \
+            if type(validator) is MinValueValidator \
+            else (None, validator.limit_value)
+        bounds.append((low, high, ErrorDetail(str(validator.message),
+                                              code=validator.code)))
+
+    def validate(data):
+        try:
+            is_empty, value = field.validate_empty_values(
+                field.get_value(data)
+            )
+            if is_empty:
+                return True, value
+            # Plain ints skip the string handling of to_internal_value.
+            if type(value) is not int:
+                value = field.to_internal_value(value)
+        except ValidationError as exc:
+            return False, exc.detail
+        errors = [message for low, high, message in bounds
+                  if (low is not None and value < low)
+                  or (high is not None and value > high)]
+        if errors:
+            return False, errors
+        return True, value
+
+    return validate
+
+
+def compile_serializer(serializer_class) -> Callable:
+    """
+    Turns a flat input serializer into ``validate(data)``, which returns
+    the same ``validated_data`` as ``serializer.is_valid()`` or raises the
+    same ``ValidationError``, without building a serializer per request.
+    Serializers with ``validate`` hooks are run as they are.
+    """
+    serializer = serializer_class()
+    hooks = [name for name in serializer.fields
+             if hasattr(serializer, f"validate_{name}")]
+    if hooks or serializer.get_validators() or \
+            serializer_class.validate is not serializers.Serializer.validate:
+        def run_serializer(data):
+            serializer = serializer_class(data=data)
+            serializer.is_valid(raise_exception=True)
+            return serializer.validated_data
+
+        return run_serializer
+
+    fields = [
+        (field.source, field.field_name, compile_field(field))
+        for field in serializer.fields.values()
+        if not field.read_only
+    ]
+    invalid = serializers.Serializer.default_error_messages["invalid"]
+
+    def validate(data):
+        if not isinstance(data, Mapping):
+            raise ValidationError({api_settings.NON_FIELD_ERRORS_KEY: [
+                ErrorDetail(invalid.format(datatype=type(data).__name__),
+                            code="invalid")
+            ]})
+        validated, errors = {}, {}
+        for source, name, validate_field in fields:
+            try:
+                ok, result = validate_field(data)
+            except SkipField:
+                continue
+            if ok:
+                validated[source] = result
+            else:
+                errors[name] = result
+        if errors:
+            raise ValidationError(errors)
+        return validated
+
+    return validate
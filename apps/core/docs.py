@@ -0,0 +1,66 @@
+import functools
+
+from django.conf import settings
+from django.urls import include, path
+
+
+def load_schema():
+    """
+    Decodes the schema written by ``generate_api_schema``. Returns ``None``
+    when the artifact hasn't been built.
+    """
+    from rest_framework.compat import coreapi
+
+    try:
+        with open(settings.API_SCHEMA["path"], "rb") as schema_file:
+            content = schema_file.read()
+    except FileNotFoundError:
+        return None
+    return coreapi.codecs.CoreJSONCodec().decode(content)
+
+
+@functools.lru_cache(maxsize=None)
+def get_docs_views():
+    from rest_framework.documentation import (
+        get_docs_view, get_schemajs_view
+    )
+    from rest_framework.schemas.coreapi import SchemaGenerator
+
+    schema = load_schema()
+
+    class PrecomputedSchemaGenerator(SchemaGenerator):
+        """
+        Serves the build time schema instead of introspecting every view.
+        Falls back to introspection when the artifact is missing.
+        """
+
+        def get_schema(self, request=None, public=False):
+            if schema is None:
+                return super().get_schema(request=request, public=public)
+            return schema
+
+    options = {
+        "title": settings.API_SCHEMA["title"],
+        "generator_class": PrecomputedSchemaGenerator,
+    }
+    return get_docs_view(**options), get_schemajs_view(**options)
+
+
+def docs_view(request, *args, **kwargs):
+    return get_docs_views()[0](request, *args, **kwargs)
+
+
+def schema_js_view(request, *args, **kwargs):
+    return get_docs_views()[1](request, *args, **kwargs)
+
+
+def include_lazy_docs_urls():
+    """
+    Same routes as ``rest_framework.documentation.include_docs_urls``, but
+    the docs stack is only imported on the first docs request.
+    """
+    urls = [
+        path("", docs_view, name="docs-index"),
+        path("schema.js", schema_js_view, name="schema-js"),
+    ]
+    return include((urls, "api-docs"), namespace="api-docs")
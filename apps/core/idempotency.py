@@ -0,0 +1,133 @@
+import contextvars
+import functools
+import hashlib
+import json
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.response import Response
+
+from apps.core.models import IdempotencyKey
+
+
+IDEMPOTENCY_HEADER = "Idempotency-Key"
+REPLAYED_HEADER = "Idempotent-Replayed"
+
+# "<user id>:<key>" of the idempotent request being handled, for side
+# effects that happen outside its transaction (the inventory engine).
+idempotency_key = contextvars.ContextVar("idempotency_key", default=None)
+
+
+def request_fingerprint(request) -> str:
+    data = request.data
+    if hasattr(data, "lists"):
+        data = dict(data.lists())
+    payload = json.dumps(
+        [request.method, request.path, data], sort_keys=True, default=str
+    )
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+def expiry_cutoff():
+    return timezone.now() - settings.IDEMPOTENCY["retention"]
+
+
+def claim_key(*, user, key: str, fingerprint: str):
+    """
+    Inserts the key for ``user`` or returns the stored row when it already
+    exists and has not expired. Must be called inside a transaction.
+    """
+    try:
+        with transaction.atomic():
+            return IdempotencyKey.objects.create(
+                user=user, key=key, request_fingerprint=fingerprint
+            ), True
+    except IntegrityError:
+        stored = IdempotencyKey.objects.select_for_update().get(
+            user=user, key=key
+        )
+        if stored.created_at >= expiry_cutoff():
+            return stored, False
+        stored.delete()
+        return claim_key(user=user, key=key, fingerprint=fingerprint)
+
+
+def replay(stored: IdempotencyKey, fingerprint: str) -> Response:
+    if stored.request_fingerprint != fingerprint:
+        return Response(
+            data={"details": f"{IDEMPOTENCY_HEADER} was already used for "
+                             f"a different request."},
+            status=status.HTTP_422_UNPROCESSABLE_ENTITY
+        )
+    return Response(
+        data=stored.response_body,
+        status=stored.response_status,
+        headers={REPLAYED_HEADER: "true"}
+    )
+
+
+def idempotent(view_method):
+    """
+    Makes a viewset action replay its first response for repeated
+    ``Idempotency-Key`` headers. The key, the side effect and the stored
+    response are committed in one transaction, so a retry either sees the
+    whole outcome or none of it. The inventory engine commits on its own,
+    so it is sent the key through ``idempotency_key`` and deduplicates
+    retries itself.
+    """
+
+    @functools.wraps(view_method)
+    def wrapper(self, request, *args, **kwargs):
+        key = request.headers.get(IDEMPOTENCY_HEADER)
+        if not key:
+            return view_method(self, request, *args, **kwargs)
+        if len(key) > IdempotencyKey._meta.get_field("key").max_length:
+            return Response(
+                data={"details": f"{IDEMPOTENCY_HEADER} is too long."},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        fingerprint = request_fingerprint(request)
+        with transaction.atomic():
+            stored, created = claim_key(
+                user=request.user, key=key, fingerprint=fingerprint
+            )
+            if not created:
+                return replay(stored, fingerprint)
+
+            token = idempotency_key.set(f"{request.user.pk}:{key}")
+            try:
+                response = view_method(self, request, *args, **kwargs)
+            finally:
+                idempotency_key.reset(token)
+            if response.status_code >= 500:
+                transaction.set_rollback(True)
+                return response
+
+            stored.response_status = response.status_code
+            stored.response_body = response.data
+            stored.save(update_fields=["response_status", "response_body"])
+        return response
+
+    return wrapper
+
+
+def purge_expired_keys(*, batch_size: int = 1000) -> int:
+    """
+    Deletes expired keys in primary key ordered batches so the sweep never
+    holds a long write transaction.
+    """
+    cutoff = expiry_cutoff()
+    deleted = 0
+    while True:
+        pks = list(
+            IdempotencyKey.objects
+            .filter(created_at__lt=cutoff)
+            .order_by("pk")
+            .values_list("pk", flat=True)[:batch_size]
+        )
+        if not pks:
+            return deleted
+        deleted += IdempotencyKey.objects.filter(pk__in=pks).delete()[0]
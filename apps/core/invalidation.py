@@ -0,0 +1,299 @@
+import logging
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Iterable
+
+from django.conf import settings
+from django.db import transaction
+
+
+log = logging.getLogger(__name__)
+
+class InvalidationBus:
+    """
+    Invalidated cache keys, appended to a small SQLite file shared by every
+    worker process on the host. Workers poll for rows after the last
+    ``seq`` they applied. Rows older than ``retention`` seconds are
+    trimmed, so a worker that has not polled for that long must drop its
+    whole cache instead. Workers also record their cache statistics here
+    for ``manage.py cache_stats``.
+    """
+
+    schema = (
+        "CREATE TABLE IF NOT EXISTS invalidation ("
+        " seq INTEGER PRIMARY KEY AUTOINCREMENT,"
+        " key TEXT NOT NULL,"
+        " pid INTEGER NOT NULL,"
+        " published_at REAL NOT NULL"
+        ");"
+        "CREATE TABLE IF NOT EXISTS cache_stats ("
+        " pid INTEGER NOT NULL,"
+        " name TEXT NOT NULL,"
+        " hits INTEGER NOT NULL,"
+        " misses INTEGER NOT NULL,"
+        " invalidations INTEGER NOT NULL,"
+        " staleness_total REAL NOT NULL,"
+        " staleness_max REAL NOT NULL,"
+        " updated_at REAL NOT NULL,"
+        " PRIMARY KEY (pid, name)"
+        ") WITHOUT ROWID;"
+    )
+
+    # Seconds between trims in each process
+    trim_interval = 60
+
+    def __init__(self, path, retention: float):
+        self.path = str(path)
+        self.retention = retention
+        self._local = threading.local()
+        self._trimmed_at = time.time()
+
+    @property
+    def connection(self):
+        # Connections are per thread and must not survive a fork.
+        pid = os.getpid()
+        if getattr(self._local, "pid", None) != pid:
+            connection = sqlite3.connect(
+                self.path, timeout=5, isolation_level=None,
+                check_same_thread=False
+            )
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=OFF")
+            connection.executescript(self.schema)
+            self._local.connection = connection
+            self._local.pid = pid
+        return self._local.connection
+
+    def publish(self, keys: Iterable[str], now=None):
+        now = time.time() if now is None else now
+        self.connection.executemany(
+            "INSERT INTO invalidation (key, pid, published_at) "
+            "VALUES (?, ?, ?)",
+            [(key, os.getpid(), now) for key in keys]
+        )
+        if now - self._trimmed_at >= self.trim_interval:
+            self.trim(now)
+
+    def trim(self, now=None):
+        now = time.time() if now is None else now
+        self._trimmed_at = now
+        self.connection.execute(
+            "DELETE FROM invalidation WHERE published_at < ?",
+            (now - self.retention,)
+        )
+        self.connection.execute(
+            "DELETE FROM cache_stats WHERE updated_at < ?",
+            (now - self.retention,)
+        )
+
+    def last_seq(self) -> int:
+        # Survives trimming, unlike max(seq).
+        row = self.connection.execute(
+            "SELECT seq FROM sqlite_sequence WHERE name = 'invalidation'"
+        ).fetchone()
+        return row[0] if row else 0
+
+    def since(self, seq: int) -> list:
+        """
+        Returns the ``(seq, key, pid, published_at)`` rows after ``seq``.
+        """
+        return self.connection.execute(
+            "SELECT seq, key, pid, published_at FROM invalidation "
+            "WHERE seq > ? ORDER BY seq", (seq,)
+        ).fetchall()
+
+    def save_stats(self, name: str, stats: dict, now=None):
+        now = time.time() if now is None else now
+        self.connection.execute(
+            "INSERT OR REPLACE INTO cache_stats (pid, name, hits, misses, "
+            "invalidations, staleness_total, staleness_max, updated_at) "
+            "VALUES (:pid, :name, :hits, :misses, :invalidations, "
+            ":staleness_total, :staleness_max, :now)",
+            {"pid": os.getpid(), "name": name, "now": now, **stats}
+        )
+
+    def stats(self) -> list:
+        """
+        Statistics of every cache, summed over the workers that reported
+        within the retention.
+        """
+        return self.connection.execute(
+            "SELECT name, count(*), sum(hits), sum(misses),"
+            " sum(invalidations), sum(staleness_total), max(staleness_max) "
+            "FROM cache_stats GROUP BY name ORDER BY name"
+        ).fetchall()
+
+    def clear(self):
+        self.connection.execute("DELETE FROM invalidation")
+        self.connection.execute("DELETE FROM cache_stats")
+
+
+class LocalCache:
+    """
+    Least recently used cache of values in this process, kept in step with
+    the writes of other workers: before a lookup, invalidations published
+    on the bus are applied if it was last polled more than
+    ``poll_interval`` seconds ago, so an entry is served at most that long
+    after another worker changed it. Cached values are shared between
+    threads and must not be modified.
+
+    Besides hits and misses, the cache counts the invalidations it applied
+    from other workers and how long after they were published it applied
+    them: the window in which it could have served a stale value.
+    """
+
+    def __init__(self, name: str, bus: InvalidationBus, *, max_size: int,
+                 poll_interval: float, stats_interval: float):
+        self.name = name
+        self.bus = bus
+        self.max_size = max_size
+        self.poll_interval = poll_interval
+        self.stats_interval = stats_interval
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self._sync_lock = threading.Lock()
+        self._pid = None
+        self._generation = 0
+        self.reset_stats()
+
+    def reset_stats(self):
+        self.hits = self.misses = self.invalidations = 0
+        self.staleness_total = self.staleness_max = 0.0
+        self._synced_at = self._saved_at = 0.0
+
+    def get(self, key: str, load: Callable):
+        """
+        Returns the cached value for ``key``, or ``load()``. Only values
+        that are not ``None`` are cached.
+        """
+        self.sync()
+        with self._lock:
+            if key in self._data:
+                self.hits += 1
+                self._data.move_to_end(key)
+                return self._data[key]
+            self.misses += 1
+            generation = self._generation
+        value = load()
+        if value is None:
+            return value
+        with self._lock:
+            # Something may have been invalidated while loading.
+            if generation == self._generation:
+                self._data[key] = value
+                if len(self._data) > self.max_size:
+                    self._data.popitem(last=False)
+        return value
+
+    def invalidate(self, keys: Iterable[str]):
+        with self._lock:
+            self._generation += 1
+            for key in keys:
+                self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._generation += 1
+            self._data.clear()
+
+    def sync(self, now=None):
+        now = time.time() if now is None else now
+        if self._pid == os.getpid() and \
+                now - self._synced_at < self.poll_interval:
+            return
+        with self._sync_lock:
+            if self._pid != os.getpid():
+                # Started, or forked: anything cached may be stale.
+                self.clear()
+                self._pid = os.getpid()
+                self.seq = self.bus.last_seq()
+                self.reset_stats()
+                self._synced_at = now
+                return
+            if now - self._synced_at < self.poll_interval:
+                return
+            if now - self._synced_at >= self.bus.retention:
+                # Invalidations may have been trimmed unseen.
+                self.clear()
+            rows = self.bus.since(self.seq)
+            if rows:
+                self.invalidate([key for _, key, _, _ in rows])
+            for _, _, pid, published_at in rows:
+                if pid == self._pid:
+                    # Applied when it was published.
+                    continue
+                staleness = max(now - published_at, 0)
+                self.invalidations += 1
+                self.staleness_total += staleness
+                self.staleness_max = max(self.staleness_max, staleness)
+            if rows:
+                self.seq = rows[-1][0]
+            self._synced_at = now
+            if now - self._saved_at >= self.stats_interval:
+                self.bus.save_stats(self.name, self.stats(), now)
+                self._saved_at = now
+
+    def stats(self) -> dict:
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "invalidations": self.invalidations,
+            "staleness_total": self.staleness_total,
+            "staleness_max": self.staleness_max,
+        }
+
+
+def cache_key(model, pk) -> str:
+    return f"{model._meta.label_lower}:{pk}"
+
+
+_bus = None
+_caches = {}
+
+
+def get_bus() -> InvalidationBus:
+    global _bus
+    config = settings.INVALIDATION_BUS
+    if _bus is None or _bus.path != str(config["NAME"]):
+        _bus = InvalidationBus(config["NAME"], config["retention"])
+        _caches.clear()
+    return _bus
+
+
+def get_cache(name: str, max_size: int) -> LocalCache:
+    bus = get_bus()
+    cache = _caches.get(name)
+    if cache is None or cache.max_size != max_size:
+        config = settings.INVALIDATION_BUS
+        cache = _caches[name] = LocalCache(
+            name, bus, max_size=max_size,
+            poll_interval=config["poll_interval"],
+            stats_interval=config["stats_interval"],
+        )
+    return cache
+
+
+def publish(keys: list):
+    """
+    Drops ``keys`` from this process's caches at once and from the other
+    workers' on their next poll. Runs after the write committed, so failing
+    to publish must not fail the request: it is logged and this process
+    starts over with empty caches.
+    """
+    for cache in _caches.values():
+        cache.invalidate(keys)
+    try:
+        get_bus().publish(keys)
+    except sqlite3.Error:
+        log.exception("Could not publish %d cache invalidations", len(keys))
+        for cache in _caches.values():
+            cache.clear()
+
+
+def invalidate_on_commit(model, pks: Iterable):
+    keys = [cache_key(model, pk) for pk in pks]
+    if keys:
+        transaction.on_commit(lambda: publish(keys))
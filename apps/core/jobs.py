@@ -0,0 +1,285 @@
+import atexit
+import json
+import logging
+import os
+import random
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import close_old_connections, transaction
+
+
+log = logging.getLogger(__name__)
+
+
+class JobQueue:
+    """
+    Pending jobs kept in a small SQLite file shared by every worker process
+    on the host, so queued work survives restarts and crashes. Claiming a
+    job is one atomic ``UPDATE ... RETURNING`` that leases it for ``lease``
+    seconds; a job whose worker died is simply claimed again once the lease
+    runs out.
+    """
+
+    schema = (
+        "CREATE TABLE IF NOT EXISTS job ("
+        " id INTEGER PRIMARY KEY,"
+        " name TEXT NOT NULL,"
+        " payload TEXT NOT NULL,"
+        " attempts INTEGER NOT NULL DEFAULT 0,"
+        " run_at REAL NOT NULL,"
+        " failed_at REAL,"
+        " error TEXT"
+        ");"
+        "CREATE INDEX IF NOT EXISTS job_run_at"
+        " ON job (run_at) WHERE failed_at IS NULL;"
+    )
+
+    claim_sql = (
+        "UPDATE job SET run_at = :now + :lease, attempts = attempts + 1 "
+        "WHERE id = ("
+        " SELECT id FROM job WHERE failed_at IS NULL AND run_at <= :now"
+        " ORDER BY run_at LIMIT 1"
+        ") RETURNING id, name, payload, attempts"
+    )
+
+    def __init__(self, path):
+        self.path = str(path)
+        self._local = threading.local()
+
+    @property
+    def connection(self):
+        # Connections are per thread and must not survive a fork.
+        pid = os.getpid()
+        if getattr(self._local, "pid", None) != pid:
+            connection = sqlite3.connect(
+                self.path, timeout=5, isolation_level=None,
+                check_same_thread=False
+            )
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.executescript(self.schema)
+            self._local.connection = connection
+            self._local.pid = pid
+        return self._local.connection
+
+    def push(self, name: str, payload: str, now=None):
+        now = time.time() if now is None else now
+        self.connection.execute(
+            "INSERT INTO job (name, payload, run_at) VALUES (?, ?, ?)",
+            (name, payload, now)
+        )
+
+    def claim(self, lease: float, now=None):
+        """
+        Leases the job that has been due the longest. Returns ``(id, name,
+        payload, attempts)`` or ``None``.
+        """
+        now = time.time() if now is None else now
+        return self.connection.execute(
+            self.claim_sql, {"now": now, "lease": lease}
+        ).fetchone()
+
+    def next_run_at(self):
+        return self.connection.execute(
+            "SELECT min(run_at) FROM job WHERE failed_at IS NULL"
+        ).fetchone()[0]
+
+    def complete(self, job_id: int):
+        self.connection.execute("DELETE FROM job WHERE id = ?", (job_id,))
+
+    def retry(self, job_id: int, run_at: float, error: str):
+        self.connection.execute(
+            "UPDATE job SET run_at = ?, error = ? WHERE id = ?",
+            (run_at, error, job_id)
+        )
+
+    def fail(self, job_id: int, error: str, now=None):
+        """
+        Gives up on a job. It stays in the table, with its last error, for
+        inspection.
+        """
+        now = time.time() if now is None else now
+        self.connection.execute(
+            "UPDATE job SET failed_at = ?, error = ? WHERE id = ?",
+            (now, error, job_id)
+        )
+
+    def clear(self):
+        self.connection.execute("DELETE FROM job")
+
+
+_registry = {}
+
+
+def background_job(func):
+    """
+    Registers ``func`` as a background job. ``func.delay(*args, **kwargs)``
+    queues a call once the current transaction commits; the arguments must
+    be JSON serializable.
+    """
+    name = f"{func.__module__}.{func.__qualname__}"
+    _registry[name] = func
+
+    def delay(*args, **kwargs):
+        payload = json.dumps([args, kwargs])
+        transaction.on_commit(lambda: get_executor().submit(name, payload))
+
+    func.delay = delay
+    return func
+
+
+class BackgroundExecutor:
+    """
+    Runs queued jobs on a bounded thread pool in this process. A dispatcher
+    thread only claims a job when a pool thread is free, so a backlog waits
+    on disk rather than in memory. Failed jobs are retried with exponential
+    backoff until ``max_attempts``.
+    """
+
+    def __init__(self, queue: JobQueue, *, workers: int, max_attempts: int,
+                 backoff: float, max_backoff: float, lease: float,
+                 poll_interval: float = 1):
+        self.queue = queue
+        self.workers = workers
+        self.max_attempts = max_attempts
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.lease = lease
+        self.poll_interval = poll_interval
+        self._slots = threading.BoundedSemaphore(workers)
+        self._wakeup = threading.Event()
+        self._stopping = threading.Event()
+        self._lock = threading.Lock()
+        self._pool = None
+        self._dispatcher = None
+        self._pid = None
+
+    def submit(self, name: str, payload: str):
+        self.queue.push(name, payload)
+        if settings.BACKGROUND_JOBS["autostart"]:
+            self.start()
+        self._wakeup.set()
+
+    def start(self):
+        with self._lock:
+            if self._pid == os.getpid() and not self._stopping.is_set():
+                return
+            self._pid = os.getpid()
+            self._stopping.clear()
+            self._slots = threading.BoundedSemaphore(self.workers)
+            self._pool = ThreadPoolExecutor(
+                max_workers=self.workers, thread_name_prefix="background-job"
+            )
+            self._dispatcher = threading.Thread(
+                target=self._dispatch, name="background-job-dispatcher",
+                daemon=True
+            )
+            self._dispatcher.start()
+
+    def shutdown(self, timeout: float = None):
+        """
+        Stops taking new work once no queued job is due, waits up to
+        ``timeout`` seconds for running jobs and leaves the rest queued for
+        the next start.
+        """
+        if self._dispatcher is None or self._pid != os.getpid():
+            return
+        timeout = (settings.BACKGROUND_JOBS["shutdown_timeout"]
+                   if timeout is None else timeout)
+        deadline = time.monotonic() + timeout
+        self._stopping.set()
+        self._wakeup.set()
+        self._dispatcher.join(max(deadline - time.monotonic(), 0))
+        for _ in range(self.workers):
+            if not self._slots.acquire(
+                    timeout=max(deadline - time.monotonic(), 0)):
+                log.warning("Background jobs still running at shutdown")
+                break
+        self._pool.shutdown(wait=False)
+        self._dispatcher = None
+
+    def run_pending(self) -> int:
+        """
+        Runs every due job in the calling thread. Returns how many ran.
+        """
+        ran = 0
+        while (job := self.queue.claim(self.lease)) is not None:
+            self._run(*job)
+            ran += 1
+        return ran
+
+    def _dispatch(self):
+        while True:
+            if not self._slots.acquire(timeout=self.poll_interval):
+                continue
+            job = self.queue.claim(self.lease)
+            if job is None:
+                self._slots.release()
+                if self._stopping.is_set():
+                    return
+                self._wait_for_work()
+                continue
+            self._pool.submit(self._run_in_slot, *job)
+
+    def _wait_for_work(self):
+        next_run_at = self.queue.next_run_at()
+        delay = self.poll_interval
+        if next_run_at is not None:
+            delay = min(max(next_run_at - time.time(), 0), delay)
+        self._wakeup.wait(delay)
+        self._wakeup.clear()
+
+    def _run_in_slot(self, *job):
+        try:
+            self._run(*job)
+        finally:
+            close_old_connections()
+            self._slots.release()
+
+    def _run(self, job_id: int, name: str, payload: str, attempts: int):
+        try:
+            args, kwargs = json.loads(payload)
+            _registry[name](*args, **kwargs)
+        except Exception as e:
+            error = f"{type(e).__name__}: {e}"
+            if attempts >= self.max_attempts:
+                log.exception("Background job %s failed for good", name)
+                self.queue.fail(job_id, error)
+            else:
+                log.warning("Background job %s failed, retrying: %s",
+                            name, error)
+                delay = min(self.backoff * 2 ** (attempts - 1),
+                            self.max_backoff)
+                self.queue.retry(
+                    job_id, time.time() + delay * random.uniform(1, 1.25),
+                    error
+                )
+        else:
+            self.queue.complete(job_id)
+
+
+_executor = None
+
+
+def get_executor() -> BackgroundExecutor:
+    global _executor
+    config = settings.BACKGROUND_JOBS
+    if _executor is None or _executor.queue.path != str(config["NAME"]):
+        _executor = BackgroundExecutor(
+            JobQueue(config["NAME"]),
+            workers=config["workers"],
+            max_attempts=config["max_attempts"],
+            backoff=config["backoff"],
+            max_backoff=config["max_backoff"],
+            lease=config["lease"],
+        )
+    return _executor
+
+
+@atexit.register
+def _drain():
+    if _executor is not None:
+        _executor.shutdown()
@@ -0,0 +1,107 @@
+from django.conf import settings
+from django.core.handlers.asgi import ASGIHandler
+from django.core.handlers.wsgi import WSGIHandler
+from rest_framework import HTTP_HEADER_ENCODING, routers
+
+from apps.accounts.authentication import (
+    AUTH_HEADER_TYPES,
+    JWTAuthentication
+)
+from apps.core.negotiation import ExactAcceptContentNegotiation
+from apps.core.renderers import FastJSONRenderer, MessagePackRenderer
+
+
+AUTH_HEADER_PREFIXES = tuple(f"{h} " for h in AUTH_HEADER_TYPES)
+
+
+def lean_viewset(viewset):
+    """
+    Returns a subclass of ``viewset`` that only accepts bearer tokens and
+    renders JSON, or MessagePack when asked for it exactly.
+    """
+    return type(viewset.__name__, (viewset,), {
+        "authentication_classes": [JWTAuthentication],
+        "renderer_classes": [FastJSONRenderer, MessagePackRenderer],
+        "content_negotiation_class": ExactAcceptContentNegotiation,
+    })
+
+
+def lean_router(*source_routers) -> routers.SimpleRouter:
+    router = routers.SimpleRouter()
+    for source in source_routers:
+        for prefix, viewset, basename in source.registry:
+            router.register(prefix, lean_viewset(viewset), f"lean-{basename}")
+    return router
+
+
+def is_lean_request(path: str, authorization: str) -> bool:
+    return (path.startswith(settings.LEAN_API["prefix"])
+            and authorization.startswith(AUTH_HEADER_PREFIXES))
+
+
+class LeanURLConfMiddleware:
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        request.urlconf = settings.LEAN_API["urlconf"]
+        return self.get_response(request)
+
+
+class LeanHandlerMixin:
+    """
+    Builds the handler's middleware chain from ``LEAN_API["middleware"]``
+    instead of ``MIDDLEWARE``.
+    """
+
+    def load_middleware(self, is_async=False):
+        # BaseHandler reads settings.MIDDLEWARE; handlers are built while
+        # the process starts, before any request thread could see the swap.
+        middleware = settings.MIDDLEWARE
+        settings.MIDDLEWARE = settings.LEAN_API["middleware"]
+        try:
+            super().load_middleware(is_async)
+        finally:
+            settings.MIDDLEWARE = middleware
+
+
+class LeanWSGIHandler(LeanHandlerMixin, WSGIHandler):
+    pass
+
+
+class LeanASGIHandler(LeanHandlerMixin, ASGIHandler):
+    pass
+
+
+class LeanWSGIDispatcher:
+    """
+    Sends bearer token requests under ``LEAN_API["prefix"]`` to the lean
+    handler and everything else (admin, docs, session clients) to
+    ``application``.
+    """
+
+    def __init__(self, application):
+        self.application = application
+        self.lean_application = LeanWSGIHandler()
+
+    def __call__(self, environ, start_response):
+        if is_lean_request(environ.get("PATH_INFO", ""),
+                           environ.get("HTTP_AUTHORIZATION", "")):
+            return self.lean_application(environ, start_response)
+        return self.application(environ, start_response)
+
+
+class LeanASGIDispatcher:
+
+    def __init__(self, application):
+        self.application = application
+        self.lean_application = LeanASGIHandler()
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "http":
+            authorization = dict(scope["headers"]).get(b"authorization", b"")
+            if is_lean_request(scope["path"],
+                               authorization.decode(HTTP_HEADER_ENCODING)):
+                return await self.lean_application(scope, receive, send)
+        return await self.application(scope, receive, send)
@@ -0,0 +1,26 @@
+from django.core.management.base import BaseCommand
+
+from apps.core.invalidation import get_bus
+
+
+class Command(BaseCommand):
+    help = ("Shows the hit rate and staleness of the in-process caches, "
+            "summed over the workers that reported recently.")
+
+    def handle(self, *args, **options):
+        rows = get_bus().stats()
+        if not rows:
+            self.stdout.write("No cache statistics reported.")
+            return
+        for (name, workers, hits, misses, invalidations, staleness_total,
+             staleness_max) in rows:
+            lookups = hits + misses
+            hit_rate = hits / lookups if lookups else 0
+            staleness = staleness_total / invalidations if invalidations \
+                else 0
+            self.stdout.write(
+                f"{name}: {workers} workers, {lookups} lookups, "
+                f"{hit_rate:.1%} hits, {invalidations} invalidations "
+                f"applied {staleness * 1000:.0f} ms after publishing on "
+                f"average, {staleness_max * 1000:.0f} ms at most"
+            )
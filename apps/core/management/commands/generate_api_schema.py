@@ -0,0 +1,19 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from rest_framework.compat import coreapi
+from rest_framework.schemas.coreapi import SchemaGenerator
+
+
+class Command(BaseCommand):
+    help = "Writes the public API schema to API_SCHEMA['path'] as CoreJSON."
+
+    def handle(self, *args, **options):
+        generator = SchemaGenerator(title=settings.API_SCHEMA["title"])
+        schema = generator.get_schema(request=None, public=True)
+        content = coreapi.codecs.CoreJSONCodec().encode(schema)
+
+        path = settings.API_SCHEMA["path"]
+        with open(path, "wb") as schema_file:
+            schema_file.write(content)
+        if options["verbosity"]:
+            self.stdout.write(f"Wrote API schema to {path}.")
@@ -0,0 +1,49 @@
+import os
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from apps.core.profiling import folded_stacks, merge_profiles, self_time
+
+
+class Command(BaseCommand):
+    help = ("Merges the recorded request profiles into one folded stack "
+            "file per endpoint, ready for a flame graph tool.")
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--directory", default=str(settings.PROFILING["directory"]),
+            help="Where ProfilingMiddleware wrote the profiles."
+        )
+        parser.add_argument(
+            "--output", default=None,
+            help="Where to write <endpoint>.folded (default: "
+                 "<directory>/report)."
+        )
+        parser.add_argument("--top", type=int, default=5,
+                            help="Hottest frames to list per endpoint.")
+
+    def handle(self, *args, **options):
+        report = merge_profiles(options["directory"])
+        if not report:
+            self.stdout.write("No profiles found.")
+            return
+        output = options["output"] or os.path.join(options["directory"],
+                                                   "report")
+        os.makedirs(output, exist_ok=True)
+
+        for endpoint, merged in report.items():
+            path = os.path.join(output, f"{endpoint}.folded")
+            with open(path, "w") as f:
+                f.write(folded_stacks(merged["samples"]))
+
+            durations = sorted(merged["durations"])
+            total = sum(merged["samples"].values())
+            self.stdout.write(
+                f"{endpoint}: {len(durations)} profiles, "
+                f"median {durations[len(durations) // 2] * 1e3:.1f} ms, "
+                f"max {durations[-1] * 1e3:.1f} ms -> {path}"
+            )
+            for frame, count in self_time(merged["samples"]).most_common(
+                    options["top"]):
+                self.stdout.write(f"  {count / total:6.1%}  {frame}")
@@ -0,0 +1,20 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from apps.core.profiling import PROFILE_HEADER, make_profile_token
+
+
+class Command(BaseCommand):
+    help = (f"Prints a signed {PROFILE_HEADER} header value that turns on "
+            f"profiling for the requests carrying it.")
+
+    def add_arguments(self, parser):
+        parser.add_argument("issued_by", help="Who the token is for.")
+
+    def handle(self, *args, **options):
+        token = make_profile_token(options["issued_by"])
+        if options["verbosity"] > 1:
+            self.stderr.write(
+                f"Valid for {settings.PROFILING['token_max_age']} seconds."
+            )
+        self.stdout.write(f"{PROFILE_HEADER}: {token}")
@@ -0,0 +1,157 @@
+import itertools
+import random
+import time
+
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils import timezone
+
+from apps.accounts.choices import UserRole
+from apps.accounts.models import User
+from apps.products.changes import record_changes
+from apps.products.models import Product
+
+
+STOCK_DISTRIBUTIONS = ("uniform", "skewed", "constant")
+
+
+class Command(BaseCommand):
+    help = ("Seeds large numbers of synthetic users and products for "
+            "performance testing.")
+
+    def add_arguments(self, parser):
+        parser.add_argument("--users", type=int, default=1_000_000)
+        parser.add_argument("--products", type=int, default=1_000_000)
+        parser.add_argument(
+            "--seller-ratio", type=float, default=0.1,
+            help="Share of the seeded users that are sellers."
+        )
+        parser.add_argument(
+            "--stock-distribution", choices=STOCK_DISTRIBUTIONS,
+            default="uniform",
+            help="uniform: 0..max-stock, skewed: most products low on "
+                 "stock, constant: every product has max-stock."
+        )
+        parser.add_argument("--max-stock", type=int, default=1000)
+        parser.add_argument(
+            "--out-of-stock-ratio", type=float, default=0.0,
+            help="Share of products seeded with no stock at all."
+        )
+        parser.add_argument("--password", default="1234test")
+        parser.add_argument("--prefix", default="seed")
+        parser.add_argument("--chunk-size", type=int, default=10_000)
+        parser.add_argument("--seed", type=int, default=0)
+
+    def handle(self, *args, **options):
+        for name in ("users", "products", "max_stock"):
+            if options[name] < 0:
+                raise CommandError(f"--{name.replace('_', '-')} can't be "
+                                   f"negative.")
+        if options["chunk_size"] <= 0:
+            raise CommandError("--chunk-size must be positive.")
+        if not 0 < options["seller_ratio"] <= 1:
+            raise CommandError("--seller-ratio must be in (0, 1].")
+        if not 0 <= options["out_of_stock_ratio"] <= 1:
+            raise CommandError("--out-of-stock-ratio must be in [0, 1].")
+        if options["products"] and not options["users"]:
+            raise CommandError("Products need at least one seeded seller.")
+        # Chunks commit one by one, so a clash must be caught before the
+        # first insert rather than halfway through.
+        if User.objects.filter(
+                username__startswith=f"{options['prefix']}-").exists():
+            raise CommandError(
+                f"Users with the prefix \"{options['prefix']}\" already "
+                f"exist. Pass another --prefix."
+            )
+
+        self.rng = random.Random(options["seed"])
+        self.options = options
+        started = time.perf_counter()
+
+        seller_ids = self.seed_users()
+        self.seed_products(seller_ids)
+
+        self.stdout.write(
+            f"Seeded {options['users']} users and {options['products']} "
+            f"products in {time.perf_counter() - started:.1f}s."
+        )
+
+    def chunks(self, total):
+        size = self.options["chunk_size"]
+        for start in range(0, total, size):
+            yield range(start, min(start + size, total))
+
+    def log_progress(self, label, done, total):
+        if self.options["verbosity"] > 1:
+            self.stdout.write(f"{label}: {done}/{total}")
+
+    def seed_users(self):
+        total = self.options["users"]
+        prefix = self.options["prefix"]
+        sellers = max(1, round(total * self.options["seller_ratio"]))
+        # Hashing is by far the most expensive part of creating a user, so
+        # every seeded user shares the same hash.
+        password = make_password(self.options["password"])
+        date_joined = timezone.now()
+
+        first_seller_id = None
+        for chunk in self.chunks(total):
+            users = []
+            for i in chunk:
+                role = UserRole.SELLER if i < sellers else UserRole.BUYER
+                users.append(User(
+                    username=f"{prefix}-{role.lower()}-{i}",
+                    password=password,
+                    role=role,
+                    deposit=(self.rng.randint(0, 20) * 5
+                             if role == UserRole.BUYER else 0),
+                    date_joined=date_joined,
+                ))
+            with transaction.atomic():
+                User.objects.bulk_create(users)
+            if first_seller_id is None:
+                first_seller_id = User.objects.get(
+                    username=f"{prefix}-seller-0"
+                ).pk
+            self.log_progress("users", chunk.stop, total)
+
+        if not total:
+            return []
+        return list(
+            User.objects
+            .filter(pk__gte=first_seller_id, role=UserRole.SELLER,
+                    username__startswith=f"{prefix}-seller-")
+            .order_by("pk")
+            .values_list("pk", flat=True)[:sellers]
+        )
+
+    def stock(self):
+        max_stock = self.options["max_stock"]
+        if self.rng.random() < self.options["out_of_stock_ratio"]:
+            return 0
+        distribution = self.options["stock_distribution"]
+        if distribution == "constant":
+            return max_stock
+        if distribution == "skewed":
+            return int(max_stock * self.rng.random() ** 3)
+        return self.rng.randint(0, max_stock)
+
+    def seed_products(self, seller_ids):
+        total = self.options["products"]
+        prefix = self.options["prefix"]
+        sellers = itertools.cycle(seller_ids)
+        for chunk in self.chunks(total):
+            products = [
+                Product(
+                    name=f"{prefix} product {i}",
+                    seller_id=next(sellers),
+                    cost=self.rng.randint(1, 20) * 5,
+                    amount_available=self.stock(),
+                )
+                for i in chunk
+            ]
+            with transaction.atomic():
+                Product.objects.bulk_create(products)
+                record_changes(product.pk for product in products)
+            self.log_progress("products", chunk.stop, total)
@@ -0,0 +1,47 @@
+import logging
+import sys
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from apps.core.server import PreforkServer
+
+
+class Command(BaseCommand):
+    help = ("Serves the WSGI application with a preloading, pre-forking "
+            "master. SIGHUP reloads gracefully, SIGTERM stops.")
+
+    def add_arguments(self, parser):
+        config = settings.SERVE
+        parser.add_argument("--bind", default=config["bind"],
+                            help="host:port to listen on.")
+        parser.add_argument("--workers", type=int, default=config["workers"],
+                            help="Worker processes to fork.")
+        parser.add_argument(
+            "--graceful-timeout", type=float,
+            default=config["graceful_timeout"],
+            help="Seconds workers get to finish their requests on stop "
+                 "or reload."
+        )
+        parser.add_argument(
+            "--no-freeze", dest="freeze", action="store_false",
+            help="Skip gc.freeze() after preloading."
+        )
+
+    def handle(self, *args, **options):
+        logger = logging.getLogger("apps.core.server")
+        if not logger.handlers:
+            handler = logging.StreamHandler(sys.stderr)
+            handler.setFormatter(logging.Formatter(
+                "[%(asctime)s] %(levelname)s %(message)s"
+            ))
+            logger.addHandler(handler)
+            logger.setLevel(logging.INFO)
+
+        PreforkServer(
+            application=settings.WSGI_APPLICATION,
+            bind=options["bind"],
+            workers=options["workers"],
+            graceful_timeout=options["graceful_timeout"],
+            freeze=options["freeze"],
+        ).run()
@@ -0,0 +1,16 @@
+from rest_framework.negotiation import DefaultContentNegotiation
+
+
+class ExactAcceptContentNegotiation(DefaultContentNegotiation):
+    """
+    Skips parsing the Accept header: a renderer is picked only when the
+    header is exactly its media type, otherwise the first renderer is used.
+    """
+
+    def select_renderer(self, request, renderers, format_suffix=None):
+        accept = request.META.get("HTTP_ACCEPT")
+        for renderer in renderers:
+            if accept == renderer.media_type:
+                return renderer, renderer.media_type
+        renderer = renderers[0]
+        return renderer, renderer.media_type
@@ -0,0 +1,212 @@
+import json
+import os
+import random
+import sys
+import threading
+import time
+import uuid
+from collections import Counter
+
+from django.conf import settings
+from django.core import signing
+from django.core.exceptions import MiddlewareNotUsed
+
+
+PROFILE_HEADER = "X-Profile"
+SIGNING_SALT = "apps.core.profiling"
+
+
+def make_profile_token(issued_by: str) -> str:
+    """
+    Returns a value for the ``X-Profile`` header that turns profiling on
+    for requests carrying it until ``PROFILING["token_max_age"]`` passes.
+    """
+    return signing.dumps({"by": issued_by}, salt=SIGNING_SALT)
+
+
+def valid_profile_token(token: str) -> bool:
+    try:
+        signing.loads(token, salt=SIGNING_SALT,
+                      max_age=settings.PROFILING["token_max_age"])
+    except signing.BadSignature:
+        return False
+    return True
+
+
+def frame_label(frame) -> str:
+    code = frame.f_code
+    module = frame.f_globals.get("__name__", "?")
+    # ";" separates frames in the folded stack format
+    return f"{module}:{code.co_name}".replace(";", ",")
+
+
+class StackSampler:
+    """
+    Samples the Python stacks of registered threads every ``interval``
+    seconds from one background thread, counting each distinct stack
+    (outermost frame first). Only threads being profiled are walked, and
+    the thread sleeps whenever nothing is registered.
+    """
+
+    def __init__(self, interval: float):
+        self.interval = interval
+        self._samples = {}
+        self._lock = threading.Lock()
+        self._active = threading.Event()
+        self._thread = None
+
+    def start(self, thread_id: int):
+        with self._lock:
+            self._samples[thread_id] = Counter()
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(
+                    target=self._run, name="stack-sampler", daemon=True
+                )
+                self._thread.start()
+        self._active.set()
+
+    def stop(self, thread_id: int) -> Counter:
+        with self._lock:
+            samples = self._samples.pop(thread_id)
+            if not self._samples:
+                self._active.clear()
+        return samples
+
+    def _run(self):
+        while True:
+            self._active.wait()
+            time.sleep(self.interval)
+            frames = sys._current_frames()
+            with self._lock:
+                for thread_id, samples in self._samples.items():
+                    frame = frames.get(thread_id)
+                    stack = []
+                    while frame is not None:
+                        stack.append(frame_label(frame))
+                        frame = frame.f_back
+                    if stack:
+                        samples[";".join(reversed(stack))] += 1
+
+
+def endpoint_of(view_func, method: str):
+    """
+    Returns ``(viewset, action)`` for a DRF viewset view, or the view's
+    name and ``None`` for anything else.
+    """
+    cls = getattr(view_func, "cls", None)
+    if cls is None:
+        return getattr(view_func, "__name__", "unknown"), None
+    actions = getattr(view_func, "actions", None) or {}
+    return cls.__name__, actions.get(method.lower())
+
+
+def write_profile(directory, profile: dict) -> str:
+    endpoint = ".".join(filter(None, [profile["viewset"],
+                                      profile["action"]]))
+    directory = os.path.join(str(directory), endpoint)
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(
+        directory, f"{int(profile['started_at'])}-{uuid.uuid4().hex}.json"
+    )
+    with open(path, "w") as f:
+        json.dump(profile, f)
+    return path
+
+
+class ProfilingMiddleware:
+    """
+    Profiles requests that carry a valid signed ``X-Profile`` header, plus
+    ``PROFILING["sample_rate"]`` of all other traffic. Each profile is
+    written as one JSON file under ``<directory>/<viewset>.<action>/``;
+    ``manage.py profile_report`` merges them per endpoint.
+    """
+
+    def __init__(self, get_response):
+        config = settings.PROFILING
+        if not config["enabled"]:
+            raise MiddlewareNotUsed()
+        self.get_response = get_response
+        self.sample_rate = config["sample_rate"]
+        self.directory = config["directory"]
+        self.sampler = StackSampler(config["interval"])
+
+    def should_profile(self, request) -> bool:
+        token = request.headers.get(PROFILE_HEADER)
+        if token is not None:
+            return valid_profile_token(token)
+        return self.sample_rate > 0 and random.random() < self.sample_rate
+
+    def __call__(self, request):
+        if not self.should_profile(request):
+            return self.get_response(request)
+
+        request._profile_endpoint = (None, None)
+        thread_id = threading.get_ident()
+        started_at, started = time.time(), time.perf_counter()
+        self.sampler.start(thread_id)
+        try:
+            response = self.get_response(request)
+        finally:
+            samples = self.sampler.stop(thread_id)
+        viewset, action = request._profile_endpoint
+        write_profile(self.directory, {
+            "viewset": viewset or "unresolved",
+            "action": action,
+            "method": request.method,
+            "path": request.path,
+            "status": response.status_code,
+            "started_at": started_at,
+            "duration": time.perf_counter() - started,
+            "interval": self.sampler.interval,
+            "samples": samples,
+        })
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        if hasattr(request, "_profile_endpoint"):
+            request._profile_endpoint = endpoint_of(view_func, request.method)
+
+
+def merge_profiles(directory) -> dict:
+    """
+    Merges every profile under ``directory`` per endpoint. Returns
+    ``{endpoint: {"durations": [...], "samples": Counter}}``.
+    """
+    report = {}
+    directory = str(directory)
+    if not os.path.isdir(directory):
+        return report
+    for endpoint in sorted(os.listdir(directory)):
+        endpoint_dir = os.path.join(directory, endpoint)
+        if not os.path.isdir(endpoint_dir):
+            continue
+        merged = {"durations": [], "samples": Counter()}
+        for name in sorted(os.listdir(endpoint_dir)):
+            if not name.endswith(".json"):
+                continue
+            with open(os.path.join(endpoint_dir, name)) as f:
+                profile = json.load(f)
+            merged["durations"].append(profile["duration"])
+            merged["samples"].update(profile["samples"])
+        if merged["durations"]:
+            report[endpoint] = merged
+    return report
+
+
+def folded_stacks(samples: Counter) -> str:
+    """
+    Renders samples in the folded stack format read by flamegraph.pl,
+    speedscope and most other flame graph tools.
+    """
+    return "".join(f"{stack} {count}\n"
+                   for stack, count in sorted(samples.items()))
+
+
+def self_time(samples: Counter) -> Counter:
+    """
+    Samples per innermost frame, i.e. where the time was actually spent.
+    """
+    leaves = Counter()
+    for stack, count in samples.items():
+        leaves[stack.rsplit(";", 1)[-1]] += count
+    return leaves
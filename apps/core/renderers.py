@@ -0,0 +1,93 @@
+import math
+
+import msgpack
+import orjson
+from rest_framework import renderers
+
+
+LINE_SEPARATORS = (
+    ("\u2028".encode(), b"\\u2028"),
+    ("\u2029".encode(), b"\\u2029"),
+)
+
+
+SCALARS = (str, int, bool, type(None))
+
+
+def has_unportable_float(data) -> bool:
+    """
+    True when ``data`` holds a float orjson would format differently from
+    ``json``: exponent notation (``1e16`` vs ``1e+16``) or NaN/Infinity,
+    which orjson writes as ``null``.
+    """
+    stack = [data]
+    while stack:
+        value = stack.pop()
+        if type(value) in SCALARS:
+            continue
+        if isinstance(value, float):
+            if not math.isfinite(value) or "e" in repr(value):
+                return True
+        elif isinstance(value, dict):
+            for key, item in value.items():
+                if isinstance(key, float):
+                    return True
+                if type(item) not in SCALARS:
+                    stack.append(item)
+        elif isinstance(value, (list, tuple)):
+            stack.extend(value)
+    return False
+
+
+class FastJSONRenderer(renderers.JSONRenderer):
+    """
+    Drop-in ``JSONRenderer`` backed by orjson. Types orjson doesn't produce
+    byte-for-byte the same way (datetimes, decimals, lazy strings, ...) are
+    handed to DRF's ``JSONEncoder``. Floats orjson formats differently,
+    anything it can't encode at all, and indented or non-compact output go
+    through the stock renderer.
+    """
+    options = (orjson.OPT_PASSTHROUGH_DATETIME
+               | orjson.OPT_PASSTHROUGH_DATACLASS
+               | orjson.OPT_NON_STR_KEYS)
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b""
+
+        indent = self.get_indent(accepted_media_type, renderer_context or {})
+        if (indent is not None or self.ensure_ascii or not self.compact
+                or has_unportable_float(data)):
+            return super().render(data, accepted_media_type, renderer_context)
+
+        encoder = self.encoder_class()
+
+        def default(obj):
+            value = encoder.default(obj)
+            if has_unportable_float(value):
+                raise TypeError("Rendered by the stock encoder")
+            return value
+
+        try:
+            ret = orjson.dumps(data, default=default, option=self.options)
+        except orjson.JSONEncodeError:
+            return super().render(data, accepted_media_type, renderer_context)
+
+        for separator, escaped in LINE_SEPARATORS:
+            if separator in ret:
+                ret = ret.replace(separator, escaped)
+        return ret
+
+
+class MessagePackRenderer(renderers.BaseRenderer):
+    media_type = "application/msgpack"
+    format = "msgpack"
+    charset = None
+    render_style = "binary"
+    encoder_class = FastJSONRenderer.encoder_class
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b""
+        return msgpack.packb(data, default=self.encoder_class().default)
+
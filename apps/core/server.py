@@ -0,0 +1,209 @@
+import gc
+import logging
+import os
+import signal
+import socket
+import socketserver
+import sys
+import threading
+import time
+from wsgiref.simple_server import WSGIRequestHandler, WSGIServer
+
+from django.conf import settings
+from django.db import connections
+from django.urls import get_resolver
+from django.utils.module_loading import import_string
+
+
+log = logging.getLogger(__name__)
+access_log = logging.getLogger("django.server")
+
+# Listening socket handed to the new master on a graceful reload
+LISTEN_FD_ENV = "SERVE_LISTEN_FD"
+
+
+def load_application(path: str):
+    """
+    Imports the WSGI application along with everything a first request
+    would import: the URLconfs, and through them every view, serializer
+    and model module.
+    """
+    application = import_string(path)
+    get_resolver().url_patterns
+    if settings.LEAN_API["enabled"]:
+        get_resolver(settings.LEAN_API["urlconf"]).url_patterns
+    return application
+
+
+class WorkerRequestHandler(WSGIRequestHandler):
+
+    def get_environ(self):
+        # Once in the environ, X-Forwarded_For would pass for
+        # X-Forwarded-For; drop headers with underscores like other
+        # servers do.
+        for name in [name for name in self.headers if "_" in name]:
+            del self.headers[name]
+        return super().get_environ()
+
+    def log_message(self, format, *args):
+        access_log.info("%s %s", self.address_string(), format % args)
+
+
+class WorkerWSGIServer(socketserver.ThreadingMixIn, WSGIServer):
+    """
+    The standard library's WSGI server with a thread per connection.
+    """
+
+    # In-flight requests are waited for when the worker stops.
+    daemon_threads = False
+    block_on_close = True
+    request_queue_size = 1000
+
+    def close_request(self, request):
+        # The thread that served it is done with its connections.
+        connections.close_all()
+        super().close_request(request)
+
+
+class PreforkServer:
+    """
+    Pre-forking WSGI server. The master imports the application once,
+    moves everything allocated so far out of the garbage collector's reach
+    (``gc.freeze``) so collections in the workers don't write to, and so
+    copy, those pages, and then forks ``workers`` processes that serve the
+    shared listening socket with a thread per connection.
+
+    Signals to the master:
+
+    * ``SIGTERM``/``SIGINT``: workers stop accepting, finish their requests
+      (for up to ``graceful_timeout`` seconds) and exit.
+    * ``SIGHUP``: graceful reload. Workers are stopped the same way and the
+      master re-executes itself with the listening socket kept open, so
+      new code is loaded and connections wait in the backlog meanwhile.
+
+    Workers that die are replaced.
+    """
+
+    def __init__(self, *, application: str, bind: str, workers: int,
+                 graceful_timeout: float, freeze: bool = True):
+        self.application_path = application
+        self.bind = bind
+        self.workers = workers
+        self.graceful_timeout = graceful_timeout
+        self.freeze = freeze
+        self.children = {}
+        self._signal = None
+
+    def listen(self) -> socket.socket:
+        inherited = os.environ.pop(LISTEN_FD_ENV, None)
+        if inherited is not None:
+            return socket.socket(fileno=int(inherited))
+        host, _, port = self.bind.rpartition(":")
+        sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        sock.bind((host or "0.0.0.0", int(port)))
+        sock.listen(WorkerWSGIServer.request_queue_size)
+        return sock
+
+    def run(self):
+        self.socket = self.listen()
+        started = time.perf_counter()
+        self.application = load_application(self.application_path)
+        # Forked workers must not share the master's connections.
+        connections.close_all()
+        if self.freeze:
+            gc.collect()
+            gc.freeze()
+        log.info("Master %d listening on %s:%d, preloaded in %.0f ms",
+                 os.getpid(), *self.socket.getsockname()[:2],
+                 (time.perf_counter() - started) * 1000)
+
+        for signum in (signal.SIGTERM, signal.SIGINT, signal.SIGHUP):
+            signal.signal(signum, self.handle_signal)
+        for _ in range(self.workers):
+            self.spawn()
+
+        while self._signal is None:
+            self.reap(respawn=True)
+            time.sleep(0.2)
+
+        self.stop_workers()
+        if self._signal == signal.SIGHUP:
+            self.reexec()
+
+    def handle_signal(self, signum, frame):
+        self._signal = signum
+
+    def spawn(self):
+        pid = os.fork()
+        if pid:
+            self.children[pid] = time.monotonic()
+            return
+        # Worker: never returns into the master's loop.
+        for signum in (signal.SIGTERM, signal.SIGINT, signal.SIGHUP):
+            signal.signal(signum, signal.SIG_DFL)
+        sys.exit(self.serve())
+
+    def serve(self) -> int:
+        started = time.perf_counter()
+        server = WorkerWSGIServer(
+            self.socket.getsockname(), WorkerRequestHandler,
+            bind_and_activate=False
+        )
+        server.socket.close()
+        server.socket = self.socket
+        # What server_bind() would have set up
+        host, port = self.socket.getsockname()[:2]
+        server.server_name, server.server_port = socket.getfqdn(host), port
+        server.setup_environ()
+        server.set_app(self.application)
+
+        def stop(signum, frame):
+            threading.Thread(target=server.shutdown).start()
+
+        signal.signal(signal.SIGTERM, stop)
+        signal.signal(signal.SIGINT, signal.SIG_IGN)
+        log.info("Worker %d ready in %.0f ms", os.getpid(),
+                 (time.perf_counter() - started) * 1000)
+        server.serve_forever()
+        server.server_close()
+        return 0
+
+    def reap(self, respawn: bool):
+        while self.children:
+            try:
+                pid, status = os.waitpid(-1, os.WNOHANG)
+            except ChildProcessError:
+                self.children.clear()
+                return
+            if not pid:
+                return
+            spawned_at = self.children.pop(pid, None)
+            if spawned_at is None or not respawn:
+                continue
+            log.warning("Worker %d exited with %d, replacing it", pid,
+                        os.waitstatus_to_exitcode(status))
+            if time.monotonic() - spawned_at < 1:
+                # Don't spin on a worker that fails while starting.
+                time.sleep(1)
+            self.spawn()
+
+    def stop_workers(self):
+        for pid in self.children:
+            os.kill(pid, signal.SIGTERM)
+        deadline = time.monotonic() + self.graceful_timeout
+        while self.children and time.monotonic() < deadline:
+            self.reap(respawn=False)
+            time.sleep(0.05)
+        for pid in self.children:
+            log.warning("Worker %d did not stop in time, killing it", pid)
+            os.kill(pid, signal.SIGKILL)
+        while self.children:
+            self.reap(respawn=False)
+            time.sleep(0.05)
+
+    def reexec(self):
+        log.info("Reloading master %d", os.getpid())
+        self.socket.set_inheritable(True)
+        os.environ[LISTEN_FD_ENV] = str(self.socket.fileno())
+        os.execv(sys.executable, [sys.executable] + sys.argv)
@@ -0,0 +1,55 @@
+from typing import Iterable, Optional, Tuple
+
+from rest_framework.exceptions import ValidationError
+
+
+FIELDS_PARAM = "fields"
+EXPAND_PARAM = "expand"
+
+
+def _names(request, param: str, allowed: Iterable[str]) -> Optional[set]:
+    value = request.query_params.get(param)
+    if value is None:
+        return None
+    names = {name.strip() for name in value.split(",") if name.strip()}
+    unknown = sorted(names - set(allowed))
+    if unknown:
+        raise ValidationError({param: [
+            f"Unknown field: {name}." for name in unknown
+        ]})
+    return names
+
+
+def parse_fieldset(request, *, fields: Iterable[str],
+                   expandable: Iterable[str] = ()
+                   ) -> Tuple[Optional[set], set]:
+    """
+    Reads ``?fields=a,b`` and ``?expand=c`` from the query string. Returns
+    the requested fields (``None`` for all of them) and the relations to
+    expand, or raises a ``ValidationError`` naming unknown ones.
+    """
+    return (
+        _names(request, FIELDS_PARAM, fields),
+        _names(request, EXPAND_PARAM, expandable) or set(),
+    )
+
+
+class SparseFieldsetMixin:
+    """
+    Serializer mixin that keeps only the fields named in the ``fields``
+    context entry (all when it is missing). Fields listed in
+    ``expandable_fields`` are only rendered when named in ``expand``.
+    """
+    expandable_fields = ()
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        fields = self.context.get(FIELDS_PARAM)
+        expand = self.context.get(EXPAND_PARAM, ())
+        for name in list(self.fields):
+            if name in self.expandable_fields:
+                keep = name in expand
+            else:
+                keep = fields is None or name in fields
+            if not keep:
+                self.fields.pop(name)
@@ -0,0 +1,98 @@
+from rest_framework import status
+from rest_framework.reverse import reverse
+from rest_framework.test import APITestCase
+
+from apps.accounts.choices import UserRole
+from apps.accounts.models import User
+from apps.products.models import Product
+
+
+class BatchTestCase(APITestCase):
+
+    def setUp(self):
+        seller = User.objects.create_user(
+            username="mrsmith", password="1234test", role=UserRole.SELLER
+        )
+        self.product = Product.objects.create(
+            name="Product 0", cost=10, amount_available=5, seller=seller
+        )
+        self.buyer = User.objects.create_user(
+            username="johndoe", password="1234test", role=UserRole.BUYER
+        )
+        self.url = reverse("batch")
+
+    def batch(self, requests, atomic=False):
+        response = self.client.post(
+            self.url, data={"atomic": atomic, "requests": requests},
+            format="json"
+        )
+        assert response.status_code == status.HTTP_200_OK
+        return response.data
+
+    def deposit(self, amount):
+        return {"method": "POST", "path": reverse("deposit-list"),
+                "body": {"amount": amount}}
+
+    def buy(self, amount):
+        return {"method": "POST", "path": reverse("buy-list"),
+                "body": {"product_id": self.product.pk,
+                         "amount_products": amount}}
+
+    def test_machine_session_in_one_request(self):
+        data = self.batch([
+            {"method": "POST", "path": reverse("login-list"),
+             "body": {"username": "johndoe", "password": "1234test"}},
+            self.deposit(20),
+            self.deposit(5),
+            self.buy(2),
+            {"method": "GET", "path": reverse("reset-list")},
+        ])
+        assert [item["status"] for item in data["responses"]] == \
+            [200, 200, 200, 200, 200]
+        assert data["responses"][3]["body"] == {
+            "change": 5, "product_name": "Product 0", "total_cost": 20
+        }
+        assert data["responses"][4]["body"] == {"deposit": 0}
+        self.product.refresh_from_db()
+        assert self.product.amount_available == 3
+
+    def test_per_item_status_codes(self):
+        self.client.force_login(self.buyer)
+        data = self.batch([
+            self.buy(1),
+            {"method": "GET",
+             "path": reverse("products-detail", args=[self.product.pk])},
+            {"method": "GET", "path": "/admin/"},
+        ])
+        assert data["committed"]
+        assert [item["status"] for item in data["responses"]] == \
+            [400, 200, 404]
+        assert data["responses"][1]["headers"]["ETag"] == '"1"'
+
+    def test_unauthenticated_sub_requests_are_rejected(self):
+        data = self.batch([self.deposit(5)])
+        assert data["responses"][0]["status"] in (
+            status.HTTP_401_UNAUTHORIZED, status.HTTP_403_FORBIDDEN
+        )
+
+    def test_atomic_batch_rolls_back_on_the_first_failure(self):
+        self.client.force_login(self.buyer)
+        data = self.batch([self.deposit(20), self.buy(3), self.buy(1)],
+                          atomic=True)
+        assert not data["committed"]
+        assert [item["status"] for item in data["responses"]] == [200, 400]
+        self.buyer.refresh_from_db()
+        assert self.buyer.deposit == 0
+
+        data = self.batch([self.deposit(20), self.buy(2)], atomic=True)
+        assert data["committed"]
+        self.buyer.refresh_from_db()
+        assert self.buyer.deposit == 0
+        self.product.refresh_from_db()
+        assert self.product.amount_available == 3
+
+    def test_batch_size_is_limited(self):
+        response = self.client.post(self.url, data={
+            "requests": [self.deposit(5)] * 21
+        }, format="json")
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
@@ -0,0 +1,89 @@
+from django.db import connection
+from django.http import QueryDict
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from rest_framework import serializers
+from rest_framework.exceptions import ValidationError
+
+from apps.accounts.choices import UserRole
+from apps.accounts.models import User
+from apps.accounts.views import DepositViewsSet
+from apps.core.compiled import compile_serializer
+from apps.products.models import Product
+from apps.products.views import BuyProductViewSet
+
+
+def outcome(validate, data):
+    try:
+        return "valid", validate(data)
+    except ValidationError as exc:
+        return "invalid", exc.detail
+
+
+def serializer_outcome(serializer_class, data):
+    serializer = serializer_class(data=data)
+    if serializer.is_valid():
+        return "valid", dict(serializer.validated_data)
+    return "invalid", serializer.errors
+
+
+class CompiledSerializerTestCase(TestCase):
+
+    def setUp(self):
+        seller = User.objects.create_user(
+            username="mrsmith", password="1234test", role=UserRole.SELLER
+        )
+        self.product = Product.objects.create(
+            name="Product 0", cost=10, amount_available=5, seller=seller
+        )
+
+    def assert_same_as_serializer(self, view, payloads):
+        for data in payloads:
+            with self.subTest(data=data):
+                compiled = outcome(view.validate_input, data)
+                expected = serializer_outcome(view.InputSerializer, data)
+                assert compiled == expected
+                if compiled[0] == "invalid":
+                    # Same messages and the same error codes
+                    assert ValidationError(compiled[1]).get_codes() == \
+                        ValidationError(expected[1]).get_codes()
+
+    def test_deposit_matches_the_serializer(self):
+        self.assert_same_as_serializer(DepositViewsSet, [
+            {"amount": 5}, {"amount": "5"}, {"amount": "5.0"},
+            {"amount": 0}, {"amount": 1001}, {"amount": "abc"},
+            {"amount": True}, {"amount": None}, {"amount": 1.5},
+            {"amount": "9" * 1001}, {}, [], "amount",
+            QueryDict("amount=10"), QueryDict("amount="),
+            QueryDict("amount=1&amount=2000"),
+        ])
+
+    def test_buy_matches_the_serializer(self):
+        pk = self.product.pk
+        self.assert_same_as_serializer(BuyProductViewSet, [
+            {"product_id": pk, "amount_products": 2},
+            {"product_id": str(pk), "amount_products": "2"},
+            {"product_id": pk + 1, "amount_products": 2},
+            {"product_id": "x", "amount_products": 0},
+            {"product_id": True, "amount_products": 2},
+            {"product_id": None}, {},
+            QueryDict(f"product_id={pk}&amount_products=3"),
+        ])
+
+    def test_product_is_read_once(self):
+        with CaptureQueriesContext(connection) as queries:
+            validated = BuyProductViewSet.validate_input(
+                {"product_id": self.product.pk, "amount_products": 1}
+            )
+        assert validated["product_id"] == self.product
+        assert len(queries.captured_queries) == 1
+
+    def test_validate_hooks_fall_back_to_the_serializer(self):
+        class HookSerializer(serializers.Serializer):
+            amount = serializers.IntegerField()
+
+            def validate_amount(self, value):
+                raise serializers.ValidationError("No.")
+
+        assert outcome(compile_serializer(HookSerializer), {"amount": 1}) \
+            == ("invalid", {"amount": ["No."]})
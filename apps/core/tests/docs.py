@@ -0,0 +1,51 @@
+import os
+import tempfile
+
+from django.conf import settings
+from django.core.management import call_command
+from django.test import override_settings
+from rest_framework import status
+from rest_framework.schemas.coreapi import SchemaGenerator
+from rest_framework.test import APITestCase
+
+from apps.accounts.choices import UserRole
+from apps.accounts.models import User
+from apps.core.docs import get_docs_views, load_schema
+
+
+class PrecomputedSchemaTestCase(APITestCase):
+
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.api_schema = {
+            **settings.API_SCHEMA,
+            "path": os.path.join(tmp.name, "schema.corejson"),
+        }
+        get_docs_views.cache_clear()
+        self.addCleanup(get_docs_views.cache_clear)
+        self.user = User.objects.create_user(
+            username="johndoe", password="1234test", role=UserRole.BUYER
+        )
+
+    def test_docs_served_from_artifact(self):
+        with override_settings(API_SCHEMA=self.api_schema):
+            assert load_schema() is None
+            call_command("generate_api_schema")
+            assert load_schema() == SchemaGenerator(
+                title="MVP API project"
+            ).get_schema(public=True)
+
+            self.client.force_login(self.user)
+            response = self.client.get("/")
+            assert response.status_code == status.HTTP_200_OK
+            assert b"MVP API project" in response.content
+
+            response = self.client.get("/schema.js")
+            assert response.status_code == status.HTTP_200_OK
+
+    def test_docs_fall_back_to_introspection(self):
+        with override_settings(API_SCHEMA=self.api_schema):
+            self.client.force_login(self.user)
+            response = self.client.get("/")
+            assert response.status_code == status.HTTP_200_OK
@@ -0,0 +1,92 @@
+import datetime
+import logging
+
+from django.core.management import call_command
+from rest_framework import status
+from rest_framework.reverse import reverse
+from rest_framework.test import APITestCase
+
+from apps.accounts.choices import UserRole
+from apps.accounts.models import User
+from apps.core.idempotency import REPLAYED_HEADER
+from apps.core.models import IdempotencyKey
+from apps.core.throttling import get_store
+from apps.products.models import Product
+
+
+log = logging.getLogger(__file__)
+
+
+class IdempotencyKeyTestCase(APITestCase):
+
+    def setUp(self):
+        get_store().clear()
+        self.addCleanup(get_store().clear)
+        self.buyer = User.objects.create_user(
+            username="johndoe", password="1234test", role=UserRole.BUYER
+        )
+        self.seller = User.objects.create_user(
+            username="mrsmith", password="1234test", role=UserRole.SELLER
+        )
+        self.product = Product.objects.create(
+            name="Product 0", cost=10, amount_available=5, seller=self.seller
+        )
+        self.deposit_url = reverse("deposit-list")
+        self.buy_product_url = reverse("buy-list")
+        self.client.force_login(self.buyer)
+
+    def test_deposit_replayed(self):
+        headers = {"HTTP_IDEMPOTENCY_KEY": "coin-1"}
+        response = self.client.post(self.deposit_url, {"amount": 10},
+                                    **headers)
+        assert response.status_code == status.HTTP_200_OK
+        assert REPLAYED_HEADER not in response
+
+        replayed = self.client.post(self.deposit_url, {"amount": 10},
+                                    **headers)
+        assert replayed.status_code == status.HTTP_200_OK
+        assert replayed[REPLAYED_HEADER] == "true"
+        assert replayed.data == response.data
+
+        self.buyer.refresh_from_db()
+        assert self.buyer.deposit == 10
+
+        response = self.client.post(self.deposit_url, {"amount": 20},
+                                    **headers)
+        log.debug(response.data)
+        assert response.status_code == status.HTTP_422_UNPROCESSABLE_ENTITY
+
+    def test_buy_replayed(self):
+        self.buyer.deposit = 100
+        self.buyer.save()
+        data = {"product_id": self.product.id, "amount_products": 2}
+        headers = {"HTTP_IDEMPOTENCY_KEY": "buy-1"}
+
+        response = self.client.post(self.buy_product_url, data, **headers)
+        assert response.status_code == status.HTTP_200_OK
+        replayed = self.client.post(self.buy_product_url, data, **headers)
+        assert replayed.data == response.data
+
+        self.product.refresh_from_db()
+        self.buyer.refresh_from_db()
+        assert self.product.amount_available == 3
+        assert self.buyer.deposit == 80
+
+    def test_expired_keys(self):
+        headers = {"HTTP_IDEMPOTENCY_KEY": "coin-1"}
+        self.client.post(self.deposit_url, {"amount": 10}, **headers)
+        IdempotencyKey.objects.update(
+            created_at=datetime.datetime(2000, 1, 1, tzinfo=datetime.timezone.utc)
+        )
+
+        response = self.client.post(self.deposit_url, {"amount": 10},
+                                    **headers)
+        assert REPLAYED_HEADER not in response
+        self.buyer.refresh_from_db()
+        assert self.buyer.deposit == 20
+
+        IdempotencyKey.objects.update(
+            created_at=datetime.datetime(2000, 1, 1, tzinfo=datetime.timezone.utc)
+        )
+        call_command("purge_idempotency_keys", batch_size=1)
+        assert not IdempotencyKey.objects.exists()
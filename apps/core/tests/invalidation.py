@@ -0,0 +1,162 @@
+import sqlite3
+import time
+from io import StringIO
+from unittest import mock
+
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+
+from apps.accounts.choices import UserRole
+from apps.accounts.models import User
+from apps.core.invalidation import LocalCache, cache_key, get_bus
+from apps.products.catalog import get_product_cache, lookup_product
+from apps.products.models import Product
+from apps.products.services import buy_product, restock_products
+
+
+class InvalidationBusTestCase(TestCase):
+
+    def setUp(self):
+        self.bus = get_bus()
+        self.bus.clear()
+        self.addCleanup(self.bus.clear)
+        self.cache = LocalCache("test", self.bus, max_size=2,
+                                poll_interval=1, stats_interval=0)
+        self.now = time.time()
+        self.cache.sync(self.now)
+
+    def publish_elsewhere(self, key, published_at):
+        # As another worker would
+        self.bus.connection.execute(
+            "INSERT INTO invalidation (key, pid, published_at) "
+            "VALUES (?, 0, ?)", (key, published_at)
+        )
+
+    def test_lookups_are_counted(self):
+        assert self.cache.get("a", lambda: 1) == 1
+        assert self.cache.get("a", lambda: 2) == 1
+        assert self.cache.get("b", lambda: None) is None
+        assert self.cache.get("b", lambda: 3) == 3
+        assert (self.cache.hits, self.cache.misses) == (1, 3)
+
+    def test_least_recently_used_entries_are_evicted(self):
+        self.cache.get("a", lambda: 1)
+        self.cache.get("b", lambda: 2)
+        self.cache.get("a", lambda: 1)
+        self.cache.get("c", lambda: 3)
+        assert self.cache.get("a", lambda: "reloaded") == 1
+        assert self.cache.get("b", lambda: "reloaded") == "reloaded"
+
+    def test_invalidations_are_applied_after_the_poll_interval(self):
+        self.cache.get("a", lambda: 1)
+        self.publish_elsewhere("a", self.now + 0.1)
+
+        self.cache.sync(self.now + 0.5)
+        assert self.cache.get("a", lambda: 2) == 1
+
+        self.cache.sync(self.now + 1.1)
+        assert self.cache.get("a", lambda: 2) == 2
+        assert self.cache.invalidations == 1
+        assert abs(self.cache.staleness_max - 1.0) < 1e-6
+
+    def test_own_invalidations_do_not_count_as_stale(self):
+        self.cache.get("a", lambda: 1)
+        self.bus.publish(["a"], now=self.now)
+        self.cache.sync(self.now + 1)
+        assert self.cache.get("a", lambda: 2) == 2
+        assert self.cache.invalidations == 0
+
+    def test_value_invalidated_while_loading_is_not_kept(self):
+        def load():
+            self.cache.invalidate(["a"])
+            return 1
+
+        assert self.cache.get("a", load) == 1
+        assert self.cache.get("a", lambda: 2) == 2
+
+    def test_cache_is_dropped_after_missing_the_retention(self):
+        self.cache.get("a", lambda: 1)
+        self.publish_elsewhere("a", self.now + 1)
+        self.bus.trim(now=self.now + self.bus.retention + 2)
+        assert self.bus.since(0) == []
+
+        self.cache.sync(self.now + self.bus.retention + 2)
+        assert self.cache.get("a", lambda: 2) == 2
+
+    def test_stats_command(self):
+        self.cache.get("a", lambda: 1)
+        self.cache.get("a", lambda: 1)
+        self.publish_elsewhere("a", self.now + 0.9)
+        self.cache.sync(self.now + 1)
+
+        out = StringIO()
+        call_command("cache_stats", stdout=out)
+        assert out.getvalue() == (
+            "test: 1 workers, 2 lookups, 50.0% hits, 1 invalidations "
+            "applied 100 ms after publishing on average, 100 ms at most\n"
+        )
+
+
+@override_settings(PRODUCT_CACHE={"enabled": True, "max_size": 100})
+class ProductCacheTestCase(TestCase):
+
+    def setUp(self):
+        get_bus().clear()
+        self.addCleanup(get_bus().clear)
+        self.seller = User.objects.create_user(
+            username="mrsmith", password="1234test", role=UserRole.SELLER
+        )
+        self.buyer = User.objects.create_user(
+            username="johndoe", password="1234test", role=UserRole.BUYER,
+            deposit=100
+        )
+        self.product = Product.objects.create(
+            name="Product 0", cost=10, amount_available=5, seller=self.seller
+        )
+        self.cache = get_product_cache()
+        self.cache.clear()
+
+    def test_writes_invalidate_the_cached_product(self):
+        assert lookup_product(self.product.pk).amount_available == 5
+        assert lookup_product(self.product.pk) is \
+            lookup_product(self.product.pk)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            restock_products(
+                queryset=Product.objects.filter(pk=self.product.pk),
+                quantity=3
+            )
+        assert lookup_product(self.product.pk).amount_available == 8
+        assert get_bus().since(0)[-1][1] == cache_key(Product,
+                                                      self.product.pk)
+
+    def test_buying_with_a_stale_entry_rechecks_the_row(self):
+        stale = lookup_product(self.product.pk)
+        # Changed by another worker that has not been polled yet
+        Product.objects.filter(pk=self.product.pk).update(amount_available=1)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            response, errors = buy_product(
+                product_id=lookup_product(self.product.pk),
+                amount_products=2, buyer=self.buyer
+            )
+        assert lookup_product(self.product.pk) is stale
+        assert response is None
+        assert errors == {"details": [
+            "Product insufficient stock. You can only buy a total of 1."
+        ]}
+
+    def test_failing_to_publish_does_not_fail_the_write(self):
+        lookup_product(self.product.pk)
+        self.cache.get("unrelated", lambda: 1)
+        error = sqlite3.OperationalError("database is locked")
+
+        with mock.patch.object(get_bus(), "publish", side_effect=error), \
+                self.assertLogs("apps.core.invalidation", "ERROR"), \
+                self.captureOnCommitCallbacks(execute=True):
+            restock_products(
+                queryset=Product.objects.filter(pk=self.product.pk),
+                quantity=3
+            )
+        assert self.cache.get("unrelated", lambda: 2) == 2
+        assert lookup_product(self.product.pk).amount_available == 8
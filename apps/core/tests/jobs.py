@@ -0,0 +1,91 @@
+import json
+import threading
+import time
+
+from django.test import TestCase
+
+from apps.core.jobs import (
+    BackgroundExecutor,
+    background_job,
+    get_executor
+)
+
+
+calls = []
+started = threading.Event()
+
+
+@background_job
+def record(value, *, times=1):
+    calls.extend([value] * times)
+
+
+@background_job
+def flaky(value):
+    calls.append(value)
+    if len(calls) < 3:
+        raise RuntimeError("not yet")
+
+
+@background_job
+def slow():
+    started.set()
+    time.sleep(0.2)
+    calls.append("slow")
+
+
+class BackgroundJobTestCase(TestCase):
+
+    def setUp(self):
+        calls.clear()
+        started.clear()
+        self.executor = get_executor()
+        self.executor.queue.clear()
+        self.addCleanup(self.executor.queue.clear)
+
+    def test_jobs_run_only_after_commit(self):
+        with self.captureOnCommitCallbacks() as callbacks:
+            record.delay("a", times=2)
+            assert self.executor.run_pending() == 0
+        for callback in callbacks:
+            callback()
+        assert self.executor.run_pending() == 1
+        assert calls == ["a", "a"]
+
+    def test_rolled_back_jobs_are_dropped(self):
+        with self.captureOnCommitCallbacks(execute=False) as callbacks:
+            record.delay("a")
+        assert len(callbacks) == 1
+        assert self.executor.run_pending() == 0
+
+    def test_failed_jobs_are_retried_with_backoff(self):
+        self.executor.queue.push(flaky.__module__ + ".flaky",
+                                 json.dumps([["x"], {}]))
+        assert self.executor.run_pending() == 1
+        assert calls == ["x"]
+        # Not due until the backoff has passed
+        assert self.executor.run_pending() == 0
+        run_at = self.executor.queue.next_run_at()
+        assert self.executor.backoff <= run_at - time.time() <= \
+            self.executor.backoff * 1.25
+
+        self.executor.queue.connection.execute("UPDATE job SET run_at = 0")
+        self.executor.run_pending()
+        self.executor.queue.connection.execute("UPDATE job SET run_at = 0")
+        self.executor.run_pending()
+        assert calls == ["x", "x", "x"]
+        assert self.executor.queue.next_run_at() is None
+
+    def test_pool_runs_jobs_and_drains_at_shutdown(self):
+        executor = BackgroundExecutor(
+            self.executor.queue, workers=1, max_attempts=2, backoff=0,
+            max_backoff=0, lease=60
+        )
+        executor.start()
+        executor.submit(slow.__module__ + ".slow", json.dumps([[], {}]))
+        executor.submit(record.__module__ + ".record",
+                        json.dumps([["b"], {}]))
+        assert started.wait(5)
+        executor.shutdown(timeout=5)
+        assert calls == ["slow", "b"]
+        assert executor.queue.next_run_at() is None
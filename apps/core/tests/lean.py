@@ -0,0 +1,77 @@
+import json
+import logging
+from wsgiref.util import setup_testing_defaults
+
+from django.conf import settings
+from django.core.handlers.wsgi import WSGIHandler
+from django.core.signals import request_started
+from django.db import close_old_connections
+from rest_framework import status
+from rest_framework.test import APITestCase
+
+from apps.accounts.choices import UserRole
+from apps.accounts.models import User
+from apps.accounts.services import generate_jwt_token
+from apps.core.lean import LeanWSGIDispatcher, LeanWSGIHandler
+from apps.products.models import Product
+
+
+log = logging.getLogger(__file__)
+
+
+class LeanAPITestCase(APITestCase):
+
+    def setUp(self):
+        # Same as django.test.Client: keep the test transaction's connection
+        request_started.disconnect(close_old_connections)
+        self.addCleanup(request_started.connect, close_old_connections)
+
+        self.seller = User.objects.create_user(
+            username="mrsmith", password="1234test", role=UserRole.SELLER
+        )
+        Product.objects.create(
+            name="Product 0", cost=10, amount_available=2, seller=self.seller
+        )
+        self.token, _ = generate_jwt_token(self.seller)
+        self.application = LeanWSGIDispatcher(WSGIHandler())
+
+    def request(self, path, authorization=None):
+        environ = {"PATH_INFO": path, "REQUEST_METHOD": "GET"}
+        if authorization:
+            environ["HTTP_AUTHORIZATION"] = authorization
+        setup_testing_defaults(environ)
+        started = {}
+
+        def start_response(status_line, headers):
+            started["status"] = int(status_line.split()[0])
+            started["headers"] = dict(headers)
+
+        body = b"".join(self.application(environ, start_response))
+        return started["status"], started["headers"], body
+
+    def test_bearer_requests_use_lean_pipeline(self):
+        status_code, headers, body = self.request(
+            "/api/lean/v1/products/", f"Bearer {self.token}"
+        )
+        log.debug(body)
+        assert status_code == status.HTTP_200_OK
+        assert headers["Content-Type"] == "application/json"
+        assert "X-Frame-Options" not in headers
+        assert "Set-Cookie" not in headers
+        assert len(json.loads(body)["results"]) == 1
+
+    def test_other_requests_use_full_pipeline(self):
+        status_code, headers, _ = self.request("/api/lean/v1/products/")
+        assert status_code == status.HTTP_401_UNAUTHORIZED
+        assert headers["X-Frame-Options"] == "DENY"
+
+        status_code, _, _ = self.request(
+            "/api/v1/products/", f"Bearer {self.token}"
+        )
+        assert status_code == status.HTTP_200_OK
+
+    def test_global_middleware_setting_untouched(self):
+        middleware = settings.MIDDLEWARE
+        handler = LeanWSGIHandler()
+        assert settings.MIDDLEWARE is middleware
+        assert handler._view_middleware == []
@@ -0,0 +1,87 @@
+import os
+import tempfile
+from collections import Counter
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import override_settings
+from rest_framework.reverse import reverse
+from rest_framework.test import APITestCase
+
+from apps.accounts.models import User
+from apps.core.profiling import (
+    folded_stacks,
+    make_profile_token,
+    merge_profiles,
+    self_time
+)
+
+
+class ProfilingTestCase(APITestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.settings = override_settings(PROFILING={
+            "enabled": True,
+            "sample_rate": 0.0,
+            "interval": 0.001,
+            "directory": self.directory,
+            "token_max_age": 60,
+        })
+        self.settings.enable()
+        self.addCleanup(self.settings.disable)
+        self.client.force_login(User.objects.create_user(
+            username="johndoe", password="1234test"
+        ))
+
+    def profiles(self):
+        return {endpoint: len(os.listdir(os.path.join(self.directory,
+                                                      endpoint)))
+                for endpoint in os.listdir(self.directory)}
+
+    def test_signed_header_profiles_the_request(self):
+        response = self.client.get(reverse("products-list"),
+                                   HTTP_X_PROFILE=make_profile_token("ops"))
+        assert response.status_code == 200
+        assert self.profiles() == {"ProductViewSet.list": 1}
+
+        [merged] = merge_profiles(self.directory).values()
+        assert merged["durations"][0] > 0
+
+    def test_unsigned_traffic_is_not_profiled(self):
+        self.client.get(reverse("products-list"))
+        self.client.get(reverse("products-list"), HTTP_X_PROFILE="forged")
+        assert self.profiles() == {}
+
+    def test_sample_rate(self):
+        with override_settings(PROFILING={
+            "enabled": True, "sample_rate": 1.0, "interval": 0.001,
+            "directory": self.directory, "token_max_age": 60,
+        }):
+            self.client.get(reverse("products-detail", args=[1]))
+            self.client.get(reverse("products-list"))
+        assert self.profiles() == {"ProductViewSet.retrieve": 1,
+                                   "ProductViewSet.list": 1}
+
+
+class ProfileReportTestCase(APITestCase):
+
+    def test_report_writes_folded_stacks_per_endpoint(self):
+        samples = Counter({"a:main;b:view;c:query": 3,
+                           "a:main;b:view": 1})
+        assert folded_stacks(samples) == \
+            "a:main;b:view 1\na:main;b:view;c:query 3\n"
+        assert self_time(samples) == {"c:query": 3, "b:view": 1}
+
+        directory = tempfile.mkdtemp()
+        with override_settings(PROFILING={
+            "enabled": True, "sample_rate": 1.0, "interval": 0.001,
+            "directory": directory, "token_max_age": 60,
+        }):
+            for _ in range(2):
+                self.client.get(reverse("products-list"))
+        out = StringIO()
+        call_command("profile_report", directory=directory, stdout=out)
+        assert out.getvalue().startswith("ProductViewSet.list: 2 profiles")
+        assert os.path.exists(os.path.join(directory, "report",
+                                           "ProductViewSet.list.folded"))
@@ -0,0 +1,117 @@
+import datetime
+import decimal
+import io
+import uuid
+
+import msgpack
+from django.utils.translation import gettext_lazy as _
+from rest_framework import status
+from rest_framework.exceptions import ErrorDetail
+from rest_framework.renderers import JSONRenderer
+from rest_framework.reverse import reverse
+from rest_framework.test import APITestCase
+
+from apps.accounts.choices import UserRole
+from apps.accounts.models import User
+from apps.core.parsers import FastJSONParser, MessagePackParser
+from apps.core.renderers import FastJSONRenderer, MessagePackRenderer
+from apps.core.throttling import get_store
+from apps.products.models import Product
+
+
+class FastJSONRendererTestCase(APITestCase):
+
+    def test_output_identical_to_json_renderer(self):
+        payloads = [
+            None,
+            {"count": 1, "next": None, "results": [
+                {"id": 1, "name": "Café ☕", "seller_id": 2, "cost": 5}
+            ]},
+            {"details": [ErrorDetail("Insufficient funds.", code="x")]},
+            {"expires_at": datetime.datetime(
+                2022, 8, 1, 12, 30, 15, 123456, tzinfo=datetime.timezone.utc
+            )},
+            {"day": datetime.date(2022, 8, 1), "time": datetime.time(1, 2)},
+            {"decimal": decimal.Decimal("1.50"), "uuid": uuid.uuid4()},
+            {"lazy": _("Personal info"), 1: "int key"},
+            {"separators": "a b c"},
+            {"big": 2 ** 70},
+            {"floats": [0.1, 1.5, -2.0, 123456.789, 1e15]},
+            {"f": 1e16, "g": 1e-7, "h": [2.5e-10]},
+            {"decimal": decimal.Decimal("1E+16")},
+            {1.5: "float key"},
+        ]
+        for data in payloads:
+            assert (FastJSONRenderer().render(data)
+                    == JSONRenderer().render(data)), data
+
+        for value in (float("nan"), float("inf"), float("-inf")):
+            with self.assertRaises(ValueError):
+                JSONRenderer().render({"value": [value]})
+            with self.assertRaises(ValueError):
+                FastJSONRenderer().render({"value": [value]})
+
+        indented = "application/json; indent=4"
+        assert (FastJSONRenderer().render({"a": [1]}, indented)
+                == JSONRenderer().render({"a": [1]}, indented))
+
+    def test_parsers_round_trip(self):
+        data = {"product_id": 1, "amount_products": 2, "name": "Café"}
+        assert FastJSONParser().parse(
+            io.BytesIO(FastJSONRenderer().render(data))
+        ) == data
+        assert MessagePackParser().parse(
+            io.BytesIO(MessagePackRenderer().render(data))
+        ) == data
+
+
+class ContentNegotiationTestCase(APITestCase):
+
+    def setUp(self):
+        get_store().clear()
+        self.addCleanup(get_store().clear)
+        self.buyer = User.objects.create_user(
+            username="johndoe", password="1234test", role=UserRole.BUYER
+        )
+        self.seller = User.objects.create_user(
+            username="mrsmith", password="1234test", role=UserRole.SELLER
+        )
+        self.product = Product.objects.create(
+            name="Product 0", cost=10, amount_available=5, seller=self.seller
+        )
+
+    def test_login_expires_at_format(self):
+        response = self.client.post(reverse("login-list"), {
+            "username": "johndoe", "password": "1234test"
+        }, format="json")
+        assert response.status_code == status.HTTP_200_OK
+        expires_at = response.json()["expires_at"]
+        assert datetime.datetime.strptime(expires_at, "%Y-%m-%dT%H:%M:%S.%f")
+
+    def test_msgpack_opt_in(self):
+        self.client.force_login(self.buyer)
+        url = reverse("products-list")
+
+        response = self.client.get(url)
+        assert response["Content-Type"] == "application/json"
+
+        response = self.client.get(url, HTTP_ACCEPT="application/msgpack")
+        assert response["Content-Type"] == "application/msgpack"
+        assert msgpack.unpackb(response.content)["results"][0]["id"] == (
+            self.product.id
+        )
+
+        self.buyer.deposit = 100
+        self.buyer.save()
+        response = self.client.post(
+            reverse("buy-list"),
+            data=msgpack.packb({
+                "product_id": self.product.id, "amount_products": 1
+            }),
+            content_type="application/msgpack",
+            HTTP_ACCEPT="application/msgpack"
+        )
+        assert response.status_code == status.HTTP_200_OK
+        assert msgpack.unpackb(response.content) == {
+            "change": 90, "product_name": "Product 0", "total_cost": 10
+        }
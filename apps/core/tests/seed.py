@@ -0,0 +1,61 @@
+from io import StringIO
+
+from django.core.management import CommandError, call_command
+from rest_framework.test import APITestCase
+
+from apps.accounts.choices import UserRole
+from apps.accounts.models import User
+from apps.products.models import Product, ProductChange
+
+
+class SeedDatabaseTestCase(APITestCase):
+
+    def test_seed_database(self):
+        call_command(
+            "seed_database", users=50, products=120, seller_ratio=0.2,
+            stock_distribution="constant", max_stock=7, chunk_size=16,
+            stdout=StringIO()
+        )
+
+        assert User.objects.count() == 50
+        assert User.objects.filter(role=UserRole.SELLER).count() == 10
+        assert Product.objects.count() == 120
+        assert not Product.objects.exclude(amount_available=7).exists()
+        assert not Product.objects.exclude(
+            seller__role=UserRole.SELLER
+        ).exists()
+        assert Product.objects.values("seller").distinct().count() == 10
+        # Every product is in the change feed, in id order.
+        assert list(ProductChange.objects.order_by("seq").values_list(
+            "product_id", flat=True)) == \
+            list(Product.objects.order_by("pk").values_list("pk", flat=True))
+
+        buyer = User.objects.get(username="seed-buyer-10")
+        assert buyer.check_password("1234test")
+
+    def test_rejects_bad_input(self):
+        bad_options = [
+            {"users": -1},
+            {"products": -1},
+            {"chunk_size": 0},
+            {"seller_ratio": 0},
+            {"out_of_stock_ratio": 1.5},
+            {"users": 0, "products": 1},
+        ]
+        for options in bad_options:
+            with self.assertRaises(CommandError):
+                call_command("seed_database", **{
+                    "users": 1, "products": 1, **options
+                }, stdout=StringIO())
+        assert not User.objects.exists()
+
+    def test_rejects_existing_prefix(self):
+        call_command("seed_database", users=2, products=1, stdout=StringIO())
+        with self.assertRaises(CommandError):
+            call_command("seed_database", users=2, products=1,
+                         stdout=StringIO())
+        assert User.objects.count() == 2
+
+        call_command("seed_database", users=2, products=1, prefix="again",
+                     stdout=StringIO())
+        assert User.objects.count() == 4
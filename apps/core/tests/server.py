@@ -0,0 +1,75 @@
+import os
+import signal
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.error
+import urllib.request
+
+from django.conf import settings
+from django.test import SimpleTestCase
+
+
+def status_of(url):
+    try:
+        with urllib.request.urlopen(url, timeout=5) as response:
+            return response.status
+    except urllib.error.HTTPError as e:
+        return e.code
+
+
+def children(pid):
+    with open(f"/proc/{pid}/task/{pid}/children") as f:
+        return set(map(int, f.read().split()))
+
+
+class ServeCommandTestCase(SimpleTestCase):
+
+    def start(self, workers):
+        with socket.socket() as sock:
+            sock.bind(("127.0.0.1", 0))
+            port = sock.getsockname()[1]
+        env = dict(os.environ, SQLITE_BD_NAME=os.path.join(
+            tempfile.mkdtemp(), "db.sqlite3"
+        ))
+        master = subprocess.Popen(
+            [sys.executable, "manage.py", "serve", f"--workers={workers}",
+             f"--bind=127.0.0.1:{port}"],
+            cwd=settings.BASE_DIR, env=env,
+            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+        )
+        self.addCleanup(master.kill)
+        url = f"http://127.0.0.1:{port}/api/v1/products/"
+        self.wait_until(lambda: self.responds(url))
+        return master, url
+
+    def responds(self, url):
+        try:
+            return status_of(url) == 401
+        except OSError:
+            return False
+
+    def wait_until(self, condition, timeout=15):
+        deadline = time.monotonic() + timeout
+        while not condition():
+            assert time.monotonic() < deadline
+            time.sleep(0.05)
+
+    def test_reload_and_stop(self):
+        master, url = self.start(workers=2)
+        self.wait_until(lambda: len(children(master.pid)) == 2)
+        workers = children(master.pid)
+
+        os.kill(workers.pop(), signal.SIGKILL)
+        self.wait_until(lambda: len(children(master.pid) - workers) == 1)
+
+        workers = children(master.pid)
+        master.send_signal(signal.SIGHUP)
+        self.wait_until(lambda: len(children(master.pid)) == 2 and
+                        not children(master.pid) & workers)
+        assert status_of(url) == 401
+
+        master.send_signal(signal.SIGTERM)
+        assert master.wait(timeout=15) == 0
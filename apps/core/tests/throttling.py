@@ -0,0 +1,177 @@
+import logging
+
+from django.conf import settings
+from django.test import override_settings
+from rest_framework import status
+from rest_framework.reverse import reverse
+from rest_framework.test import APITestCase
+
+from apps.accounts.choices import UserRole
+from apps.accounts.models import User
+from apps.core.throttling import get_store
+from apps.products.models import Product
+
+
+log = logging.getLogger(__file__)
+
+
+def rest_framework_settings(**rates):
+    return {
+        **settings.REST_FRAMEWORK,
+        "DEFAULT_THROTTLE_RATES": rates,
+    }
+
+
+class TokenBucketStoreTestCase(APITestCase):
+
+    def setUp(self):
+        self.store = get_store()
+        self.store.clear()
+        self.addCleanup(self.store.clear)
+
+    def test_consume_and_refill(self):
+        for _ in range(3):
+            allowed, _ = self.store.consume("key", 3, 1, now=100)
+            assert allowed
+
+        allowed, tokens = self.store.consume("key", 3, 1, now=100)
+        assert not allowed
+        assert tokens == 0
+
+        allowed, tokens = self.store.consume("key", 3, 1, now=101.5)
+        assert allowed
+        assert tokens == 0.5
+
+        allowed, tokens = self.store.consume("key", 3, 1, now=1000)
+        assert allowed
+        assert tokens == 2
+
+    def test_sweep_drops_full_buckets(self):
+        self.store.consume("full", 3, 1, now=100)
+        self.store.consume("empty", 3, 1, now=100)
+        self.store.consume("empty", 3, 1, now=100)
+
+        # "full" refills at 101, "empty" at 102
+        assert self.store.sweep(now=101) == 1
+        assert self.store.sweep(now=102) == 1
+        assert self.store.sweep(now=200) == 0
+
+
+class DepositThrottleTestCase(APITestCase):
+
+    def setUp(self):
+        get_store().clear()
+        self.addCleanup(get_store().clear)
+        self.buyer = User.objects.create_user(
+            username="johndoe", password="1234test", role=UserRole.BUYER
+        )
+        self.other_buyer = User.objects.create_user(
+            username="janedoe", password="1234test", role=UserRole.BUYER
+        )
+        self.deposit_url = reverse("deposit-list")
+
+    @override_settings(REST_FRAMEWORK=rest_framework_settings(
+        **{"deposit.user": "2/min"}
+    ))
+    def test_deposit_throttled_per_user(self):
+        self.client.force_login(self.buyer)
+        for _ in range(2):
+            response = self.client.post(self.deposit_url, {"amount": 5})
+            assert response.status_code == status.HTTP_200_OK
+
+        response = self.client.post(self.deposit_url, {"amount": 5})
+        log.debug(response.data)
+        assert response.status_code == status.HTTP_429_TOO_MANY_REQUESTS
+        assert "Retry-After" in response
+
+        self.client.force_login(self.other_buyer)
+        response = self.client.post(self.deposit_url, {"amount": 5})
+        assert response.status_code == status.HTTP_200_OK
+
+    @override_settings(REST_FRAMEWORK=rest_framework_settings(
+        **{"deposit.ip": "1/min"}
+    ))
+    def test_deposit_throttled_per_ip(self):
+        self.client.force_login(self.buyer)
+        response = self.client.post(self.deposit_url, {"amount": 5})
+        assert response.status_code == status.HTTP_200_OK
+
+        self.client.force_login(self.other_buyer)
+        response = self.client.post(self.deposit_url, {"amount": 5})
+        assert response.status_code == status.HTTP_429_TOO_MANY_REQUESTS
+
+
+class LoginThrottleTestCase(APITestCase):
+
+    def setUp(self):
+        get_store().clear()
+        self.addCleanup(get_store().clear)
+        self.login_url = reverse("login-list")
+
+    def login(self, username, **extra):
+        return self.client.post(self.login_url, {
+            "username": username, "password": "wrong"
+        }, **extra)
+
+    @override_settings(REST_FRAMEWORK=rest_framework_settings(
+        **{"login.user": "2/min"}
+    ))
+    def test_login_throttled_per_username(self):
+        for _ in range(2):
+            response = self.login("johndoe")
+            assert response.status_code == status.HTTP_400_BAD_REQUEST
+
+        response = self.login("johndoe", REMOTE_ADDR="10.0.0.2")
+        assert response.status_code == status.HTTP_429_TOO_MANY_REQUESTS
+
+        response = self.login("janedoe")
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+
+    @override_settings(REST_FRAMEWORK=rest_framework_settings(
+        **{"login.ip": "1/min"}
+    ))
+    def test_login_throttled_per_ip(self):
+        response = self.login("johndoe")
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+
+        # A forged X-Forwarded-For must not open a fresh bucket
+        response = self.login("janedoe", HTTP_X_FORWARDED_FOR="10.9.9.9")
+        assert response.status_code == status.HTTP_429_TOO_MANY_REQUESTS
+
+        response = self.login("janedoe", REMOTE_ADDR="10.0.0.2")
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+
+
+class BuyThrottleTestCase(APITestCase):
+
+    def setUp(self):
+        get_store().clear()
+        self.addCleanup(get_store().clear)
+        self.buyer = User.objects.create_user(
+            username="johndoe", password="1234test", role=UserRole.BUYER
+        )
+        self.buyer.deposit = 100
+        self.buyer.save()
+        seller = User.objects.create_user(
+            username="mrsmith", password="1234test", role=UserRole.SELLER
+        )
+        self.product = Product.objects.create(
+            name="Product 0", cost=5, amount_available=10, seller=seller
+        )
+        self.buy_product_url = reverse("buy-list")
+
+    @override_settings(REST_FRAMEWORK=rest_framework_settings(
+        **{"buy.user": "1/min", "buy.ip": "100/min"}
+    ))
+    def test_buy_throttled_per_user(self):
+        self.client.force_login(self.buyer)
+        data = {"product_id": self.product.id, "amount_products": 1}
+
+        response = self.client.post(self.buy_product_url, data)
+        assert response.status_code == status.HTTP_200_OK
+
+        response = self.client.post(self.buy_product_url, data)
+        assert response.status_code == status.HTTP_429_TOO_MANY_REQUESTS
+
+        self.product.refresh_from_db()
+        assert self.product.amount_available == 9
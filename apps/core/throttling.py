@@ -0,0 +1,202 @@
+import os
+import sqlite3
+import threading
+import time
+
+from django.conf import settings
+from rest_framework.settings import api_settings
+from rest_framework.throttling import BaseThrottle
+
+
+DURATIONS = {"s": 1, "m": 60, "h": 3600, "d": 86400}
+
+
+class TokenBucketStore:
+    """
+    Token buckets kept in a small SQLite file shared by every worker process
+    on the host. A check is one atomic UPSERT, so concurrent workers never
+    race on the same bucket and no lock is held between requests.
+    """
+
+    schema = (
+        "CREATE TABLE IF NOT EXISTS token_bucket ("
+        " key TEXT PRIMARY KEY,"
+        " tokens REAL NOT NULL,"
+        " updated_at REAL NOT NULL,"
+        " full_at REAL NOT NULL,"
+        " allowed INTEGER NOT NULL"
+        ") WITHOUT ROWID;"
+        "CREATE INDEX IF NOT EXISTS token_bucket_full_at"
+        " ON token_bucket (full_at);"
+    )
+
+    # Tokens in the bucket after the refill, and after taking one if allowed
+    refilled = "min(:capacity, tokens + (:now - updated_at) * :rate)"
+    remaining = f"({refilled} - ({refilled} >= 1))"
+
+    consume_sql = (
+        "INSERT INTO token_bucket (key, tokens, updated_at, full_at, allowed) "
+        "VALUES (:key, :capacity - 1, :now, :now + 1 / :rate, 1) "
+        "ON CONFLICT(key) DO UPDATE SET "
+        f" allowed = {refilled} >= 1,"
+        f" tokens = {remaining},"
+        f" full_at = :now + (:capacity - {remaining}) / :rate,"
+        " updated_at = :now "
+        "RETURNING allowed, tokens"
+    )
+
+    # A bucket that has refilled completely behaves exactly like a missing
+    # one, so it can be dropped.
+    sweep_sql = "DELETE FROM token_bucket WHERE full_at <= :now"
+
+    # Seconds between sweeps in each process
+    sweep_interval = 60
+
+    def __init__(self, path):
+        self.path = str(path)
+        self._local = threading.local()
+        self._swept_at = time.time()
+
+    @property
+    def connection(self):
+        # Connections are per thread and must not survive a fork.
+        pid = os.getpid()
+        if getattr(self._local, "pid", None) != pid:
+            connection = sqlite3.connect(
+                self.path, timeout=5, isolation_level=None,
+                check_same_thread=False
+            )
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=OFF")
+            connection.executescript(self.schema)
+            self._local.connection = connection
+            self._local.pid = pid
+        return self._local.connection
+
+    def consume(self, key: str, capacity: int, rate: float, now=None):
+        """
+        Takes one token from the bucket ``key``. Returns ``(allowed,
+        tokens_left)``.
+        """
+        now = time.time() if now is None else now
+        if now - self._swept_at >= self.sweep_interval:
+            self.sweep(now)
+        allowed, tokens = self.connection.execute(self.consume_sql, {
+            "key": key,
+            "capacity": capacity,
+            "rate": rate,
+            "now": now,
+        }).fetchone()
+        return bool(allowed), tokens
+
+    def sweep(self, now=None):
+        """
+        Deletes buckets that have refilled completely, so keys chosen by
+        clients (such as login usernames) can't grow the store forever.
+        """
+        now = time.time() if now is None else now
+        self._swept_at = now
+        return self.connection.execute(self.sweep_sql, {"now": now}).rowcount
+
+    def clear(self):
+        self.connection.execute("DELETE FROM token_bucket")
+
+
+_store = None
+
+
+def get_store() -> TokenBucketStore:
+    global _store
+    path = settings.THROTTLE_STORE["NAME"]
+    if _store is None or _store.path != str(path):
+        _store = TokenBucketStore(path)
+    return _store
+
+
+def parse_rate(rate):
+    """
+    Parses a DRF style rate such as ``"10/min"`` into the bucket capacity and
+    the refill rate in tokens per second.
+    """
+    if rate is None:
+        return None, None
+    num, period = rate.split("/")
+    capacity = int(num)
+    return capacity, capacity / DURATIONS[period[0]]
+
+
+class TokenBucketThrottle(BaseThrottle):
+    """
+    Token bucket throttle configured per viewset through ``throttle_scope``.
+    The rate is looked up in ``DEFAULT_THROTTLE_RATES`` under
+    ``"<scope>.<kind>"``; a missing rate disables the throttle.
+    """
+    kind = None
+
+    def __init__(self):
+        self.tokens = None
+        self.rate = None
+
+    def get_key(self, request, view):
+        raise NotImplementedError(".get_key() must be overridden")
+
+    def allow_request(self, request, view):
+        scope = getattr(view, "throttle_scope", None)
+        if not scope:
+            return True
+
+        capacity, self.rate = parse_rate(
+            api_settings.DEFAULT_THROTTLE_RATES.get(f"{scope}.{self.kind}")
+        )
+        if capacity is None:
+            return True
+
+        ident = self.get_key(request, view)
+        if ident is None:
+            return True
+
+        allowed, self.tokens = get_store().consume(
+            f"{scope}.{self.kind}:{ident}", capacity, self.rate
+        )
+        return allowed
+
+    def wait(self):
+        if self.tokens is None or not self.rate:
+            return None
+        return max(1 - self.tokens, 0) / self.rate
+
+
+class UserTokenBucketThrottle(TokenBucketThrottle):
+    kind = "user"
+
+    def get_key(self, request, view):
+        if request.user and request.user.is_authenticated:
+            return request.user.pk
+        return None
+
+
+class UsernameTokenBucketThrottle(TokenBucketThrottle):
+    """
+    Keys anonymous requests by the submitted username, so one account can't
+    be brute forced from many addresses.
+    """
+    kind = "user"
+
+    def get_key(self, request, view):
+        data = request.data
+        username = data.get("username") if hasattr(data, "get") else None
+        return username or None
+
+
+class IPTokenBucketThrottle(TokenBucketThrottle):
+    """
+    Keys on the client address. ``X-Forwarded-For`` can be set by anyone,
+    so it is only trusted when ``NUM_PROXIES`` says how many proxies sit in
+    front of the app.
+    """
+    kind = "ip"
+
+    def get_key(self, request, view):
+        if api_settings.NUM_PROXIES is None:
+            return request.META.get("REMOTE_ADDR")
+        return self.get_ident(request)
@@ -1,8 +1,85 @@
+from django import forms
 from django.contrib import admin
+from django.db import transaction
 
-from apps.products.models import Product
+from apps.core.admin import LargeTableAdminMixin, bulk_update_action
+from apps.core.invalidation import invalidate_on_commit
+from apps.products.models import Product, SellerDeletion
+from apps.products.catalog import refresh_catalog_on_commit
+from apps.products.changes import record_changes
+from apps.products.services import (
+    delete_products,
+    reprice_products,
+    restock_products,
+    validate_product_cost
+)
+
+
+class RestockForm(forms.Form):
+    quantity = forms.IntegerField(min_value=1, help_text="Items to add")
+
+
+class RepriceForm(forms.Form):
+    cost = forms.IntegerField()
+
+    def clean_cost(self):
+        cost = self.cleaned_data["cost"]
+        errors = validate_product_cost(cost=cost)
+        if errors:
+            raise forms.ValidationError(errors)
+        return cost
 
 
 @admin.register(Product)
-class ProductAdmin(admin.ModelAdmin):
+class ProductAdmin(LargeTableAdminMixin, admin.ModelAdmin):
     list_display = ["id", "name", "seller", "cost", "amount_available"]
+    list_select_related = ["seller"]
+    autocomplete_fields = ["seller"]
+    search_fields = ["=id", "^name"]
+    actions = [
+        bulk_update_action(
+            name="restock",
+            form_class=RestockForm,
+            description="Restock selected products",
+            apply=lambda queryset, data: restock_products(
+                queryset=queryset, **data
+            ),
+        ),
+        bulk_update_action(
+            name="reprice",
+            form_class=RepriceForm,
+            description="Reprice selected products",
+            apply=lambda queryset, data: reprice_products(
+                queryset=queryset, **data
+            ),
+        ),
+    ]
+
+    def save_model(self, request, obj, form, change):
+        if change:
+            obj.version += 1
+        with transaction.atomic():
+            super().save_model(request, obj, form, change)
+            record_changes([obj.pk])
+        refresh_catalog_on_commit([obj.pk])
+        invalidate_on_commit(Product, [obj.pk])
+
+    def delete_model(self, request, obj):
+        delete_products(queryset=Product.objects.filter(pk=obj.pk))
+
+    def delete_queryset(self, request, queryset):
+        delete_products(queryset=queryset)
+
+
+@admin.register(SellerDeletion)
+class SellerDeletionAdmin(admin.ModelAdmin):
+    list_display = ["username", "deleted", "total", "started_at",
+                    "finished_at"]
+    readonly_fields = ["seller_id", "username", "total", "deleted",
+                       "last_product_id", "started_at", "finished_at"]
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
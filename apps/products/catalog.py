@@ -0,0 +1,375 @@
+import fcntl
+import logging
+import mmap
+import os
+import struct
+import threading
+from collections import namedtuple
+from contextlib import contextmanager
+from typing import Iterable, Optional
+
+from django.conf import settings
+
+from apps.core.invalidation import LocalCache, cache_key, get_cache
+from apps.core.jobs import background_job
+from apps.products.models import Product
+
+
+log = logging.getLogger(__name__)
+
+# magic, sequence (odd while a record is being patched), stale flag (set
+# once the file has been replaced), record count, offset of the name table
+HEADER = struct.Struct("<8sQQQQ")
+MAGIC = b"CATALOG1"
+SEQUENCE_OFFSET, STALE_OFFSET = 8, 16
+SEQUENCE = struct.Struct("<Q")
+# id, seller_id, cost, amount_available, version, name offset, name length
+RECORD = struct.Struct("<qqqqqII")
+RECORD_ID = struct.Struct("<q")
+PATCH = struct.Struct("<qqqq")
+# Attempts at reading a record consistently before giving up on it
+MAX_READ_ATTEMPTS = 1000
+
+CatalogEntry = namedtuple(
+    "CatalogEntry",
+    ["id", "seller_id", "cost", "amount_available", "version", "name"]
+)
+PRODUCT_FIELDS = CatalogEntry._fields
+
+
+class SnapshotBusy(Exception):
+    """
+    A record stayed under a patch for ``MAX_READ_ATTEMPTS`` reads, e.g.
+    because its writer died halfway. Read the database instead.
+    """
+
+
+class CatalogSnapshot:
+    """
+    Read-only view of a catalog snapshot file. Every worker maps the same
+    file, so they all share one page cache copy, and lookups never copy
+    more than the record they return. Records are sorted by id
+    and have a fixed width, so ``get`` is a binary search and slicing is
+    plain offset arithmetic.
+    """
+
+    def __init__(self, path):
+        self.path = str(path)
+        with open(self.path, "rb") as f:
+            self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, _, _, self._count, self._names_offset = \
+            HEADER.unpack_from(self._map)
+        if magic != MAGIC:
+            self._map.close()
+            raise ValueError(f"{self.path} is not a catalog snapshot")
+
+    @property
+    def stale(self) -> bool:
+        return bool(SEQUENCE.unpack_from(self._map, STALE_OFFSET)[0])
+
+    def close(self):
+        self._map.close()
+
+    def __len__(self):
+        return self._count
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self._entry(i)
+                    for i in range(*index.indices(self._count))]
+        if index < 0:
+            index += self._count
+        if not 0 <= index < self._count:
+            raise IndexError(index)
+        return self._entry(index)
+
+    def __iter__(self):
+        for index in range(self._count):
+            yield self._entry(index)
+
+    def index_of(self, pk: int) -> Optional[int]:
+        low, high = 0, self._count
+        while low < high:
+            middle = (low + high) // 2
+            record_id = RECORD_ID.unpack_from(
+                self._map, HEADER.size + middle * RECORD.size
+            )[0]
+            if record_id < pk:
+                low = middle + 1
+            elif record_id > pk:
+                high = middle
+            else:
+                return middle
+        return None
+
+    def get(self, pk: int) -> Optional[CatalogEntry]:
+        index = self.index_of(pk)
+        return None if index is None else self._entry(index)
+
+    def _record(self, index: int) -> tuple:
+        offset = HEADER.size + index * RECORD.size
+        for _ in range(MAX_READ_ATTEMPTS):
+            before = SEQUENCE.unpack_from(self._map, SEQUENCE_OFFSET)[0]
+            record = RECORD.unpack_from(self._map, offset)
+            after = SEQUENCE.unpack_from(self._map, SEQUENCE_OFFSET)[0]
+            if before == after and not before % 2:
+                return record
+        raise SnapshotBusy(f"{self.path} is being patched")
+
+    def _name(self, name_offset: int, name_length: int) -> str:
+        start = self._names_offset + name_offset
+        return str(self._map[start:start + name_length], "utf-8")
+
+    def _entry(self, index: int) -> CatalogEntry:
+        *fields, name_offset, name_length = self._record(index)
+        return CatalogEntry(*fields, self._name(name_offset, name_length))
+
+
+def write_snapshot(path, rows: Iterable[tuple]) -> int:
+    """
+    Writes ``rows`` (``PRODUCT_FIELDS`` tuples, sorted by id) to a new file
+    and atomically swaps it in for ``path``. Equal names are stored once.
+    Returns the number of records written.
+    """
+    path = str(path)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    names, name_offsets, count = bytearray(), {}, 0
+    with open(tmp_path, "wb") as f:
+        f.write(bytes(HEADER.size))
+        for *fields, name in rows:
+            encoded = name.encode()
+            name_offset = name_offsets.get(encoded)
+            if name_offset is None:
+                name_offset = name_offsets[encoded] = len(names)
+                names += encoded
+            f.write(RECORD.pack(*fields, name_offset, len(encoded)))
+            count += 1
+        f.write(names)
+        f.seek(0)
+        f.write(HEADER.pack(MAGIC, 0, 0, count,
+                            HEADER.size + count * RECORD.size))
+        f.flush()
+        os.fsync(f.fileno())
+    _replace(tmp_path, path)
+    return count
+
+
+def _replace(new_path: Optional[str], path: str):
+    """
+    Moves ``new_path`` over ``path`` (or removes ``path`` if ``new_path`` is
+    ``None``) and flags the old file as stale so readers remap.
+    """
+    try:
+        old = open(path, "r+b")
+    except FileNotFoundError:
+        old = None
+    try:
+        if new_path is None:
+            os.unlink(path)
+        else:
+            os.replace(new_path, path)
+        if old is not None:
+            old.seek(STALE_OFFSET)
+            old.write(SEQUENCE.pack(1))
+    finally:
+        if old is not None:
+            old.close()
+
+
+@contextmanager
+def writer_lock(path):
+    """
+    Serializes snapshot writers across processes, so exactly one process
+    updates the file at a time.
+    """
+    with open(f"{path}.lock", "wb") as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock, fcntl.LOCK_UN)
+
+
+def rebuild_catalog(path=None, chunk_size: int = 2000) -> int:
+    path = path or settings.CATALOG_SNAPSHOT["path"]
+    rows = Product.objects.listed().order_by("pk").values_list(
+        *PRODUCT_FIELDS
+    )
+    with writer_lock(path):
+        return write_snapshot(path, rows.iterator(chunk_size=chunk_size))
+
+
+def _merge(snapshot: CatalogSnapshot, changes: dict):
+    pending = sorted(changes)
+    position = 0
+    for entry in snapshot:
+        while position < len(pending) and pending[position] < entry.id:
+            row = changes[pending[position]]
+            if row is not None:
+                yield row
+            position += 1
+        if position < len(pending) and pending[position] == entry.id:
+            row = changes[pending[position]]
+            if row is not None:
+                yield row
+            position += 1
+        else:
+            yield tuple(entry)
+    for pk in pending[position:]:
+        if changes[pk] is not None:
+            yield changes[pk]
+
+
+def apply_changes(path, changes: dict):
+    """
+    Brings the snapshot up to date with ``changes`` (``{pk: row or None}``,
+    ``None`` meaning deleted). Changes that keep the product's name are
+    patched into the mapped record in place; inserts, deletes and renames
+    merge the old snapshot with the changed rows into a new file, without
+    rereading the table.
+    """
+    path = str(path)
+    with writer_lock(path):
+        _apply_changes(path, changes)
+
+
+def _apply_changes(path: str, changes: dict):
+    # Callers hold the writer lock.
+    try:
+        snapshot = CatalogSnapshot(path)
+    except FileNotFoundError:
+        return
+    try:
+        patches = []
+        for pk, row in changes.items():
+            index = snapshot.index_of(pk)
+            if row is None and index is None:
+                continue
+            if (row is None or index is None
+                    or snapshot[index].name != row[-1]):
+                write_snapshot(path, _merge(snapshot, changes))
+                return
+            patches.append((index, row))
+        if patches:
+            _patch(path, patches)
+    finally:
+        snapshot.close()
+
+
+def _patch(path: str, patches: list):
+    with open(path, "r+b") as f:
+        writable = mmap.mmap(f.fileno(), 0)
+    try:
+        sequence = SEQUENCE.unpack_from(writable, SEQUENCE_OFFSET)[0]
+        if sequence % 2:
+            raise SnapshotBusy(f"{path} was left halfway through a patch")
+        SEQUENCE.pack_into(writable, SEQUENCE_OFFSET, sequence + 1)
+        for index, (pk, *fields, _) in patches:
+            PATCH.pack_into(
+                writable, HEADER.size + index * RECORD.size + RECORD_ID.size,
+                *fields
+            )
+        SEQUENCE.pack_into(writable, SEQUENCE_OFFSET, sequence + 2)
+    finally:
+        writable.close()
+
+
+@background_job
+def refresh_catalog(pks: Iterable[int]):
+    config = settings.CATALOG_SNAPSHOT
+    if not config["enabled"]:
+        return
+    path = str(config["path"])
+    changes = dict.fromkeys(pks)
+    try:
+        with writer_lock(path):
+            # Read under the lock, so a refresh never writes rows older
+            # than those the refresh before it wrote.
+            rows = Product.objects.listed().filter(
+                pk__in=list(changes)
+            ).values_list(*PRODUCT_FIELDS)
+            for row in rows:
+                changes[row[0]] = row
+            _apply_changes(path, changes)
+    except Exception:
+        # A snapshot that missed a write must not be served; readers fall
+        # back to the database until it is rebuilt.
+        log.exception("Could not update the catalog snapshot, removing it")
+        with writer_lock(path):
+            try:
+                _replace(None, path)
+            except FileNotFoundError:
+                pass
+
+
+def refresh_catalog_on_commit(pks: Iterable[int]):
+    if settings.CATALOG_SNAPSHOT["enabled"]:
+        refresh_catalog.delay(list(pks))
+
+
+@background_job
+def rebuild_catalog_snapshot():
+    if settings.CATALOG_SNAPSHOT["enabled"]:
+        rebuild_catalog()
+
+
+def rebuild_catalog_on_commit():
+    if settings.CATALOG_SNAPSHOT["enabled"]:
+        rebuild_catalog_snapshot.delay()
+
+
+_local = threading.local()
+
+
+def get_catalog() -> Optional[CatalogSnapshot]:
+    """
+    Returns this thread's mapping of the current snapshot, or ``None`` when
+    the snapshot is disabled or has not been built.
+    """
+    config = settings.CATALOG_SNAPSHOT
+    if not config["enabled"]:
+        return None
+    snapshot = getattr(_local, "snapshot", None)
+    if (snapshot is None or snapshot.stale
+            or snapshot.path != str(config["path"])):
+        if snapshot is not None:
+            snapshot.close()
+        try:
+            snapshot = CatalogSnapshot(config["path"])
+        except FileNotFoundError:
+            snapshot = None
+        _local.snapshot = snapshot
+    return snapshot
+
+
+def lookup_product(pk: int):
+    """
+    Read-through product lookup: the snapshot entry if there is one,
+    otherwise the database row (or ``None``).
+    """
+    snapshot, entry = get_catalog(), None
+    if snapshot is not None:
+        try:
+            entry = snapshot.get(pk)
+        except SnapshotBusy:
+            pass
+    if entry is None:
+        def load():
+            return Product.objects.listed().filter(pk=pk).first()
+
+        cache = get_product_cache()
+        entry = load() if cache is None else \
+            cache.get(cache_key(Product, pk), load)
+    return entry
+
+
+def get_product_cache() -> Optional[LocalCache]:
+    """
+    Returns this worker's product cache, or ``None`` when it is disabled.
+    Purchases may use a stale entry: ``buy_product`` only takes the stock
+    if the cost and stock it checked still hold.
+    """
+    config = settings.PRODUCT_CACHE
+    if not config["enabled"]:
+        return None
+    return get_cache("products", config["max_size"])
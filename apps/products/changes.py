@@ -0,0 +1,133 @@
+from typing import Iterable, Optional, Tuple
+
+from django.conf import settings
+from django.db import NotSupportedError, connections, router, transaction
+from django.db.models import Max, Min
+from django.utils import timezone
+
+from apps.accounts.models import User
+from apps.products.models import (
+    ChangeFeedCompaction,
+    ChangeFeedCursor,
+    Product,
+    ProductChange
+)
+
+
+FEED_GONE_ERROR = ("Changes since this position were compacted. Download "
+                   "the product list again and continue from \"seq\".")
+
+
+def record_changes(product_ids: Iterable[int], *, deleted: bool = False):
+    """
+    Appends one feed entry per product. Call it in the transaction that
+    writes the products.
+
+    Clients resume after the last ``seq`` they saw, so entries must become
+    visible in ``seq`` order. SQLite runs one write transaction at a time,
+    which guarantees it; on PostgreSQL the feed table is locked until the
+    transaction ends to the same effect, and other databases are refused.
+    """
+    product_ids = list(product_ids)
+    if not product_ids:
+        return
+    connection = connections[router.db_for_write(ProductChange)]
+    if connection.vendor == "postgresql":
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"LOCK TABLE {ProductChange._meta.db_table} "
+                f"IN EXCLUSIVE MODE"
+            )
+    elif connection.vendor != "sqlite":
+        raise NotSupportedError(
+            f"The change feed does not support {connection.vendor}."
+        )
+    ProductChange.objects.bulk_create(
+        ProductChange(product_id=pk, deleted=deleted) for pk in product_ids
+    )
+
+
+def current_seq() -> int:
+    return ProductChange.objects.aggregate(seq=Max("seq"))["seq"] or \
+        compacted_seq()
+
+
+def compacted_seq() -> int:
+    return ChangeFeedCompaction.objects.aggregate(
+        seq=Max("seq"))["seq"] or 0
+
+
+def changes_since(*, since: int, user: User, client: str
+                  ) -> Tuple[Optional[dict], dict]:
+    """
+    Returns up to ``CHANGE_FEED["page_size"]`` changes after ``since``, one
+    per product with its current state or a tombstone, and records that
+    the client holds everything up to ``since``. If entries after
+    ``since`` were already compacted, ``errors["seq"]`` holds the position
+    to resume from after a full download.
+    """
+    feed, errors = None, {}
+    if since < compacted_seq():
+        errors = {"details": FEED_GONE_ERROR, "seq": current_seq()}
+        return feed, errors
+
+    page_size = settings.CHANGE_FEED["page_size"]
+    entries = list(ProductChange.objects.filter(
+        seq__gt=since).order_by("seq")[:page_size + 1])
+    more = len(entries) > page_size
+    entries = entries[:page_size]
+
+    latest = {entry.product_id: entry for entry in entries}
+    products = Product.objects.listed().only(
+        "id", "name", "seller_id", "amount_available", "cost"
+    ).in_bulk(pk for pk, entry in latest.items() if not entry.deleted)
+    changes = [
+        {
+            "seq": entry.seq,
+            "id": entry.product_id,
+            # Deleted, or hidden with its seller, after this entry; its
+            # tombstone follows.
+            "deleted": entry.product_id not in products,
+            "product": products.get(entry.product_id),
+        }
+        for entry in sorted(latest.values(), key=lambda e: e.seq)
+    ]
+    acknowledge(user=user, client=client, seq=since)
+    feed = {
+        "seq": entries[-1].seq if entries else since,
+        "more": more,
+        "changes": changes,
+    }
+    return feed, errors
+
+
+def acknowledge(*, user: User, client: str, seq: int):
+    now = timezone.now()
+    updated = ChangeFeedCursor.objects.filter(
+        user=user, client=client
+    ).update(seq=seq, updated_at=now)
+    if not updated:
+        ChangeFeedCursor.objects.get_or_create(
+            user=user, client=client,
+            defaults={"seq": seq, "updated_at": now}
+        )
+
+
+def compact_changes() -> int:
+    """
+    Forgets clients that have not synced within
+    ``CHANGE_FEED["client_retention"]`` and deletes the entries every
+    remaining client has moved past. Returns the number deleted.
+    """
+    cutoff = timezone.now() - settings.CHANGE_FEED["client_retention"]
+    ChangeFeedCursor.objects.filter(updated_at__lt=cutoff).delete()
+    with transaction.atomic():
+        horizon = ChangeFeedCursor.objects.aggregate(
+            seq=Min("seq"))["seq"]
+        if horizon is None:
+            horizon = current_seq()
+        deleted, _ = ProductChange.objects.filter(seq__lte=horizon).delete()
+        if deleted:
+            ChangeFeedCompaction.objects.create(seq=horizon)
+            ChangeFeedCompaction.objects.filter(seq__lt=horizon).delete()
+    return deleted
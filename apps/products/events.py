@@ -0,0 +1,94 @@
+import asyncio
+import threading
+
+from django.db import transaction
+
+from apps.products.models import Product
+
+
+class ProductChangeSubscription:
+    """
+    Pending product changes for one client. Changes to the same product are
+    coalesced, so a client only ever holds one entry per product. When more
+    than ``max_pending`` products are waiting the buffer is dropped and the
+    client is told to resync instead.
+    """
+
+    def __init__(self, loop, max_pending: int):
+        self.loop = loop
+        self.max_pending = max_pending
+        self.overflowed = False
+        self._pending = {}
+        self._lock = threading.Lock()
+        self._ready = asyncio.Event()
+
+    def push(self, change: dict):
+        with self._lock:
+            pk = change["id"]
+            if pk not in self._pending and len(self._pending) >= self.max_pending:
+                self._pending.clear()
+                self.overflowed = True
+            else:
+                self._pending[pk] = {**self._pending.get(pk, {}), **change}
+        self.loop.call_soon_threadsafe(self._ready.set)
+
+    async def get(self):
+        """
+        Waits for changes and returns ``(changes, overflowed)``.
+        """
+        await self._ready.wait()
+        with self._lock:
+            self._ready.clear()
+            changes, self._pending = list(self._pending.values()), {}
+            overflowed, self.overflowed = self.overflowed, False
+        return changes, overflowed
+
+
+class ProductChangeBroker:
+    """
+    In-process fan-out of committed product changes to every connected
+    stream client of this worker.
+    """
+
+    def __init__(self):
+        self._subscriptions = set()
+        self._lock = threading.Lock()
+
+    def subscribe(self, max_pending: int) -> ProductChangeSubscription:
+        subscription = ProductChangeSubscription(
+            asyncio.get_running_loop(), max_pending
+        )
+        with self._lock:
+            self._subscriptions.add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: ProductChangeSubscription):
+        with self._lock:
+            self._subscriptions.discard(subscription)
+
+    def publish(self, change: dict):
+        with self._lock:
+            subscriptions = list(self._subscriptions)
+        for subscription in subscriptions:
+            try:
+                subscription.push(change)
+            except RuntimeError:  # pragma: no cover
+                # The client's event loop is already closed
+                self.unsubscribe(subscription)
+
+
+broker = ProductChangeBroker()
+
+
+def product_change(product: Product) -> dict:
+    return {
+        "id": product.pk,
+        "name": product.name,
+        "cost": product.cost,
+        "amount_available": product.amount_available,
+    }
+
+
+def publish_on_commit(product: Product):
+    change = product_change(product)
+    transaction.on_commit(lambda: broker.publish(change))
@@ -0,0 +1,594 @@
+import asyncio
+import glob
+import json
+import logging
+import os
+import socket
+import struct
+import threading
+import time
+import zlib
+from collections import OrderedDict
+from types import SimpleNamespace
+from typing import List, Optional, Tuple
+
+from django.conf import settings
+from django.db import close_old_connections, transaction
+from django.db.models import F
+
+from apps.accounts.models import User
+from apps.accounts.services import validate_user_deposit
+from apps.core.idempotency import idempotency_key
+from apps.core.invalidation import invalidate_on_commit
+from apps.products.catalog import refresh_catalog_on_commit
+from apps.products.changes import record_changes
+from apps.products.leaderboard import record_sale_on_commit
+from apps.products.models import Product
+from apps.products.services import validate_buy
+
+
+log = logging.getLogger(__name__)
+
+# payload length, crc32 of the payload
+RECORD_HEADER = struct.Struct("<II")
+
+
+class JournalCorrupted(Exception):
+    pass
+
+
+class Journal:
+    """
+    Append-only log of inventory mutations, split into segment files named
+    after the sequence number of their first record. Records are framed
+    with their length and CRC, so a write torn by a crash is recognised and
+    dropped on replay. ``append`` only buffers; ``sync`` makes everything
+    appended so far durable with a single fsync.
+    """
+
+    def __init__(self, directory):
+        self.directory = str(directory)
+        os.makedirs(self.directory, exist_ok=True)
+        self._file = None
+        self._path = None
+
+    def segments(self) -> list:
+        return sorted(glob.glob(os.path.join(self.directory, "*.journal")))
+
+    def segment_path(self, first_seq: int) -> str:
+        return os.path.join(self.directory, f"{first_seq:020d}.journal")
+
+    def next_seq(self) -> int:
+        """
+        The sequence number the last segment starts at: after a checkpoint
+        dropped the older segments it is the only trace of how far the
+        sequence got. 1 when there are no segments.
+        """
+        segments = self.segments()
+        if not segments:
+            return 1
+        return int(os.path.basename(segments[-1]).split(".")[0])
+
+    def replay(self):
+        """
+        Yields every record in order. A torn record at the very end of the
+        last segment is cut off; damage anywhere else raises
+        ``JournalCorrupted``.
+        """
+        segments = self.segments()
+        for index, path in enumerate(segments):
+            with open(path, "r+b") as f:
+                data = f.read()
+                offset = 0
+                while offset < len(data):
+                    record = self._read(data, offset)
+                    if record is None:
+                        if index != len(segments) - 1:
+                            raise JournalCorrupted(f"{path} at {offset}")
+                        log.warning("Dropping torn journal tail in %s", path)
+                        f.truncate(offset)
+                        break
+                    payload, offset = record
+                    yield json.loads(payload)
+
+    @staticmethod
+    def _read(data: bytes, offset: int):
+        end = offset + RECORD_HEADER.size
+        if end > len(data):
+            return None
+        length, crc = RECORD_HEADER.unpack_from(data, offset)
+        payload = data[end:end + length]
+        if len(payload) != length or zlib.crc32(payload) != crc:
+            return None
+        return payload, end + length
+
+    def open(self, first_seq: int):
+        """
+        Continues the last segment, or starts one at ``first_seq``.
+        """
+        segments = self.segments()
+        self._path = (segments[-1] if segments
+                      else self.segment_path(first_seq))
+        self._file = open(self._path, "ab")
+        self._fsync_directory()
+
+    def append(self, record: dict):
+        payload = json.dumps(record, separators=(",", ":")).encode()
+        self._file.write(RECORD_HEADER.pack(len(payload), zlib.crc32(payload)))
+        self._file.write(payload)
+
+    def sync(self):
+        self._file.flush()
+        os.fsync(self._file.fileno())
+
+    def rotate(self, first_seq: int) -> list:
+        """
+        Syncs the current segment and, unless it is still empty, starts a
+        new one. Returns the segments that are now complete.
+        """
+        self.sync()
+        if self._file.tell():
+            self._file.close()
+            self._path = self.segment_path(first_seq)
+            self._file = open(self._path, "ab")
+            self._fsync_directory()
+        return [path for path in self.segments() if path != self._path]
+
+    def remove(self, segments: list):
+        for path in segments:
+            os.unlink(path)
+        self._fsync_directory()
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def _fsync_directory(self):
+        fd = os.open(self.directory, os.O_RDONLY)
+        try:
+            os.fsync(fd)
+        finally:
+            os.close(fd)
+
+
+class InventoryEngine:
+    """
+    Authoritative product stock and buyer deposits, held in memory by the
+    single process that owns them. Every mutation is journaled as the
+    absolute values it produced rather than as a delta, so replaying a
+    record that was already checkpointed to the database is harmless and
+    recovery is just "load the tables, replay the journal".
+
+    Rows are loaded from the database the first time they are needed (see
+    ``preload``). The engine is not thread safe; the owner drives it from
+    one thread.
+
+    A command sent with a ``request`` id (the request's idempotency key)
+    journals its reply along with its record, and a retry of the same
+    request gets that reply back instead of applying it again, for
+    ``IDEMPOTENCY["retention"]`` and across restarts for as long as the
+    record is in the journal.
+    """
+
+    def __init__(self, journal_dir):
+        self.journal = Journal(journal_dir)
+        self.stock = {}
+        self.sold = {}
+        self.deposits = {}
+        self.dirty_products = set()
+        self.dirty_users = set()
+        self.seq = 0
+        # request id -> (logged at, reply), oldest first
+        self.replies = OrderedDict()
+        self._request = None
+
+    def recover(self) -> int:
+        """
+        Replays the journal over an empty state. Returns the number of
+        records replayed.
+        """
+        replayed = 0
+        for record in self.journal.replay():
+            if record["seq"] <= self.seq:
+                raise JournalCorrupted(f"sequence went back at {record}")
+            self._apply(record)
+            replayed += 1
+        # An empty segment left by a checkpoint holds no records, only the
+        # sequence number the next one gets.
+        self.seq = max(self.seq, self.journal.next_seq() - 1)
+        self.journal.open(self.seq + 1)
+        return replayed
+
+    def _apply(self, record: dict):
+        self.seq = record["seq"]
+        if "product" in record:
+            self.stock[record["product"]] = record["stock"]
+            self.dirty_products.add(record["product"])
+        if "sold" in record:
+            self.sold[record["product"]] = record["sold"]
+        if "user" in record:
+            self.deposits[record["user"]] = record["deposit"]
+            self.dirty_users.add(record["user"])
+        if "request" in record:
+            self.replies[record["request"]] = (record["at"], record["reply"])
+
+    def _log(self, reply: dict = None, **record) -> dict:
+        record["seq"] = self.seq + 1
+        if self._request is not None:
+            record.update(request=self._request, at=time.time(), reply=reply)
+        self.journal.append(record)
+        self._apply(record)
+        return reply
+
+    def preload(self, *, products=(), users=()):
+        """
+        Loads the rows the next commands need and are not in memory yet,
+        with one query per table.
+        """
+        missing = set(products) - self.sold.keys()
+        if missing:
+            for pk, stock, sold in Product.objects.filter(
+                    pk__in=missing).values_list("pk", "amount_available",
+                                                "units_sold"):
+                # Stock already in memory came from set_stock and is newer.
+                self.stock.setdefault(pk, stock)
+                self.sold[pk] = sold
+        missing = set(users) - self.deposits.keys()
+        if missing:
+            self.deposits.update(User.objects.filter(
+                pk__in=missing).values_list("pk", "deposit"))
+
+    def buy(self, *, product: int, cost: int, name: str, amount: int,
+            buyer: int) -> dict:
+        if product not in self.stock:
+            return {"result": None, "errors": {
+                "details": ["Product does not exist."]
+            }, "deposit": self.deposits[buyer]}
+        stock, deposit = self.stock[product], self.deposits[buyer]
+        messages = validate_buy(
+            product=SimpleNamespace(cost=cost, amount_available=stock),
+            amount=amount,
+            buyer=SimpleNamespace(deposit=deposit)
+        )
+        if messages:
+            return {"result": None, "errors": {"details": messages},
+                    "deposit": deposit}
+        total_cost = cost * amount
+        sold = self.sold.get(product, 0) + amount
+        return self._log(
+            op="buy", product=product, stock=stock - amount, sold=sold,
+            user=buyer, deposit=deposit - total_cost, reply={"result": {
+                "change": deposit - total_cost,
+                "product_name": name,
+                "total_cost": total_cost,
+            }, "errors": {}, "deposit": deposit - total_cost, "sold": sold}
+        )
+
+    def deposit(self, *, amount: int, buyer: int) -> dict:
+        messages = validate_user_deposit(amount=amount)
+        if messages:
+            return {"result": None, "errors": {"amount": messages},
+                    "deposit": self.deposits[buyer]}
+        deposit = self.deposits[buyer] + amount
+        return self._log(op="deposit", user=buyer, deposit=deposit, reply={
+            "result": {"deposit": deposit}, "errors": {}, "deposit": deposit
+        })
+
+    def deposit_coins(self, *, amounts: list, buyer: int) -> dict:
+        messages = [message for amount in amounts
+                    for message in validate_user_deposit(amount=amount)]
+        if messages:
+            return {"result": None,
+                    "errors": {"amount": list(dict.fromkeys(messages))},
+                    "deposit": self.deposits[buyer]}
+        deposit = self.deposits[buyer] + sum(amounts)
+        return self._log(op="deposit", user=buyer, deposit=deposit, reply={
+            "result": {"deposit": deposit}, "errors": {}, "deposit": deposit
+        })
+
+    def reset_deposit(self, *, buyer: int) -> dict:
+        return self._log(op="reset_deposit", user=buyer, deposit=0, reply={
+            "result": {"deposit": 0}, "errors": {}, "deposit": 0
+        })
+
+    def set_stock(self, *, product: int, amount: int) -> dict:
+        return self._log(op="set_stock", product=product, stock=amount,
+                         reply={"result": {"amount_available": amount},
+                                "errors": {}})
+
+    def execute(self, command: dict) -> dict:
+        """
+        Runs one client command. A command that fails has not touched the
+        state, since records are only logged after their checks pass.
+        """
+        self.forget_replies()
+        request = command.pop("request", None)
+        if request in self.replies:
+            return {**self.replies[request][1], "replayed": True}
+        self._request = request
+        try:
+            operation = getattr(self, command.pop("op"))
+            return operation(**command)
+        except Exception:
+            log.exception("Inventory command %s failed", command)
+            return {"result": None, "errors": {
+                "details": ["Inventory engine rejected the request."]
+            }}
+        finally:
+            self._request = None
+
+    def forget_replies(self, now=None):
+        now = time.time() if now is None else now
+        cutoff = now - settings.IDEMPOTENCY["retention"].total_seconds()
+        while self.replies and next(iter(self.replies.values()))[0] < cutoff:
+            self.replies.popitem(last=False)
+
+    def commit(self):
+        self.journal.sync()
+
+    def begin_checkpoint(self) -> Optional[dict]:
+        """
+        Starts a new journal segment and takes the rows changed since the
+        last checkpoint. Returns ``None`` when nothing changed.
+        """
+        if not self.dirty_products and not self.dirty_users:
+            return None
+        checkpoint = {
+            "segments": self.journal.rotate(self.seq + 1),
+            "stock": {pk: self.stock[pk] for pk in self.dirty_products},
+            "sold": {pk: self.sold[pk] for pk in self.dirty_products
+                     if pk in self.sold},
+            "deposits": {pk: self.deposits[pk] for pk in self.dirty_users},
+        }
+        self.dirty_products, self.dirty_users = set(), set()
+        return checkpoint
+
+    @staticmethod
+    def write_checkpoint(checkpoint: dict):
+        """
+        Writes the checkpointed rows back to the tables in one transaction.
+        """
+        with transaction.atomic():
+            products = [
+                Product(pk=pk, amount_available=stock,
+                        version=F("version") + 1)
+                for pk, stock in checkpoint["stock"].items()
+            ]
+            Product.objects.bulk_update(
+                products, ["amount_available", "version"], batch_size=500
+            )
+            Product.objects.bulk_update(
+                [Product(pk=pk, units_sold=sold)
+                 for pk, sold in checkpoint["sold"].items()],
+                ["units_sold"], batch_size=500
+            )
+            User.objects.bulk_update(
+                [User(pk=pk, deposit=deposit)
+                 for pk, deposit in checkpoint["deposits"].items()],
+                ["deposit"], batch_size=500
+            )
+            record_changes(checkpoint["stock"])
+            refresh_catalog_on_commit(checkpoint["stock"])
+            invalidate_on_commit(Product, checkpoint["stock"])
+            invalidate_on_commit(User, checkpoint["deposits"])
+
+    def finish_checkpoint(self, checkpoint: dict):
+        self.journal.remove(checkpoint["segments"])
+
+    def abort_checkpoint(self, checkpoint: dict):
+        # Keep the old segments and write these rows again next time.
+        self.dirty_products.update(checkpoint["stock"])
+        self.dirty_users.update(checkpoint["deposits"])
+
+    def checkpoint(self):
+        checkpoint = self.begin_checkpoint()
+        if checkpoint is None:
+            return
+        try:
+            self.write_checkpoint(checkpoint)
+        except Exception:
+            self.abort_checkpoint(checkpoint)
+            raise
+        self.finish_checkpoint(checkpoint)
+
+
+class InventoryServer:
+    """
+    Serves an ``InventoryEngine`` on a Unix socket, one JSON command per
+    line. Commands that arrive together are applied as one batch and
+    acknowledged after that batch's single fsync; a checkpoint runs in the
+    background every ``checkpoint_interval`` seconds.
+    """
+
+    def __init__(self, engine: InventoryEngine, path, *,
+                 checkpoint_interval: float):
+        self.engine = engine
+        self.path = str(path)
+        self.checkpoint_interval = checkpoint_interval
+        self._pending = []
+        self._wakeup = None
+        self._checkpointing = None
+
+    async def serve(self, started: threading.Event = None):
+        loop = asyncio.get_running_loop()
+        self._wakeup = asyncio.Event()
+        await loop.run_in_executor(None, self._recover)
+        if os.path.exists(self.path):
+            os.unlink(self.path)
+        server = await asyncio.start_unix_server(self._handle, self.path)
+        if started is not None:
+            started.set()
+        async with server:
+            await self._commit_loop()
+
+    def _recover(self):
+        replayed = self.engine.recover()
+        log.info("Inventory engine replayed %d journal records", replayed)
+        close_old_connections()
+
+    async def _handle(self, reader, writer):
+        loop = asyncio.get_running_loop()
+        try:
+            while line := await reader.readline():
+                reply = loop.create_future()
+                self._pending.append((json.loads(line), reply))
+                self._wakeup.set()
+                writer.write(json.dumps(await reply).encode() + b"\n")
+                await writer.drain()
+        finally:
+            writer.close()
+
+    async def _commit_loop(self):
+        loop = asyncio.get_running_loop()
+        checkpoint_at = time.monotonic() + self.checkpoint_interval
+        while True:
+            try:
+                await asyncio.wait_for(
+                    self._wakeup.wait(),
+                    max(checkpoint_at - time.monotonic(), 0)
+                )
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            batch, self._pending = self._pending, []
+            if batch:
+                await self._commit(loop, batch)
+            if time.monotonic() >= checkpoint_at:
+                checkpoint_at = time.monotonic() + self.checkpoint_interval
+                self._start_checkpoint(loop)
+
+    async def _commit(self, loop, batch: list):
+        commands = [command for command, _ in batch]
+        try:
+            await loop.run_in_executor(None, self._preload, commands)
+            results = [self.engine.execute(dict(c)) for c in commands]
+            await loop.run_in_executor(None, self.engine.commit)
+        except Exception as e:
+            # Nothing is acknowledged without the fsync; stop rather than
+            # serve state the journal may not hold.
+            for _, reply in batch:
+                reply.set_exception(e)
+            raise
+        for (_, reply), result in zip(batch, results):
+            reply.set_result(result)
+
+    def _preload(self, commands: list):
+        self.engine.preload(
+            products=[c["product"] for c in commands if c["op"] == "buy"],
+            users=[c["buyer"] for c in commands if "buyer" in c],
+        )
+        close_old_connections()
+
+    def _start_checkpoint(self, loop):
+        if self._checkpointing is not None and not self._checkpointing.done():
+            return
+        checkpoint = self.engine.begin_checkpoint()
+        if checkpoint is not None:
+            self._checkpointing = loop.create_task(
+                self._checkpoint(loop, checkpoint)
+            )
+
+    async def _checkpoint(self, loop, checkpoint: dict):
+        try:
+            await loop.run_in_executor(None, self._write_checkpoint,
+                                       checkpoint)
+        except Exception:
+            log.exception("Inventory checkpoint failed, will retry")
+            self.engine.abort_checkpoint(checkpoint)
+        else:
+            self.engine.finish_checkpoint(checkpoint)
+
+    def _write_checkpoint(self, checkpoint: dict):
+        try:
+            self.engine.write_checkpoint(checkpoint)
+        finally:
+            close_old_connections()
+
+
+class InventoryClient:
+    """
+    Worker side of the inventory engine, with the same contracts as
+    ``buy_product``, ``deposit_amount`` and ``reset_deposit``.
+    """
+
+    def __init__(self, path):
+        self.path = str(path)
+        self._local = threading.local()
+
+    def call(self, command: dict) -> dict:
+        request = idempotency_key.get()
+        if request is not None:
+            command["request"] = request
+        pid = os.getpid()
+        if getattr(self._local, "pid", None) != pid:
+            connection = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            connection.connect(self.path)
+            self._local.connection = connection
+            self._local.reader = connection.makefile("rb")
+            self._local.pid = pid
+        try:
+            self._local.connection.sendall(json.dumps(command).encode()
+                                           + b"\n")
+            line = self._local.reader.readline()
+            if not line:
+                raise ConnectionError("inventory engine closed the socket")
+        except OSError:
+            self._local.pid = None
+            raise
+        return json.loads(line)
+
+    def buy_product(self, *, product_id, amount_products: int,
+                    buyer: User) -> Tuple[Optional[dict], dict]:
+        reply = self.call({
+            "op": "buy", "product": product_id.id, "cost": product_id.cost,
+            "name": str(product_id.name), "amount": amount_products,
+            "buyer": buyer.pk,
+        })
+        buyer.deposit = reply.get("deposit", buyer.deposit)
+        if reply["result"] is not None and not reply.get("replayed"):
+            record_sale_on_commit(SimpleNamespace(
+                id=product_id.id, name=product_id.name,
+                seller_id=product_id.seller_id, units_sold=reply["sold"]
+            ))
+        return reply["result"], reply["errors"]
+
+    def deposit_amount(self, *, amount: int,
+                       buyer: User) -> Tuple[Optional[dict], dict]:
+        reply = self.call({"op": "deposit", "amount": amount,
+                           "buyer": buyer.pk})
+        buyer.deposit = reply.get("deposit", buyer.deposit)
+        return reply["result"], reply["errors"]
+
+    def deposit_coins(self, *, amounts: List[int],
+                      buyer: User) -> Tuple[Optional[dict], dict]:
+        reply = self.call({"op": "deposit_coins", "amounts": amounts,
+                           "buyer": buyer.pk})
+        buyer.deposit = reply.get("deposit", buyer.deposit)
+        return reply["result"], reply["errors"]
+
+    def reset_deposit(self, *, buyer: User) -> dict:
+        reply = self.call({"op": "reset_deposit", "buyer": buyer.pk})
+        buyer.deposit = reply.get("deposit", buyer.deposit)
+        return reply["result"]
+
+    def set_stock(self, *, product: Product):
+        self.call({"op": "set_stock", "product": product.pk,
+                   "amount": product.amount_available})
+
+
+_client = None
+
+
+def get_inventory_client() -> Optional[InventoryClient]:
+    """
+    Returns the client for the inventory engine, or ``None`` when it is
+    disabled.
+    """
+    global _client
+    config = settings.INVENTORY_ENGINE
+    if not config["enabled"]:
+        return None
+    if _client is None or _client.path != str(config["socket"]):
+        _client = InventoryClient(config["socket"])
+    return _client
@@ -0,0 +1,149 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import Iterable, List, NamedTuple, Optional
+
+from django.conf import settings
+from django.db import transaction
+
+from apps.products.models import Product
+
+
+class LeaderboardEntry(NamedTuple):
+    id: int
+    name: str
+    seller_id: int
+    units_sold: int
+
+
+def rank(entry: LeaderboardEntry):
+    return -entry.units_sold, entry.id
+
+
+class TopK:
+    """
+    The ``size`` best selling products of one scope, best first. Sold
+    counters only ever grow, so applying every sale of the scope keeps the
+    list exact: a product can only enter it by overtaking the last entry.
+    """
+
+    def __init__(self, size: int, entries: Iterable[LeaderboardEntry]):
+        self.size = size
+        self.entries = sorted(entries, key=rank)[:size]
+
+    def record(self, entry: LeaderboardEntry):
+        entries = [e for e in self.entries if e.id != entry.id]
+        if len(entries) == len(self.entries) and \
+                len(entries) >= self.size and \
+                rank(entry) >= rank(entries[-1]):
+            return
+        entries.append(entry)
+        self.entries = sorted(entries, key=rank)[:self.size]
+
+    def discard(self, product_ids: set) -> bool:
+        """
+        Drops the given products. Returns whether any was on the board, in
+        which case the board no longer knows its last entries.
+        """
+        entries = [e for e in self.entries if e.id not in product_ids]
+        dropped = len(entries) != len(self.entries)
+        self.entries = entries
+        return dropped
+
+
+class Leaderboard:
+    """
+    Best sellers overall and per seller, answered from memory in O(K).
+    Boards are loaded from the ``units_sold`` indexes on first use and kept
+    current by the sales of this process; sales made by other workers show
+    up when a board is reloaded, every ``refresh`` seconds. At most
+    ``max_sellers`` seller boards are kept, least recently read first out.
+    """
+
+    def __init__(self, *, size: int, refresh: float, max_sellers: int):
+        self.size = size
+        self.refresh = refresh
+        self.max_sellers = max_sellers
+        self.config = {"size": size, "refresh": refresh,
+                       "max_sellers": max_sellers}
+        self._boards = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _load(self, seller_id: Optional[int]) -> TopK:
+        products = Product.objects.listed().order_by("-units_sold", "id")
+        if seller_id is not None:
+            products = products.filter(seller_id=seller_id)
+        return TopK(self.size, [
+            LeaderboardEntry(*row) for row in products.values_list(
+                "id", "name", "seller_id", "units_sold"
+            )[:self.size]
+        ])
+
+    def top(self, seller_id: Optional[int] = None,
+            limit: Optional[int] = None) -> List[LeaderboardEntry]:
+        now = time.monotonic()
+        with self._lock:
+            board, loaded_at = self._boards.get(seller_id, (None, None))
+            if board is not None and now - loaded_at < self.refresh:
+                self._boards.move_to_end(seller_id)
+                return board.entries[:limit]
+        board = self._load(seller_id)
+        with self._lock:
+            self._boards[seller_id] = (board, now)
+            self._boards.move_to_end(seller_id)
+            sellers = len(self._boards) - (None in self._boards)
+            for key in list(self._boards):
+                if sellers <= self.max_sellers:
+                    break
+                if key is not None:
+                    del self._boards[key]
+                    sellers -= 1
+        return board.entries[:limit]
+
+    def record_sale(self, entry: LeaderboardEntry):
+        with self._lock:
+            for key in (None, entry.seller_id):
+                if key in self._boards:
+                    self._boards[key][0].record(entry)
+
+    def discard(self, product_ids: Iterable[int]):
+        product_ids = set(product_ids)
+        with self._lock:
+            for key, (board, _) in list(self._boards.items()):
+                if board.discard(product_ids):
+                    # Reload on the next read to refill the board.
+                    del self._boards[key]
+
+    def clear(self):
+        with self._lock:
+            self._boards.clear()
+
+
+_leaderboard = None
+
+
+def get_leaderboard() -> Leaderboard:
+    global _leaderboard
+    config = settings.LEADERBOARD
+    if _leaderboard is None or _leaderboard.config != config:
+        _leaderboard = Leaderboard(
+            size=config["size"],
+            refresh=config["refresh"],
+            max_sellers=config["max_sellers"],
+        )
+    return _leaderboard
+
+
+def record_sale_on_commit(product):
+    """
+    Puts ``product`` (anything with ``id``, ``name``, ``seller_id`` and its
+    new ``units_sold``) on this process' boards once the sale commits.
+    """
+    entry = LeaderboardEntry(product.id, str(product.name),
+                             product.seller_id, product.units_sold)
+    transaction.on_commit(lambda: get_leaderboard().record_sale(entry))
+
+
+def discard_on_commit(product_ids: Iterable[int]):
+    product_ids = list(product_ids)
+    transaction.on_commit(lambda: get_leaderboard().discard(product_ids))
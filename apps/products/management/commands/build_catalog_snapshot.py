@@ -0,0 +1,17 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from apps.products.catalog import rebuild_catalog
+
+
+class Command(BaseCommand):
+    help = "Rebuilds the shared product catalog snapshot from the database."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--chunk-size", type=int, default=2000)
+
+    def handle(self, *args, **options):
+        count = rebuild_catalog(chunk_size=options["chunk_size"])
+        self.stdout.write(
+            f"Wrote {count} products to {settings.CATALOG_SNAPSHOT['path']}."
+        )
@@ -0,0 +1,12 @@
+from django.core.management.base import BaseCommand
+
+from apps.products.changes import compact_changes
+
+
+class Command(BaseCommand):
+    help = ("Deletes product change feed entries that every active client "
+            "has synced past.")
+
+    def handle(self, *args, **options):
+        deleted = compact_changes()
+        self.stdout.write(f"Deleted {deleted} change feed entries.")
@@ -0,0 +1,34 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.accounts.choices import UserRole
+from apps.accounts.models import User
+from apps.products.services import delete_seller, purge_next_batch
+
+
+class Command(BaseCommand):
+    help = ("Deactivates a seller and deletes their products in batches, "
+            "reporting progress, then deletes the seller.")
+
+    def add_arguments(self, parser):
+        parser.add_argument("username")
+        parser.add_argument(
+            "--background", action="store_true",
+            help="Only queue the deletion for the background job workers."
+        )
+
+    def handle(self, *args, **options):
+        seller = User.objects.filter(username=options["username"],
+                                     role=UserRole.SELLER).first()
+        if seller is None:
+            raise CommandError(f"No seller {options['username']!r}.")
+        deletion = delete_seller(seller=seller,
+                                 background=options["background"])
+        self.stdout.write(f"Deactivated {seller.username}, deleting "
+                          f"{deletion.total} products.")
+        if options["background"]:
+            return
+
+        while purge_next_batch(deletion):
+            self.stdout.write(f"Deleted {deletion.deleted}/{deletion.total} "
+                              f"products.")
+        self.stdout.write(f"Deleted {seller.username}.")
@@ -0,0 +1,26 @@
+import asyncio
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from apps.products.inventory import InventoryEngine, InventoryServer
+
+
+class Command(BaseCommand):
+    help = ("Runs the in-memory inventory engine that owns product stock "
+            "and buyer deposits while INVENTORY_ENGINE is enabled.")
+
+    def handle(self, *args, **options):
+        config = settings.INVENTORY_ENGINE
+        server = InventoryServer(
+            InventoryEngine(config["journal_dir"]),
+            config["socket"],
+            checkpoint_interval=config["checkpoint_interval"],
+        )
+        self.stdout.write(f"Serving inventory on {config['socket']}.")
+        try:
+            asyncio.run(server.serve())
+        except KeyboardInterrupt:
+            # Everything acknowledged is in the journal; the next start
+            # replays it.
+            pass
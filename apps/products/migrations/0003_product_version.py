@@ -0,0 +1,18 @@
+# Generated by Django 4.0.6 on 2026-10-19 09:13
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0002_alter_product_name'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='product',
+            name='version',
+            field=models.PositiveIntegerField(default=1, help_text='Bumped on every write, served as the ETag'),
+        ),
+    ]
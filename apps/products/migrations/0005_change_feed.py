@@ -0,0 +1,60 @@
+# Generated by Django 4.0.6 on 2026-10-19 09:45
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+
+
+def record_existing_products(apps, schema_editor):
+    # So a client starting from seq 0 receives the whole catalog.
+    Product = apps.get_model("products", "Product")
+    ProductChange = apps.get_model("products", "ProductChange")
+    ProductChange.objects.bulk_create(
+        (ProductChange(product_id=pk) for pk in
+         Product.objects.order_by("pk").values_list("pk", flat=True)),
+        batch_size=1000
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('products', '0004_product_units_sold'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ChangeFeedCompaction',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('seq', models.BigIntegerField()),
+                ('compacted_at', models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='ProductChange',
+            fields=[
+                ('seq', models.BigAutoField(primary_key=True, serialize=False)),
+                ('product_id', models.BigIntegerField()),
+                ('deleted', models.BooleanField(default=False)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='ChangeFeedCursor',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('client', models.CharField(max_length=64)),
+                ('seq', models.BigIntegerField()),
+                ('updated_at', models.DateTimeField(db_index=True, default=django.utils.timezone.now)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='changefeedcursor',
+            constraint=models.UniqueConstraint(fields=('user', 'client'), name='unique_change_feed_client'),
+        ),
+        migrations.RunPython(record_existing_products,
+                             migrations.RunPython.noop),
+    ]
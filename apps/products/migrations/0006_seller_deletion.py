@@ -0,0 +1,27 @@
+# Generated by Django 4.0.6 on 2026-10-19 09:51
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0005_change_feed'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SellerDeletion',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('seller_id', models.BigIntegerField(db_index=True)),
+                ('username', models.CharField(max_length=150)),
+                ('total', models.PositiveBigIntegerField(help_text='Products when the deletion started')),
+                ('deleted', models.PositiveBigIntegerField(default=0)),
+                ('last_product_id', models.BigIntegerField(default=0, help_text='Every product up to this id is deleted')),
+                ('started_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('finished_at', models.DateTimeField(blank=True, null=True)),
+            ],
+        ),
+    ]
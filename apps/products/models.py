@@ -1,13 +1,95 @@
 from django.db import models
+from django.utils import timezone
+
+
+class ProductQuerySet(models.QuerySet):
+    def listed(self):
+        """
+        Products of active sellers. A deactivated seller's products are
+        hidden while they wait to be deleted.
+        """
+        return self.filter(seller__is_active=True)
 
 
 class Product(models.Model):
-    name = models.CharField(max_length=250)
+    name = models.CharField(max_length=250, db_index=True)
     seller = models.ForeignKey("accounts.User", on_delete=models.CASCADE)
     cost = models.PositiveSmallIntegerField(help_text="Item Price")
     amount_available = models.PositiveBigIntegerField(
         help_text="Items on Stock"
     )
+    version = models.PositiveIntegerField(
+        default=1, help_text="Bumped on every write, served as the ETag"
+    )
+    units_sold = models.PositiveBigIntegerField(
+        default=0, help_text="Items sold so far"
+    )
+
+    objects = ProductQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["-units_sold", "id"],
+                         name="product_units_sold_idx"),
+            models.Index(fields=["seller", "-units_sold", "id"],
+                         name="product_seller_units_sold_idx"),
+        ]
 
     def __str__(self):
         return self.name
+
+
+class ProductChange(models.Model):
+    """
+    One row per product write. ``seq`` only ever grows (SQLite
+    ``AUTOINCREMENT`` never reuses ids), so it is the change feed position.
+    """
+    seq = models.BigAutoField(primary_key=True)
+    product_id = models.BigIntegerField()
+    deleted = models.BooleanField(default=False)
+
+
+class ChangeFeedCursor(models.Model):
+    """
+    The last feed position a client has confirmed it holds.
+    """
+    user = models.ForeignKey("accounts.User", on_delete=models.CASCADE,
+                             related_name="+")
+    client = models.CharField(max_length=64)
+    seq = models.BigIntegerField()
+    updated_at = models.DateTimeField(default=timezone.now, db_index=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["user", "client"],
+                                    name="unique_change_feed_client"),
+        ]
+
+
+class ChangeFeedCompaction(models.Model):
+    """
+    Every change up to and including ``seq`` has been removed.
+    """
+    seq = models.BigIntegerField()
+    compacted_at = models.DateTimeField(default=timezone.now)
+
+
+class SellerDeletion(models.Model):
+    """
+    A deactivated seller whose products are being deleted in batches, in
+    ``id`` order. The seller is deleted last, after the final batch.
+    """
+    seller_id = models.BigIntegerField(db_index=True)
+    username = models.CharField(max_length=150)
+    total = models.PositiveBigIntegerField(
+        help_text="Products when the deletion started"
+    )
+    deleted = models.PositiveBigIntegerField(default=0)
+    last_product_id = models.BigIntegerField(
+        default=0, help_text="Every product up to this id is deleted"
+    )
+    started_at = models.DateTimeField(default=timezone.now)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return f"{self.username}: {self.deleted}/{self.total}"
@@ -0,0 +1,211 @@
+import logging
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from typing import NamedTuple, Optional, Tuple
+
+from django.conf import settings
+from django.db import OperationalError, close_old_connections, transaction
+from rest_framework import status
+from rest_framework.exceptions import APIException
+
+from apps.accounts.models import User
+from apps.core.invalidation import invalidate_on_commit
+from apps.products.catalog import refresh_catalog_on_commit
+from apps.products.changes import record_changes
+from apps.products.events import publish_on_commit
+from apps.products.leaderboard import record_sale_on_commit
+from apps.products.models import Product
+from apps.products.services import validate_buy
+
+
+log = logging.getLogger(__name__)
+
+
+class PurchaseEngineBusy(APIException):
+    status_code = status.HTTP_503_SERVICE_UNAVAILABLE
+    default_detail = "Too many purchases right now. Please try again shortly."
+    default_code = "purchase_engine_busy"
+
+
+class PurchaseRequest(NamedTuple):
+    product_id: int
+    amount: int
+    buyer_id: int
+    future: Future
+
+
+class PurchaseEngine:
+    """
+    Group commit for purchases. Concurrent ``buy`` calls are queued and a
+    single committer thread applies them in micro-batches, each batch in one
+    transaction, in arrival order. A request waits at most ``window``
+    seconds for its batch to fill (or ``max_batch`` requests), plus the time
+    it takes to commit the batch. A request still queued after ``timeout``
+    seconds is dropped and fails with ``PurchaseEngineBusy``.
+    """
+
+    # Batches that hit a locked or changed database are retried this often
+    # before their requests fail.
+    commit_attempts = 3
+
+    def __init__(self, *, window: float, max_batch: int,
+                 timeout: Optional[float] = None):
+        self.window = window
+        self.max_batch = max_batch
+        self.timeout = timeout
+        self._queue = queue.SimpleQueue()
+        self._lock = threading.Lock()
+        self._pid = None
+
+    def buy(self, *, product_id, amount_products: int,
+            buyer: User) -> Tuple[Optional[dict], dict]:
+        """
+        Same contract as ``services.buy_product``; blocks until the batch
+        holding this purchase has committed.
+        """
+        self._ensure_started()
+        future = Future()
+        self._queue.put(
+            PurchaseRequest(product_id.id, amount_products, buyer.pk, future)
+        )
+        try:
+            result = future.result(timeout=self.timeout)
+        except FutureTimeoutError:
+            if future.cancel():
+                raise PurchaseEngineBusy()
+            # Its batch is already committing; the outcome is near.
+            result = future.result()
+        buy_response, errors, deposit = result
+        buyer.deposit = deposit
+        return buy_response, errors
+
+    def _ensure_started(self):
+        with self._lock:
+            if self._pid != os.getpid():
+                self._pid = os.getpid()
+                threading.Thread(
+                    target=self._run, name="purchase-engine", daemon=True
+                ).start()
+
+    def _collect(self) -> list:
+        batch = [self._queue.get()]
+        deadline = time.monotonic() + self.window
+        while len(batch) < self.max_batch:
+            try:
+                batch.append(self._queue.get(
+                    timeout=max(deadline - time.monotonic(), 0)
+                ))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while True:
+            # Requests that timed out while queued are left out.
+            batch = [request for request in self._collect()
+                     if request.future.set_running_or_notify_cancel()]
+            if not batch:
+                continue
+            try:
+                results = self._commit_with_retries(batch)
+            except Exception as e:
+                log.exception("Purchase batch of %d failed", len(batch))
+                for request in batch:
+                    request.future.set_exception(e)
+            else:
+                for request, result in zip(batch, results):
+                    request.future.set_result(result)
+            finally:
+                close_old_connections()
+
+    def _commit_with_retries(self, batch: list) -> list:
+        for attempt in range(1, self.commit_attempts + 1):
+            try:
+                return self.commit(batch)
+            except OperationalError:
+                if attempt == self.commit_attempts:
+                    raise
+                log.warning("Purchase batch hit a busy database, retrying")
+
+    def commit(self, batch: list) -> list:
+        """
+        Applies ``batch`` in one transaction: two reads, then one bulk write
+        each for the touched products and buyers. Returns one
+        ``(buy_response, errors, deposit)`` per request.
+        """
+        results = []
+        with transaction.atomic():
+            products = Product.objects.select_for_update().order_by(
+                "pk"
+            ).in_bulk({request.product_id for request in batch})
+            buyers = User.objects.select_for_update().order_by(
+                "pk"
+            ).in_bulk({request.buyer_id for request in batch})
+            touched_products, touched_buyers = {}, {}
+
+            for request in batch:
+                product = products.get(request.product_id)
+                buyer = buyers[request.buyer_id]
+                if product is None:
+                    results.append((None, {
+                        "details": ["Product does not exist."]
+                    }, buyer.deposit))
+                    continue
+                messages = validate_buy(
+                    product=product, amount=request.amount, buyer=buyer
+                )
+                if messages:
+                    results.append(
+                        (None, {"details": messages}, buyer.deposit)
+                    )
+                    continue
+
+                total_cost = product.cost * request.amount
+                buyer.deposit -= total_cost
+                product.amount_available -= request.amount
+                product.units_sold += request.amount
+                touched_products[product.pk] = product
+                touched_buyers[buyer.pk] = buyer
+                results.append(({
+                    "change": buyer.deposit,
+                    "product_name": str(product.name),
+                    "total_cost": total_cost,
+                }, {}, buyer.deposit))
+
+            for product in touched_products.values():
+                product.version += 1
+                publish_on_commit(product)
+                record_sale_on_commit(product)
+            Product.objects.bulk_update(
+                touched_products.values(),
+                ["amount_available", "units_sold", "version"]
+            )
+            User.objects.bulk_update(touched_buyers.values(), ["deposit"])
+            record_changes(touched_products)
+            refresh_catalog_on_commit(touched_products)
+            invalidate_on_commit(Product, touched_products)
+            invalidate_on_commit(User, touched_buyers)
+        return results
+
+
+_engine = None
+
+
+def get_purchase_engine() -> Optional[PurchaseEngine]:
+    """
+    Returns the process wide engine, or ``None`` when it is disabled.
+    """
+    global _engine
+    config = settings.PURCHASE_ENGINE
+    if not config["enabled"]:
+        return None
+    if _engine is None:
+        _engine = PurchaseEngine(
+            window=config["window"], max_batch=config["max_batch"],
+            timeout=config["timeout"]
+        )
+    return _engine
@@ -1,7 +1,29 @@
+import logging
 from typing import Optional, Tuple
 
+from django.conf import settings
+from django.db import connections, router, transaction
+from django.db.models import F, QuerySet
+from django.utils import timezone
+
 from apps.accounts.models import User
-from apps.products.models import Product
+from apps.core.invalidation import invalidate_on_commit
+from apps.core.jobs import background_job
+from apps.products.catalog import (
+    rebuild_catalog_on_commit,
+    refresh_catalog_on_commit
+)
+from apps.products.changes import record_changes
+from apps.products.events import publish_on_commit
+from apps.products.leaderboard import (
+    discard_on_commit,
+    get_leaderboard,
+    record_sale_on_commit
+)
+from apps.products.models import Product, SellerDeletion
+
+
+log = logging.getLogger(__name__)
 
 
 def create_product(*,
@@ -14,37 +36,179 @@ def create_product(*,
     if error_message:
         errors["cost"] = error_message
     else:
-        product = Product.objects.create(
-            name=name,
-            cost=cost,
-            amount_available=amount_available,
-            seller=seller
-        )
+        with transaction.atomic():
+            product = Product.objects.create(
+                name=name,
+                cost=cost,
+                amount_available=amount_available,
+                seller=seller
+            )
+            record_changes([product.pk])
+        publish_on_commit(product)
+        refresh_catalog_on_commit([product.pk])
     return product, errors
 
 
+VERSION_CONFLICT_ERROR = ("Product was changed by someone else. Reload it "
+                          "and try again.")
+
+
 def update_product(*,
-                   name: str,
-                   cost: int,
-                   amount_available: int,
-                   instance: Product) -> Tuple[Optional[Product], dict]:
+                   instance: Product,
+                   name: Optional[str] = None,
+                   cost: Optional[int] = None,
+                   amount_available: Optional[int] = None,
+                   expected_version: Optional[int] = None
+                   ) -> Tuple[Optional[Product], dict]:
+    """
+    Writes only the fields that changed, as one ``UPDATE`` that also bumps
+    ``version``. With ``expected_version`` the update only applies if the
+    row is still at that version; otherwise ``errors["version"]`` is set.
+    """
     product, errors = None, {}
-    error_message = validate_product_cost(cost=cost if cost else instance.cost)
+    error_message = validate_product_cost(
+        cost=cost if cost is not None else instance.cost
+    )
     if error_message:
         errors["cost"] = error_message
-    else:
-        if name:
-            instance.name = name
-        if cost:
-            instance.cost = cost
-        if amount_available:
-            instance.amount_available = amount_available
-        instance.save()
-        product = instance
+        return product, errors
 
+    changes = {
+        field: value
+        for field, value in (("name", name), ("cost", cost),
+                             ("amount_available", amount_available))
+        if value is not None and value != getattr(instance, field)
+    }
+    rows = Product.objects.filter(pk=instance.pk)
+    if expected_version is not None:
+        rows = rows.filter(version=expected_version)
+    if not changes and expected_version is None:
+        return instance, errors
+
+    with transaction.atomic():
+        updated = rows.update(**changes, version=F("version") + 1)
+        if updated:
+            record_changes([instance.pk])
+    if not updated:
+        errors["version"] = [VERSION_CONFLICT_ERROR]
+        return product, errors
+
+    for field, value in changes.items():
+        setattr(instance, field, value)
+    if expected_version is not None:
+        instance.version = expected_version + 1
+    else:
+        instance.refresh_from_db(fields=["version"])
+    product = instance
+    publish_on_commit(product)
+    refresh_catalog_on_commit([product.pk])
+    invalidate_on_commit(Product, [product.pk])
     return product, errors
 
 
+def delete_products(*, queryset: QuerySet) -> int:
+    with transaction.atomic():
+        product_ids = list(queryset.values_list("pk", flat=True))
+        refresh_catalog_on_commit(product_ids)
+        invalidate_on_commit(Product, product_ids)
+        discard_on_commit(product_ids)
+        record_changes(product_ids, deleted=True)
+        deleted, _ = Product.objects.filter(pk__in=product_ids).delete()
+    return deleted
+
+
+def delete_seller(*, seller: User, background: bool = True
+                  ) -> SellerDeletion:
+    """
+    Deactivates ``seller``, which hides their products at once, and deletes
+    the products in batches of ``SELLER_DELETION["batch_size"]``, each in
+    its own short transaction, so purchases are never blocked behind one
+    large cascade. The seller is deleted after the last batch. The batches
+    run as background jobs, or with ``background=False`` are left to the
+    caller to run with ``purge_next_batch``.
+    """
+    with transaction.atomic():
+        User.objects.filter(pk=seller.pk).update(is_active=False)
+        seller.is_active = False
+        invalidate_on_commit(User, [seller.pk])
+        deletion = SellerDeletion.objects.create(
+            seller_id=seller.pk,
+            username=seller.username,
+            total=Product.objects.filter(seller=seller).count()
+        )
+        # Cached products are dropped by the batches that delete them, and
+        # purchases never take the stock of a hidden one meanwhile.
+        rebuild_catalog_on_commit()
+        transaction.on_commit(get_leaderboard().clear)
+        if background:
+            purge_seller_products.delay(deletion.pk)
+    return deletion
+
+
+@background_job
+def purge_seller_products(deletion_id: int):
+    deletion = SellerDeletion.objects.filter(
+        pk=deletion_id, finished_at=None
+    ).first()
+    if deletion is not None and purge_next_batch(deletion):
+        purge_seller_products.delay(deletion_id)
+
+
+def purge_next_batch(deletion: SellerDeletion) -> bool:
+    """
+    Deletes the next batch of products of a seller deletion, or the seller
+    once no products are left. Returns whether there is more to do.
+    """
+    with transaction.atomic():
+        product_ids = list(Product.objects.filter(
+            seller_id=deletion.seller_id,
+            pk__gt=deletion.last_product_id
+        ).order_by("pk").values_list(
+            "pk", flat=True
+        )[:settings.SELLER_DELETION["batch_size"]])
+        if product_ids:
+            deletion.deleted += delete_products(
+                queryset=Product.objects.filter(pk__in=product_ids)
+            )
+            deletion.last_product_id = product_ids[-1]
+            deletion.save(update_fields=["deleted", "last_product_id"])
+        else:
+            # Anything added after the last batch goes with the seller.
+            delete_products(
+                queryset=Product.objects.filter(seller_id=deletion.seller_id)
+            )
+            User.objects.filter(pk=deletion.seller_id).delete()
+            deletion.finished_at = timezone.now()
+            deletion.save(update_fields=["finished_at"])
+    log.info("Seller %s deletion: %d/%d products deleted%s",
+             deletion.username, deletion.deleted, deletion.total,
+             ", done" if deletion.finished_at else "")
+    return deletion.finished_at is None
+
+
+def restock_products(*, queryset: QuerySet, quantity: int) -> int:
+    with transaction.atomic():
+        product_ids = list(queryset.values_list("pk", flat=True))
+        refresh_catalog_on_commit(product_ids)
+        invalidate_on_commit(Product, product_ids)
+        record_changes(product_ids)
+        return Product.objects.filter(pk__in=product_ids).update(
+            amount_available=F("amount_available") + quantity,
+            version=F("version") + 1
+        )
+
+
+def reprice_products(*, queryset: QuerySet, cost: int) -> int:
+    with transaction.atomic():
+        product_ids = list(queryset.values_list("pk", flat=True))
+        refresh_catalog_on_commit(product_ids)
+        invalidate_on_commit(Product, product_ids)
+        record_changes(product_ids)
+        return Product.objects.filter(pk__in=product_ids).update(
+            cost=cost, version=F("version") + 1
+        )
+
+
 def validate_product_cost(cost: int):
     errors = []
     if cost % 5:
@@ -54,43 +218,125 @@ def validate_product_cost(cost: int):
     return errors
 
 
+BUY_CONFLICT_ERROR = "Product changed while buying it. Please try again."
+INSUFFICIENT_FUNDS_ERROR = ("Insufficient funds. Please make sure to have at "
+                            "least {total_cost} in your deposit.")
+
+
+@transaction.atomic
 def buy_product(*,
-                product_id: Product,
+                product_id,
                 amount_products: int,
                 buyer: User) -> Tuple[Optional[dict], dict]:
+    """
+    ``product_id`` is a ``Product`` or a catalog snapshot entry. The checks
+    run against it and the stock is then taken with an ``UPDATE`` that only
+    applies if the cost and stock they saw still hold; only on a miss is
+    the row reread from the database and checked once more.
+    """
     buy_response, errors = None, {}
-    validation_errors_messages = validate_buy(
-        product=product_id,
-        amount=amount_products,
-        buyer=buyer
-    )
+    product = product_id
+    for _ in range(2):
+        validation_errors_messages = validate_buy(
+            product=product,
+            amount=amount_products,
+            buyer=buyer
+        )
+        if validation_errors_messages:
+            break
+        cost = product.cost
+        taken = take_stock(product, amount_products)
+        if taken is not None:
+            product = taken
+            break
+        product = Product.objects.listed().filter(pk=product.id).first()
+        if product is None:
+            validation_errors_messages = ["Product does not exist."]
+            break
+    else:
+        validation_errors_messages = [BUY_CONFLICT_ERROR]
+
+    if not validation_errors_messages:
+        total_cost = cost * amount_products
+        # Only the difference is written, so coins deposited meanwhile are
+        # kept; if the deposit was spent meanwhile the stock is given back.
+        debited = User.objects.filter(
+            pk=buyer.pk,
+            deposit__gte=total_cost
+        ).update(deposit=F("deposit") - total_cost)
+        buyer.refresh_from_db(fields=["deposit"])
+        if not debited:
+            transaction.set_rollback(True)
+            validation_errors_messages = [
+                INSUFFICIENT_FUNDS_ERROR.format(total_cost=total_cost)
+            ]
+
     if validation_errors_messages:
         errors = {
             "details": validation_errors_messages
         }
     else:
-        total_cost = product_id.cost * amount_products
-
-        buyer.deposit = buyer.deposit - total_cost
-        product_id.amount_available = (
-            product_id.amount_available - amount_products)
-        product_id.save()
-        buyer.save()
+        record_changes([product.pk])
+        publish_on_commit(product)
+        refresh_catalog_on_commit([product.pk])
+        invalidate_on_commit(Product, [product.pk])
+        invalidate_on_commit(User, [buyer.pk])
+        record_sale_on_commit(product)
         buy_response = {
             "change": buyer.deposit,
-            "product_name": str(product_id.name),
+            "product_name": str(product.name),
             "total_cost": total_cost,
         }
 
     return buy_response, errors
 
 
-def validate_buy(product: Product, amount: int, buyer: User):
+def take_stock(product, amount: int) -> Optional[Product]:
+    """
+    Takes ``amount`` of the stock of ``product`` (a ``Product`` or a
+    catalog snapshot entry) if it is still listed, at the cost it has and
+    with enough left. Returns the product as the ``UPDATE`` left it, read
+    back with ``RETURNING`` where the database supports it, or ``None``.
+    """
+    matching = Product.objects.listed().filter(
+        pk=product.id,
+        cost=product.cost,
+        amount_available__gte=amount
+    )
+    connection = connections[router.db_for_write(Product)]
+    if not connection.features.can_return_columns_from_insert:
+        taken = matching.update(
+            amount_available=F("amount_available") - amount,
+            units_sold=F("units_sold") + amount,
+            version=F("version") + 1
+        )
+        return Product.objects.get(pk=product.id) if taken else None
+
+    subquery, params = matching.values("pk").query.sql_with_params()
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"UPDATE {Product._meta.db_table} "
+            f"SET amount_available = amount_available - %s, "
+            f"units_sold = units_sold + %s, version = version + 1 "
+            f"WHERE id IN ({subquery}) "
+            f"RETURNING name, seller_id, amount_available, units_sold, "
+            f"version",
+            [amount, amount, *params]
+        )
+        row = cursor.fetchone()
+    if row is None:
+        return None
+    return Product(id=product.id, cost=product.cost, **dict(zip(
+        ["name", "seller_id", "amount_available", "units_sold", "version"],
+        row
+    )))
+
+
+def validate_buy(product, amount: int, buyer: User):
     errors = []
     total_cost = product.cost * amount
     if buyer.deposit < total_cost:
-        errors.append(f"Insufficient funds. Please make sure to have at "
-                      f"least {total_cost} in your deposit.")
+        errors.append(INSUFFICIENT_FUNDS_ERROR.format(total_cost=total_cost))
     if product.amount_available < amount:
         errors.append(f"Product insufficient stock. You can only buy a "
                       f"total of {product.amount_available}.")
@@ -0,0 +1,154 @@
+import asyncio
+from urllib.parse import parse_qs
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from rest_framework.exceptions import AuthenticationFailed
+
+from apps.accounts.authentication import JWTAuthentication
+from apps.core.renderers import FastJSONRenderer
+from apps.products.events import broker
+
+
+renderer = FastJSONRenderer()
+
+
+async def authenticate(scope):
+    """
+    Reads the JWT from the ``Authorization`` header or, for browser clients
+    that can't set headers on EventSource/WebSocket, a ``token`` query
+    parameter.
+    """
+    authentication = JWTAuthentication()
+    header = dict(scope["headers"]).get(b"authorization")
+    try:
+        raw_token = authentication.get_raw_token(header) if header else None
+    except AuthenticationFailed:
+        return None
+    if raw_token is None:
+        query = parse_qs(scope.get("query_string", b"").decode())
+        raw_token = query.get("token", [None])[0]
+    if raw_token is None:
+        return None
+
+    payload, errors = authentication.get_validated_token(raw_token)
+    if not payload:
+        return None
+    try:
+        return await sync_to_async(authentication.get_user)(payload)
+    except AuthenticationFailed:
+        return None
+
+
+async def wait_for(receive, message_type):
+    while (await receive())["type"] != message_type:
+        pass
+
+
+async def pump_changes(subscription, closed, write):
+    """
+    Writes coalesced changes with ``write(event, data)`` until ``closed``
+    finishes, sending a heartbeat when nothing changed for a while.
+    """
+    heartbeat = settings.PRODUCT_STREAM["heartbeat"]
+    while not closed.done():
+        changes = asyncio.ensure_future(subscription.get())
+        done, _ = await asyncio.wait(
+            {changes, closed}, timeout=heartbeat,
+            return_when=asyncio.FIRST_COMPLETED
+        )
+        if changes not in done:
+            changes.cancel()
+            if not closed.done():
+                await write(None, None)
+            continue
+
+        products, overflowed = changes.result()
+        if overflowed:
+            await write("resync", {})
+        for product in products:
+            await write("product", product)
+
+
+async def stream_events(scope, receive, send):
+    if await authenticate(scope) is None:
+        await send({"type": "http.response.start", "status": 401,
+                    "headers": [(b"content-type", b"application/json")]})
+        await send({"type": "http.response.body", "body": renderer.render(
+            {"detail": "Authentication credentials were not provided."}
+        )})
+        return
+
+    await send({"type": "http.response.start", "status": 200, "headers": [
+        (b"content-type", b"text/event-stream"),
+        (b"cache-control", b"no-cache"),
+        (b"x-accel-buffering", b"no"),
+    ]})
+
+    async def write(event, data):
+        if event is None:
+            body = b": keep-alive\n\n"
+        else:
+            body = (b"event: " + event.encode()
+                    + b"\ndata: " + renderer.render(data) + b"\n\n")
+        await send({"type": "http.response.body", "body": body,
+                    "more_body": True})
+
+    # Subscribe before the stream opens so no change committed after the
+    # client sees it can be missed.
+    subscription = broker.subscribe(settings.PRODUCT_STREAM["max_pending"])
+    closed = asyncio.ensure_future(wait_for(receive, "http.disconnect"))
+    try:
+        await send({"type": "http.response.body",
+                    "body": b"retry: 3000\n\n", "more_body": True})
+        await pump_changes(subscription, closed, write)
+    finally:
+        broker.unsubscribe(subscription)
+        closed.cancel()
+
+
+async def stream_websocket(scope, receive, send):
+    await wait_for(receive, "websocket.connect")
+    if await authenticate(scope) is None:
+        await send({"type": "websocket.close", "code": 4401})
+        return
+
+    async def write(event, data):
+        if event is not None:
+            await send({"type": "websocket.send",
+                        "text": renderer.render(
+                            {"type": event, "data": data}
+                        ).decode()})
+
+    subscription = broker.subscribe(settings.PRODUCT_STREAM["max_pending"])
+    closed = asyncio.ensure_future(wait_for(receive, "websocket.disconnect"))
+    try:
+        await send({"type": "websocket.accept"})
+        await pump_changes(subscription, closed, write)
+    finally:
+        broker.unsubscribe(subscription)
+        closed.cancel()
+
+
+class ProductStreamApplication:
+    """
+    Serves the product change stream at ``PRODUCT_STREAM["path"]`` as
+    Server-Sent Events, or as a WebSocket for ``websocket`` connections.
+    Everything else goes to ``application``.
+    """
+
+    def __init__(self, application):
+        self.application = application
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "websocket":
+            if scope["path"] == settings.PRODUCT_STREAM["path"]:
+                return await stream_websocket(scope, receive, send)
+            await wait_for(receive, "websocket.connect")
+            return await send({"type": "websocket.close", "code": 4404})
+
+        if (scope["type"] == "http"
+                and scope["path"] == settings.PRODUCT_STREAM["path"]
+                and scope["method"] == "GET"):
+            return await stream_events(scope, receive, send)
+        return await self.application(scope, receive, send)
@@ -0,0 +1,108 @@
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework.test import APITestCase
+
+from apps.accounts.choices import UserRole
+from apps.accounts.models import User
+from apps.products.models import Product
+
+
+class ProductAdminTestCase(APITestCase):
+
+    def setUp(self):
+        self.admin = User.objects.create_superuser(
+            username="admin", password="1234test"
+        )
+        self.sellers = [
+            User.objects.create_user(username=f"seller{i}",
+                                     password="1234test",
+                                     role=UserRole.SELLER)
+            for i in range(3)
+        ]
+        Product.objects.bulk_create(
+            Product(name=f"Product {i}", cost=5, amount_available=i,
+                    seller=self.sellers[i % 3])
+            for i in range(150)
+        )
+        self.changelist_url = reverse("admin:products_product_changelist")
+        self.client.force_login(self.admin)
+
+    def test_changelist_queries_do_not_grow_with_rows(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(self.changelist_url)
+        assert response.status_code == 200
+        sql = [query["sql"] for query in queries.captured_queries]
+        assert not any('FROM "accounts_user" WHERE "accounts_user"."id" ='
+                       in query for query in sql[2:])
+        assert not any("COUNT(*)" in query for query in sql)
+        assert len(sql) < 10
+
+    def test_keyset_paging(self):
+        response = self.client.get(self.changelist_url)
+        first_page = list(response.context["cl"].result_list)
+        assert first_page[0].name == "Product 149"
+        next_url = response.context["cl"].keyset_next_url()
+        assert next_url == f"?after={first_page[-1].pk}"
+
+        response = self.client.get(self.changelist_url + next_url)
+        second_page = list(response.context["cl"].result_list)
+        assert second_page[0].pk == first_page[-1].pk - 1
+
+    def test_other_orderings_page_with_offsets(self):
+        # Sorted by stock, ascending
+        response = self.client.get(self.changelist_url + "?o=5")
+        first_page = list(response.context["cl"].result_list)
+        assert [p.amount_available for p in first_page[:2]] == [0, 1]
+        assert response.context["cl"].keyset_next_url() is None
+
+        last = first_page[-1].pk
+        response = self.client.get(self.changelist_url +
+                                   f"?o=5&p=2&after={last}")
+        second_page = list(response.context["cl"].result_list)
+        assert second_page[0].amount_available == len(first_page)
+
+    def test_restock_and_reprice_actions(self):
+        products = Product.objects.filter(seller=self.sellers[0])
+        selected = [str(pk) for pk in products.values_list("pk", flat=True)]
+        data = {"action": "restock", "_selected_action": selected}
+
+        response = self.client.post(self.changelist_url, data)
+        assert response.status_code == 200
+        assert b'name="quantity"' in response.content
+
+        stock = sum(products.values_list("amount_available", flat=True))
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post(self.changelist_url, {
+                **data, "apply": "1", "quantity": 10
+            })
+        assert response.status_code == 302
+        assert sum(q["sql"].startswith("UPDATE")
+                   for q in queries.captured_queries) == 1
+        assert sum(products.values_list("amount_available", flat=True)) == (
+            stock + 10 * len(selected)
+        )
+
+        response = self.client.post(self.changelist_url, {
+            "action": "reprice", "_selected_action": selected,
+            "apply": "1", "cost": 7
+        })
+        assert response.status_code == 200
+        assert not products.filter(cost=7).exists()
+
+        self.client.post(self.changelist_url, {
+            "action": "reprice", "_selected_action": selected,
+            "apply": "1", "cost": 15
+        })
+        assert products.filter(cost=15).count() == len(selected)
+        assert not Product.objects.exclude(
+            seller=self.sellers[0]
+        ).filter(cost=15).exists()
+
+    def test_seller_autocomplete(self):
+        response = self.client.get(
+            reverse("admin:products_product_change",
+                    args=[Product.objects.first().pk])
+        )
+        assert response.status_code == 200
+        assert b"admin-autocomplete" in response.content
@@ -0,0 +1,151 @@
+import os
+import tempfile
+
+from django.db import connection
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
+from rest_framework import status
+from rest_framework.reverse import reverse
+from rest_framework.test import APITestCase
+
+from apps.accounts.choices import UserRole
+from apps.accounts.models import User
+from apps.core.jobs import get_executor
+from apps.products.catalog import (
+    SEQUENCE,
+    SEQUENCE_OFFSET,
+    CatalogSnapshot,
+    SnapshotBusy,
+    get_catalog,
+    rebuild_catalog,
+    refresh_catalog
+)
+from apps.products.models import Product
+
+
+class CatalogSnapshotTestCase(APITestCase):
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = os.path.join(directory.name, "catalog.snapshot")
+        settings_override = override_settings(
+            CATALOG_SNAPSHOT={"enabled": True, "path": self.path}
+        )
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+        self.seller = User.objects.create_user(
+            username="mrsmith", password="1234test", role=UserRole.SELLER
+        )
+        self.buyer = User.objects.create_user(
+            username="johndoe", password="1234test", role=UserRole.BUYER,
+            deposit=100
+        )
+        self.products = Product.objects.bulk_create(
+            Product(name=f"Product {i % 2}", cost=5, amount_available=10,
+                    seller=self.seller)
+            for i in range(4)
+        )
+        rebuild_catalog()
+        self.addCleanup(get_executor().queue.clear)
+
+    def test_snapshot_layout(self):
+        snapshot = CatalogSnapshot(self.path)
+        self.addCleanup(snapshot.close)
+        assert len(snapshot) == 4
+        entry = snapshot.get(self.products[3].pk)
+        assert entry == (self.products[3].pk, self.seller.pk, 5, 10, 1,
+                         "Product 1")
+        assert [e.id for e in snapshot[1:3]] == \
+            [p.pk for p in self.products[1:3]]
+        assert snapshot.get(self.products[-1].pk + 1) is None
+        # Each distinct name is stored once
+        names_size = os.path.getsize(self.path) - (40 + 4 * 48)
+        assert names_size == len("Product 0Product 1")
+
+    def test_purchase_patches_the_record_in_place(self):
+        snapshot = get_catalog()
+        self.client.force_login(self.buyer)
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(reverse("buy-list"), data={
+                "product_id": self.products[0].pk, "amount_products": 3
+            })
+        get_executor().run_pending()
+        assert response.status_code == status.HTTP_200_OK
+        assert not snapshot.stale
+        entry = snapshot.get(self.products[0].pk)
+        assert (entry.amount_available, entry.version) == (7, 2)
+
+    def test_create_and_delete_replace_the_file(self):
+        snapshot = get_catalog()
+        self.client.force_login(self.seller)
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(reverse("products-list"), data={
+                "name": "Product 9", "cost": 10, "amount_available": 1
+            })
+        get_executor().run_pending()
+        assert response.status_code == status.HTTP_201_CREATED
+        assert snapshot.stale
+        assert get_catalog().get(response.data["id"]).name == "Product 9"
+
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.delete(
+                reverse("products-detail", args=[self.products[1].pk])
+            )
+        get_executor().run_pending()
+        assert response.status_code == status.HTTP_204_NO_CONTENT
+        assert get_catalog().get(self.products[1].pk) is None
+        assert len(get_catalog()) == 4
+
+    def test_reads_are_served_from_the_snapshot(self):
+        self.client.force_login(self.buyer)
+        with CaptureQueriesContext(connection) as queries:
+            retrieved = self.client.get(
+                reverse("products-detail", args=[self.products[2].pk])
+            )
+            listed = self.client.get(reverse("products-list"))
+        assert not any("products_product" in query["sql"]
+                       for query in queries.captured_queries)
+        assert retrieved.status_code == status.HTTP_200_OK
+        assert retrieved["ETag"] == '"1"'
+        assert retrieved.data["name"] == "Product 0"
+        assert listed.data["count"] == 4
+        assert [p["id"] for p in listed.data["results"]] == \
+            [p.pk for p in self.products]
+
+    def test_stale_snapshot_cannot_oversell(self):
+        Product.objects.filter(pk=self.products[0].pk).update(
+            amount_available=1
+        )
+        self.client.force_login(self.buyer)
+        response = self.client.post(reverse("buy-list"), data={
+            "product_id": self.products[0].pk, "amount_products": 3
+        })
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+        assert response.data == {
+            "details": ["Product insufficient stock. You can only buy a "
+                        "total of 1."]
+        }
+        self.products[0].refresh_from_db()
+        assert self.products[0].amount_available == 1
+
+    def test_interrupted_patch_falls_back_to_the_database(self):
+        # As left by a writer that died halfway through a patch
+        with open(self.path, "r+b") as f:
+            f.seek(SEQUENCE_OFFSET)
+            f.write(SEQUENCE.pack(1))
+        with self.assertRaises(SnapshotBusy):
+            get_catalog().get(self.products[2].pk)
+
+        self.client.force_login(self.buyer)
+        retrieved = self.client.get(
+            reverse("products-detail", args=[self.products[2].pk])
+        )
+        listed = self.client.get(reverse("products-list"))
+        assert retrieved.data["name"] == "Product 0"
+        assert listed.data["count"] == 4
+
+        # The next refresh drops the snapshot instead of patching it.
+        refresh_catalog(pks=[self.products[0].pk])
+        assert not os.path.exists(self.path)
@@ -0,0 +1,127 @@
+import datetime
+
+from django.test import override_settings
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.reverse import reverse
+from rest_framework.test import APITestCase
+
+from apps.accounts.choices import UserRole
+from apps.accounts.models import User
+from apps.products.changes import compact_changes
+from apps.products.models import ChangeFeedCursor, Product, ProductChange
+from apps.products.purchasing import PurchaseEngine, PurchaseRequest
+from apps.products.services import delete_seller, restock_products
+
+
+class ChangeFeedTestCase(APITestCase):
+
+    def setUp(self):
+        self.seller = User.objects.create_user(
+            username="mrsmith", password="1234test", role=UserRole.SELLER
+        )
+        self.buyer = User.objects.create_user(
+            username="johndoe", password="1234test", role=UserRole.BUYER,
+            deposit=100
+        )
+        self.url = reverse("products-changes")
+        self.client.force_login(self.seller)
+        self.products = [self.create(f"Product {i}") for i in range(3)]
+
+    def create(self, name):
+        response = self.client.post(reverse("products-list"), data={
+            "name": name, "cost": 10, "amount_available": 5
+        })
+        assert response.status_code == status.HTTP_201_CREATED
+        return response.data["id"]
+
+    def feed(self, since, client="kiosk", expected=status.HTTP_200_OK):
+        response = self.client.get(self.url, {"since": since,
+                                              "client": client})
+        assert response.status_code == expected
+        return response.data
+
+    def test_only_changes_since_the_last_sync_are_returned(self):
+        first = self.feed(0)
+        assert [c["id"] for c in first["changes"]] == self.products
+        assert not first["more"]
+
+        self.client.put(
+            reverse("products-detail", args=[self.products[1]]),
+            data={"name": "Renamed"}
+        )
+        self.client.force_login(self.buyer)
+        self.client.post(reverse("buy-list"), data={
+            "product_id": self.products[1], "amount_products": 2
+        })
+        self.client.force_login(self.seller)
+        self.client.delete(reverse("products-detail",
+                                   args=[self.products[2]]))
+
+        second = self.feed(first["seq"])
+        assert second["changes"] == [
+            {"seq": second["seq"] - 1, "id": self.products[1],
+             "deleted": False, "product": {
+                 "id": self.products[1], "name": "Renamed",
+                 "seller_id": self.seller.pk, "amount_available": 3,
+                 "cost": 10,
+             }},
+            {"seq": second["seq"], "id": self.products[2],
+             "deleted": True, "product": None},
+        ]
+        assert self.feed(second["seq"])["changes"] == []
+
+    def test_bulk_writes_are_in_the_feed(self):
+        since = self.feed(0)["seq"]
+        restock_products(queryset=Product.objects.all(), quantity=1)
+        PurchaseEngine(window=0, max_batch=1).commit([
+            PurchaseRequest(self.products[0], 1, self.buyer.pk, None)
+        ])
+        changes = self.feed(since)["changes"]
+        assert [c["id"] for c in changes] == self.products[1:] + \
+            self.products[:1]
+        assert changes[-1]["product"]["amount_available"] == 5
+
+    def test_products_of_a_deactivated_seller_are_deleted(self):
+        since = self.feed(0)["seq"]
+        restock_products(
+            queryset=Product.objects.filter(pk=self.products[0]), quantity=1
+        )
+        delete_seller(seller=self.seller)
+
+        self.client.force_login(self.buyer)
+        assert self.feed(since)["changes"] == [
+            {"seq": since + 1, "id": self.products[0],
+             "deleted": True, "product": None},
+        ]
+
+    @override_settings(CHANGE_FEED={
+        "page_size": 2, "client_retention": datetime.timedelta(days=7)
+    })
+    def test_pages(self):
+        page = self.feed(0)
+        assert page["more"] and len(page["changes"]) == 2
+        page = self.feed(page["seq"])
+        assert not page["more"] and len(page["changes"]) == 1
+
+    def test_compaction_waits_for_every_client(self):
+        head = self.feed(0, client="kiosk-1")["seq"]
+        self.feed(0, client="kiosk-2")
+        self.feed(head, client="kiosk-1")
+        assert compact_changes() == 0
+
+        self.feed(head - 1, client="kiosk-2")
+        assert compact_changes() == head - 1
+        assert ProductChange.objects.count() == 1
+        self.feed(head - 1, client="kiosk-2")
+
+        # A client that stopped syncing no longer holds entries back, and
+        # has to start over.
+        ChangeFeedCursor.objects.filter(client="kiosk-2").update(
+            updated_at=timezone.now() - datetime.timedelta(days=8)
+        )
+        assert compact_changes() == 1
+        gone = self.feed(head - 1, client="kiosk-2",
+                         expected=status.HTTP_410_GONE)
+        assert gone["seq"] == head
+        assert self.feed(gone["seq"], client="kiosk-2")["changes"] == []
@@ -0,0 +1,91 @@
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from rest_framework import status
+from rest_framework.reverse import reverse
+from rest_framework.test import APITestCase
+
+from apps.accounts.choices import UserRole
+from apps.accounts.models import User
+from apps.products.models import Product
+
+
+class SparseFieldsetTestCase(APITestCase):
+
+    def setUp(self):
+        self.sellers = [
+            User.objects.create_user(username=f"seller{i}",
+                                     password="1234test",
+                                     role=UserRole.SELLER)
+            for i in range(3)
+        ]
+        Product.objects.bulk_create(
+            Product(name=f"Product {i}", cost=5, amount_available=i,
+                    seller=self.sellers[i % 3])
+            for i in range(6)
+        )
+        self.list_url = reverse("products-list")
+        self.client.force_login(self.sellers[0])
+
+    def product_queries(self, queries):
+        return [query["sql"] for query in queries.captured_queries
+                if 'FROM "products_product"' in query["sql"]
+                and "COUNT(" not in query["sql"]]
+
+    def test_fields_are_projected_down_to_sql(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(self.list_url,
+                                       {"fields": "id,name,cost"})
+        assert response.status_code == status.HTTP_200_OK
+        assert response.data["results"][0] == {
+            "id": 1, "name": "Product 0", "cost": 5
+        }
+        [sql] = self.product_queries(queries)
+        # The seller join that hides inactive sellers' products still
+        # uses seller_id; only the selected columns are projected.
+        columns = sql.split(" FROM ")[0]
+        assert '"products_product"."amount_available"' not in columns
+        assert '"products_product"."seller_id"' not in columns
+
+    def test_expand_seller_uses_one_join(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(
+                self.list_url, {"fields": "id,name", "expand": "seller"}
+            )
+        assert response.status_code == status.HTTP_200_OK
+        assert response.data["results"][1] == {
+            "id": 2, "name": "Product 1",
+            "seller": {"id": self.sellers[1].pk, "username": "seller1"},
+        }
+        [sql] = self.product_queries(queries)
+        assert 'INNER JOIN "accounts_user"' in sql
+        # Only the session's own user lookup, no per-row seller queries
+        user_lookups = [
+            query for query in queries.captured_queries
+            if 'FROM "accounts_user" WHERE "accounts_user"."id" =' in
+            query["sql"]
+        ]
+        assert len(user_lookups) == 1
+
+    def test_default_output_is_unchanged(self):
+        response = self.client.get(self.list_url)
+        assert set(response.data["results"][0]) == {
+            "id", "name", "seller_id", "amount_available", "cost"
+        }
+
+    def test_retrieve_supports_fieldsets(self):
+        url = reverse("products-detail", args=[1])
+        response = self.client.get(url, {"fields": "cost",
+                                         "expand": "seller"})
+        assert response.data == {
+            "cost": 5,
+            "seller": {"id": self.sellers[0].pk, "username": "seller0"},
+        }
+        assert response["ETag"] == '"1"'
+
+    def test_unknown_fields_are_rejected(self):
+        response = self.client.get(self.list_url, {"fields": "id,password"})
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+        assert response.data == {"fields": ["Unknown field: password."]}
+
+        response = self.client.get(self.list_url, {"expand": "buyer"})
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
@@ -0,0 +1,280 @@
+import asyncio
+import os
+import shutil
+import tempfile
+import threading
+import time
+from unittest import mock
+
+from django.test import TestCase, TransactionTestCase
+
+from apps.accounts.choices import UserRole
+from apps.accounts.models import User
+from apps.core.idempotency import idempotency_key
+from apps.products.inventory import (
+    InventoryClient,
+    InventoryEngine,
+    InventoryServer,
+    JournalCorrupted
+)
+from apps.products.models import Product
+
+
+class InventoryTestMixin:
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+        self.journal_dir = os.path.join(self.directory, "journal")
+        self.seller = User.objects.create_user(
+            username="mrsmith", password="1234test", role=UserRole.SELLER
+        )
+        self.buyer = User.objects.create_user(
+            username="johndoe", password="1234test", role=UserRole.BUYER,
+            deposit=50
+        )
+        self.product = Product.objects.create(
+            name="Product 0", cost=5, amount_available=10, seller=self.seller
+        )
+
+    def start_engine(self) -> InventoryEngine:
+        engine = InventoryEngine(self.journal_dir)
+        engine.recover()
+        self.addCleanup(engine.journal.close)
+        engine.preload(products=[self.product.pk], users=[self.buyer.pk])
+        return engine
+
+    def buy(self, engine, amount):
+        return engine.buy(product=self.product.pk, cost=5, name="Product 0",
+                          amount=amount, buyer=self.buyer.pk)
+
+
+class InventoryRecoveryTestCase(InventoryTestMixin, TestCase):
+
+    def state(self, engine):
+        return (engine.stock[self.product.pk], engine.deposits[self.buyer.pk])
+
+    def test_restart_replays_the_journal(self):
+        engine = self.start_engine()
+        assert self.buy(engine, 3)["errors"] == {}
+        engine.deposit(amount=20, buyer=self.buyer.pk)
+        assert self.buy(engine, 20)["errors"]
+        engine.commit()
+        # Crash: nothing was checkpointed
+        self.product.refresh_from_db()
+        assert self.product.amount_available == 10
+
+        recovered = self.start_engine()
+        assert self.state(recovered) == (7, 55)
+        assert recovered.seq == engine.seq == 2
+
+    def test_coins_are_journaled_as_one_deposit(self):
+        engine = self.start_engine()
+        reply = engine.deposit_coins(amounts=[5, 10, 20], buyer=self.buyer.pk)
+        assert reply["result"] == {"deposit": 85}
+        reply = engine.deposit_coins(amounts=[5, 3], buyer=self.buyer.pk)
+        assert reply["errors"] == {
+            "amount": ["Deposit amount can only be a multiple of 5."]
+        }
+        engine.commit()
+
+        recovered = self.start_engine()
+        assert self.state(recovered) == (10, 85)
+        assert recovered.seq == engine.seq == 1
+
+    def test_replay_is_deterministic(self):
+        engine = self.start_engine()
+        for amount in (1, 2, 3):
+            self.buy(engine, amount)
+        engine.reset_deposit(buyer=self.buyer.pk)
+        engine.deposit(amount=10, buyer=self.buyer.pk)
+        engine.commit()
+
+        first, second = self.start_engine(), self.start_engine()
+        assert self.state(first) == self.state(second) == \
+            self.state(engine) == (4, 10)
+
+    def test_torn_tail_is_dropped(self):
+        engine = self.start_engine()
+        self.buy(engine, 1)
+        engine.commit()
+        self.buy(engine, 1)
+        engine.journal._file.flush()
+        # Crash halfway through writing the second record
+        [segment] = engine.journal.segments()
+        os.truncate(segment, os.path.getsize(segment) - 3)
+
+        recovered = self.start_engine()
+        assert self.state(recovered) == (9, 45)
+        self.buy(recovered, 2)
+        recovered.commit()
+        assert self.state(self.start_engine()) == (7, 35)
+
+    def test_corruption_before_the_tail_is_refused(self):
+        engine = self.start_engine()
+        self.buy(engine, 1)
+        engine.commit()
+        engine.checkpoint()
+        self.buy(engine, 1)
+        engine.commit()
+        with open(engine.journal.segments()[0], "r+b") as f:
+            f.seek(10)
+            f.write(b"\xff")
+        self.buy(engine, 1)
+        engine.journal.rotate(engine.seq + 1)
+        self.buy(engine, 1)
+        engine.commit()
+
+        with self.assertRaises(JournalCorrupted):
+            self.start_engine()
+
+    def test_checkpoint_writes_tables_and_drops_segments(self):
+        engine = self.start_engine()
+        self.buy(engine, 4)
+        engine.commit()
+        engine.checkpoint()
+
+        self.product.refresh_from_db()
+        self.buyer.refresh_from_db()
+        assert (self.product.amount_available, self.buyer.deposit) == (6, 30)
+        assert self.product.version == 2
+        assert len(engine.journal.segments()) == 1
+        assert self.state(self.start_engine()) == (6, 30)
+
+    def test_crash_between_checkpoint_write_and_truncation(self):
+        engine = self.start_engine()
+        self.buy(engine, 4)
+        engine.commit()
+        with mock.patch.object(engine, "finish_checkpoint"):
+            engine.checkpoint()
+        # The tables already hold the result and the journal still has it
+        self.product.refresh_from_db()
+        assert self.product.amount_available == 6
+        assert len(engine.journal.segments()) == 2
+
+        recovered = self.start_engine()
+        assert self.state(recovered) == (6, 30)
+        recovered.checkpoint()
+        self.buyer.refresh_from_db()
+        assert self.buyer.deposit == 30
+
+    def test_sequence_survives_a_restart_after_a_checkpoint(self):
+        engine = self.start_engine()
+        for amount in (1, 2):
+            self.buy(engine, amount)
+        engine.commit()
+        engine.checkpoint()
+        engine.journal.close()
+
+        restarted = self.start_engine()
+        assert restarted.seq == engine.seq == 2
+        self.buy(restarted, 3)
+        restarted.commit()
+        # A checkpoint that fails after rotating, then a crash
+        with mock.patch.object(restarted, "write_checkpoint",
+                               side_effect=RuntimeError("disk full")):
+            with self.assertRaises(RuntimeError):
+                restarted.checkpoint()
+        self.buy(restarted, 1)
+        restarted.commit()
+        assert len(restarted.journal.segments()) == 2
+
+        recovered = self.start_engine()
+        assert recovered.seq == 4
+        assert self.state(recovered) == (3, 15)
+
+    def test_failed_checkpoint_is_retried(self):
+        engine = self.start_engine()
+        self.buy(engine, 4)
+        engine.commit()
+        with mock.patch.object(engine, "write_checkpoint",
+                               side_effect=RuntimeError("disk full")):
+            with self.assertRaises(RuntimeError):
+                engine.checkpoint()
+        assert engine.dirty_products == {self.product.pk}
+
+        engine.checkpoint()
+        self.product.refresh_from_db()
+        assert self.product.amount_available == 6
+        assert self.product.units_sold == 4
+        assert len(engine.journal.segments()) == 1
+
+    def test_retried_requests_are_not_applied_again(self):
+        engine = self.start_engine()
+        command = {"op": "buy", "product": self.product.pk, "cost": 5,
+                   "name": "Product 0", "amount": 2, "buyer": self.buyer.pk,
+                   "request": f"{self.buyer.pk}:key"}
+        first = engine.execute(dict(command))
+        engine.commit()
+        engine.journal.close()
+
+        # The database transaction storing the key failed; the client
+        # retries against a restarted engine.
+        engine = self.start_engine()
+        retried = engine.execute(dict(command))
+        assert retried == {**first, "replayed": True}
+        assert self.state(engine) == (8, 40)
+        assert engine.execute(dict(command, request="other"))["errors"] == {}
+        assert self.state(engine) == (6, 30)
+
+        engine.forget_replies(now=time.time() + 25 * 60 * 60)
+        assert engine.replies == {}
+
+    def test_sold_counters_survive_a_crash(self):
+        engine = self.start_engine()
+        assert self.buy(engine, 3)["sold"] == 3
+        engine.commit()
+
+        recovered = self.start_engine()
+        assert self.buy(recovered, 2)["sold"] == 5
+        recovered.checkpoint()
+        self.product.refresh_from_db()
+        assert self.product.units_sold == 5
+
+
+class InventoryServerTestCase(InventoryTestMixin, TransactionTestCase):
+
+    def test_clients_round_trip_through_the_owner(self):
+        socket_path = os.path.join(self.directory, "inventory.sock")
+        server = InventoryServer(InventoryEngine(self.journal_dir),
+                                 socket_path, checkpoint_interval=60)
+        loop = asyncio.new_event_loop()
+        started = threading.Event()
+        threading.Thread(
+            target=loop.run_until_complete, args=(server.serve(started),),
+            daemon=True
+        ).start()
+        assert started.wait(5)
+        self.addCleanup(server.engine.journal.close)
+
+        client = InventoryClient(socket_path)
+        response, errors = client.buy_product(
+            product_id=self.product, amount_products=2, buyer=self.buyer
+        )
+        assert errors == {}
+        assert response == {"change": 40, "product_name": "Product 0",
+                            "total_cost": 10}
+        assert self.buyer.deposit == 40
+
+        response, errors = client.deposit_amount(amount=3, buyer=self.buyer)
+        assert errors == {
+            "amount": ["Deposit amount can only be a multiple of 5."]
+        }
+        assert client.reset_deposit(buyer=self.buyer) == {"deposit": 0}
+
+        _, errors = client.buy_product(
+            product_id=self.product, amount_products=1, buyer=self.buyer
+        )
+        assert errors["details"][0].startswith("Insufficient funds")
+
+        token = idempotency_key.set(f"{self.buyer.pk}:key")
+        try:
+            for _ in range(2):
+                client.deposit_amount(amount=5, buyer=self.buyer)
+        finally:
+            idempotency_key.reset(token)
+        assert self.buyer.deposit == 5
+
+        replayed = self.start_engine()
+        assert replayed.stock[self.product.pk] == 8
+        assert replayed.deposits[self.buyer.pk] == 5
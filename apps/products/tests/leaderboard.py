@@ -0,0 +1,122 @@
+from django.db import connection
+from django.test import SimpleTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from rest_framework import status
+from rest_framework.reverse import reverse
+from rest_framework.test import APITestCase
+
+from apps.accounts.choices import UserRole
+from apps.accounts.models import User
+from apps.products.leaderboard import LeaderboardEntry, TopK, get_leaderboard
+from apps.products.models import Product
+
+
+def entry(pk, sold, seller=1):
+    return LeaderboardEntry(pk, f"Product {pk}", seller, sold)
+
+
+class TopKTestCase(SimpleTestCase):
+
+    def test_sales_keep_the_board_exact(self):
+        board = TopK(3, [entry(1, 5), entry(2, 9), entry(3, 1), entry(4, 7)])
+        assert [e.id for e in board.entries] == [2, 4, 1]
+
+        board.record(entry(3, 5))  # ties rank by id
+        assert [e.id for e in board.entries] == [2, 4, 1]
+        board.record(entry(3, 6))
+        assert [e.id for e in board.entries] == [2, 4, 3]
+        board.record(entry(3, 10))
+        assert [(e.id, e.units_sold) for e in board.entries] == \
+            [(3, 10), (2, 9), (4, 7)]
+
+    def test_discard(self):
+        board = TopK(2, [entry(1, 5), entry(2, 9)])
+        assert not board.discard({3})
+        assert board.discard({2})
+        assert board.entries == [entry(1, 5)]
+
+
+@override_settings(LEADERBOARD={"size": 3, "refresh": 60, "max_sellers": 1})
+class LeaderboardTestCase(APITestCase):
+
+    def setUp(self):
+        get_leaderboard().clear()
+        self.addCleanup(get_leaderboard().clear)
+        self.sellers = [
+            User.objects.create_user(username=f"seller{i}",
+                                     password="1234test",
+                                     role=UserRole.SELLER)
+            for i in range(2)
+        ]
+        self.products = [
+            Product.objects.create(name=f"Product {i}", cost=5,
+                                   amount_available=100,
+                                   seller=self.sellers[i % 2])
+            for i in range(5)
+        ]
+        self.buyer = User.objects.create_user(
+            username="johndoe", password="1234test", role=UserRole.BUYER,
+            deposit=1000
+        )
+        self.client.force_login(self.buyer)
+        self.url = reverse("products-leaderboard")
+
+    def buy(self, product, amount):
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(reverse("buy-list"), data={
+                "product_id": product.pk, "amount_products": amount
+            })
+        assert response.status_code == status.HTTP_200_OK
+
+    def ranking(self, **params):
+        response = self.client.get(self.url, params)
+        assert response.status_code == status.HTTP_200_OK
+        return [(row["name"], row["units_sold"]) for row in response.data]
+
+    def test_sales_update_the_board_without_reloading_it(self):
+        self.buy(self.products[3], 2)
+        assert self.ranking() == [("Product 3", 2), ("Product 0", 0),
+                                  ("Product 1", 0)]
+
+        self.buy(self.products[4], 3)
+        self.buy(self.products[3], 2)
+        with CaptureQueriesContext(connection) as queries:
+            ranking = self.ranking(limit=2)
+        assert ranking == [("Product 3", 4), ("Product 4", 3)]
+        assert not [query for query in queries.captured_queries
+                    if 'FROM "products_product"' in query["sql"]]
+
+        self.products[3].refresh_from_db()
+        assert self.products[3].units_sold == 4
+
+    def test_per_seller_boards(self):
+        self.buy(self.products[2], 1)
+        self.buy(self.products[1], 1)
+        assert self.ranking(seller=self.sellers[0].pk) == [
+            ("Product 2", 1), ("Product 0", 0), ("Product 4", 0)
+        ]
+        assert self.ranking(seller=self.sellers[1].pk) == [
+            ("Product 1", 1), ("Product 3", 0)
+        ]
+
+    def test_deleted_products_leave_the_board(self):
+        self.buy(self.products[1], 5)
+        assert self.ranking()[0] == ("Product 1", 5)
+
+        self.client.force_login(self.sellers[1])
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.delete(
+                reverse("products-detail", args=[self.products[1].pk])
+            )
+        assert response.status_code == status.HTTP_204_NO_CONTENT
+        assert self.ranking() == [("Product 0", 0), ("Product 2", 0),
+                                  ("Product 3", 0)]
+
+    def test_invalid_params(self):
+        response = self.client.get(self.url, {"limit": 0})
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+        response = self.client.get(self.url, {"limit": 4})
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+        assert response.data == {"limit": [
+            "Ensure this value is less than or equal to 3."
+        ]}
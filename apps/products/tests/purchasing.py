@@ -0,0 +1,138 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from unittest import mock
+
+from django.db import connection
+from django.test import TestCase, TransactionTestCase
+from django.test.utils import CaptureQueriesContext
+
+from apps.accounts.choices import UserRole
+from apps.accounts.models import User
+from apps.products.models import Product
+from apps.products.purchasing import (
+    PurchaseEngine,
+    PurchaseEngineBusy,
+    PurchaseRequest
+)
+
+
+def create_buyers(count, deposit):
+    return [
+        User.objects.create_user(username=f"buyer{i}", password="1234test",
+                                 role=UserRole.BUYER, deposit=deposit)
+        for i in range(count)
+    ]
+
+
+class PurchaseBatchTestCase(TestCase):
+
+    def setUp(self):
+        seller = User.objects.create_user(
+            username="mrsmith", password="1234test", role=UserRole.SELLER
+        )
+        self.product = Product.objects.create(
+            name="Product 0", cost=10, amount_available=5, seller=seller
+        )
+        self.buyers = create_buyers(3, deposit=30)
+        self.engine = PurchaseEngine(window=0, max_batch=10)
+
+    def test_batch_is_applied_in_arrival_order_in_one_write_each(self):
+        batch = [
+            PurchaseRequest(self.product.pk, 2, self.buyers[0].pk, None),
+            PurchaseRequest(self.product.pk, 2, self.buyers[1].pk, None),
+            PurchaseRequest(self.product.pk, 2, self.buyers[2].pk, None),
+            PurchaseRequest(self.product.pk, 1, self.buyers[0].pk, None),
+            PurchaseRequest(self.product.pk, 1, self.buyers[0].pk, None),
+        ]
+        with CaptureQueriesContext(connection) as queries:
+            results = self.engine.commit(batch)
+        updates = [query["sql"] for query in queries.captured_queries
+                   if query["sql"].startswith("UPDATE")]
+        assert len(updates) == 2
+
+        assert results == [
+            ({"change": 10, "product_name": "Product 0", "total_cost": 20},
+             {}, 10),
+            ({"change": 10, "product_name": "Product 0", "total_cost": 20},
+             {}, 10),
+            (None, {"details": ["Product insufficient stock. You can only "
+                                "buy a total of 1."]}, 30),
+            ({"change": 0, "product_name": "Product 0", "total_cost": 10},
+             {}, 0),
+            (None, {"details": ["Insufficient funds. Please make sure to "
+                                "have at least 10 in your deposit.",
+                                "Product insufficient stock. You can only "
+                                "buy a total of 0."]}, 0),
+        ]
+        self.product.refresh_from_db()
+        assert (self.product.amount_available, self.product.version) == (0, 2)
+        deposits = [b.deposit for b in User.objects.filter(
+            pk__in=[b.pk for b in self.buyers]).order_by("pk")]
+        assert deposits == [0, 10, 30]
+
+    def test_missing_product(self):
+        results = self.engine.commit([
+            PurchaseRequest(self.product.pk + 1, 1, self.buyers[0].pk, None)
+        ])
+        assert results == [(None, {"details": ["Product does not exist."]},
+                             30)]
+
+
+class PurchaseEngineTestCase(TransactionTestCase):
+
+    def test_concurrent_buyers_get_their_own_results(self):
+        seller = User.objects.create_user(
+            username="mrsmith", password="1234test", role=UserRole.SELLER
+        )
+        product = Product.objects.create(
+            name="Product 0", cost=5, amount_available=6, seller=seller
+        )
+        buyers = create_buyers(8, deposit=5)
+        engine = PurchaseEngine(window=0.05, max_batch=100)
+
+        with ThreadPoolExecutor(max_workers=8) as pool:
+            results = list(pool.map(
+                lambda buyer: engine.buy(product_id=product,
+                                         amount_products=1, buyer=buyer),
+                buyers
+            ))
+
+        bought = [response for response, errors in results if not errors]
+        assert len(bought) == 6
+        assert sum(buyer.deposit for buyer in buyers) == 10
+        product.refresh_from_db()
+        assert product.amount_available == 0
+
+    def test_purchases_queued_past_the_timeout_are_dropped(self):
+        seller = User.objects.create_user(
+            username="mrsmith", password="1234test", role=UserRole.SELLER
+        )
+        product = Product.objects.create(
+            name="Product 0", cost=5, amount_available=6, seller=seller
+        )
+        buyers = create_buyers(2, deposit=5)
+        engine = PurchaseEngine(window=0, max_batch=1, timeout=0.1)
+        committing, release = threading.Event(), threading.Event()
+        commit = engine.commit
+
+        def slow_commit(batch):
+            committing.set()
+            release.wait(5)
+            return commit(batch)
+
+        with mock.patch.object(engine, "commit", slow_commit), \
+                ThreadPoolExecutor(max_workers=1) as pool:
+            first = pool.submit(engine.buy, product_id=product,
+                                amount_products=1, buyer=buyers[0])
+            assert committing.wait(5)
+            with self.assertRaises(PurchaseEngineBusy):
+                engine.buy(product_id=product, amount_products=1,
+                           buyer=buyers[1])
+            release.set()
+            # Already committing when it timed out, so it completes.
+            assert first.result(timeout=5)[1] == {}
+
+        product.refresh_from_db()
+        assert product.amount_available == 5
+        buyers[1].refresh_from_db()
+        assert buyers[1].deposit == 5
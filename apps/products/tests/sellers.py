@@ -0,0 +1,119 @@
+from io import StringIO
+
+from django.core.management import call_command
+from django.db import connection
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
+from rest_framework import status
+from rest_framework.reverse import reverse
+from rest_framework.test import APITestCase
+
+from apps.accounts.choices import UserRole
+from apps.accounts.models import User
+from apps.core.jobs import get_executor
+from apps.products.models import Product, ProductChange, SellerDeletion
+from apps.products.services import buy_product, delete_seller
+
+
+@override_settings(SELLER_DELETION={"batch_size": 2})
+class SellerDeletionTestCase(APITestCase):
+
+    def setUp(self):
+        self.seller = User.objects.create_user(
+            username="mrsmith", password="1234test", role=UserRole.SELLER
+        )
+        self.other = User.objects.create_user(
+            username="mrsjones", password="1234test", role=UserRole.SELLER
+        )
+        self.buyer = User.objects.create_user(
+            username="johndoe", password="1234test", role=UserRole.BUYER,
+            deposit=100
+        )
+        self.products = [
+            Product.objects.create(name=f"Product {i}", cost=5,
+                                   amount_available=5, seller=self.seller)
+            for i in range(5)
+        ]
+        self.kept = Product.objects.create(name="Kept", cost=5,
+                                           amount_available=5,
+                                           seller=self.other)
+        self.executor = get_executor()
+        self.executor.queue.clear()
+        self.addCleanup(self.executor.queue.clear)
+        self.client.force_login(self.buyer)
+
+    def test_products_are_hidden_as_soon_as_the_seller_is_deactivated(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            delete_seller(seller=self.seller)
+
+        response = self.client.get(reverse("products-list"))
+        assert [p["id"] for p in response.data["results"]] == [self.kept.pk]
+        response = self.client.get(
+            reverse("products-detail", args=[self.products[0].pk])
+        )
+        assert response.status_code == status.HTTP_404_NOT_FOUND
+        response = self.client.post(reverse("buy-list"), data={
+            "product_id": self.products[0].pk, "amount_products": 1
+        })
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+        # Nothing is deleted until the jobs run.
+        assert Product.objects.filter(seller=self.seller).count() == 5
+
+    def test_deactivation_does_not_touch_each_product(self):
+        with CaptureQueriesContext(connection) as queries:
+            delete_seller(seller=self.seller)
+        assert not any("products_product" in query["sql"]
+                       and "COUNT(" not in query["sql"]
+                       for query in queries.captured_queries)
+
+    def test_stale_entries_of_hidden_products_cannot_be_bought(self):
+        delete_seller(seller=self.seller)
+
+        # As still held by the snapshot or a product cache
+        response, errors = buy_product(product_id=self.products[0],
+                                       amount_products=1, buyer=self.buyer)
+        assert response is None
+        assert errors == {"details": ["Product does not exist."]}
+        self.products[0].refresh_from_db()
+        assert self.products[0].amount_available == 5
+
+    def test_products_are_deleted_in_batches_then_the_seller(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            deletion = delete_seller(seller=self.seller)
+
+        batches = 0
+        while True:
+            with self.captureOnCommitCallbacks(execute=True):
+                ran = self.executor.run_pending()
+            if not ran:
+                break
+            batches += ran
+            deletion.refresh_from_db()
+            if deletion.finished_at is None:
+                assert deletion.deleted == min(2 * batches, 5)
+
+        # Three batches of products, then the seller.
+        assert batches == 4
+        deletion.refresh_from_db()
+        assert (deletion.deleted, deletion.total) == (5, 5)
+        assert deletion.finished_at is not None
+        assert not User.objects.filter(pk=self.seller.pk).exists()
+        assert list(Product.objects.all()) == [self.kept]
+        tombstones = ProductChange.objects.filter(deleted=True)
+        assert sorted(tombstones.values_list("product_id", flat=True)) == \
+            [p.pk for p in self.products]
+
+    def test_command_deletes_in_the_foreground_with_progress(self):
+        out = StringIO()
+        call_command("delete_seller", "mrsmith", stdout=out)
+
+        assert out.getvalue().splitlines() == [
+            "Deactivated mrsmith, deleting 5 products.",
+            "Deleted 2/5 products.",
+            "Deleted 4/5 products.",
+            "Deleted 5/5 products.",
+            "Deleted mrsmith.",
+        ]
+        assert not User.objects.filter(pk=self.seller.pk).exists()
+        assert SellerDeletion.objects.get().finished_at is not None
+        assert self.executor.run_pending() == 0
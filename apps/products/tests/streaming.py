@@ -0,0 +1,141 @@
+import asyncio
+import json
+
+from asgiref.sync import async_to_sync, sync_to_async
+from rest_framework.test import APITestCase
+
+from apps.accounts.choices import UserRole
+from apps.accounts.models import User
+from apps.accounts.services import generate_jwt_token
+from apps.products.events import broker
+from apps.products.models import Product
+from apps.products.services import buy_product
+from apps.products.streaming import ProductStreamApplication
+
+
+async def not_found(scope, receive, send):  # pragma: no cover
+    raise AssertionError("Stream requests must not reach Django")
+
+
+def is_product_message(message):
+    content = message.get("body") or message.get("text", "").encode()
+    return b"product" in content
+
+
+class ProductStreamTestCase(APITestCase):
+
+    def setUp(self):
+        self.buyer = User.objects.create_user(
+            username="johndoe", password="1234test", role=UserRole.BUYER
+        )
+        self.buyer.deposit = 100
+        self.buyer.save()
+        self.seller = User.objects.create_user(
+            username="mrsmith", password="1234test", role=UserRole.SELLER
+        )
+        self.product = Product.objects.create(
+            name="Product 0", cost=10, amount_available=5, seller=self.seller
+        )
+        self.token, _ = generate_jwt_token(self.buyer)
+        self.application = ProductStreamApplication(not_found)
+
+    def stream(self, scope_type, prepare=lambda: [], query_string=b"",
+               headers=()):
+        """
+        Connects to the stream and, once it is open, runs the callbacks
+        returned by ``prepare`` back to back on the event loop. Returns
+        everything sent until the first product event.
+        """
+        scope = {
+            "type": scope_type,
+            "path": "/api/v1/products/stream",
+            "method": "GET",
+            "headers": list(headers),
+            "query_string": query_string,
+        }
+
+        async def run():
+            incoming, sent = asyncio.Queue(), []
+            opened, product_sent = asyncio.Event(), asyncio.Event()
+
+            async def send(message):
+                sent.append(message)
+                if message.get("more_body") or message["type"] == (
+                        "websocket.accept"):
+                    opened.set()
+                if is_product_message(message):
+                    product_sent.set()
+
+            if scope_type == "websocket":
+                await incoming.put({"type": "websocket.connect"})
+            task = asyncio.ensure_future(
+                self.application(scope, incoming.get, send)
+            )
+            opened_wait = asyncio.ensure_future(opened.wait())
+            await asyncio.wait({task, opened_wait},
+                               return_when=asyncio.FIRST_COMPLETED)
+            if task.done():
+                opened_wait.cancel()
+                return sent
+
+            for callback in await sync_to_async(prepare)():
+                callback()
+            await product_sent.wait()
+
+            await incoming.put({"type": f"{scope_type}.disconnect"})
+            await task
+            return sent
+
+        return async_to_sync(asyncio.wait_for)(run(), timeout=5)
+
+    def test_unauthenticated(self):
+        sent = self.stream("http")
+        assert sent[0]["status"] == 401
+
+        sent = self.stream("websocket")
+        assert sent == [{"type": "websocket.close", "code": 4401}]
+
+        sent = self.stream(
+            "http", headers=[(b"authorization", b"Bearer a b")]
+        )
+        assert sent[0]["status"] == 401
+
+    def test_server_sent_events(self):
+        def prepare():
+            with self.captureOnCommitCallbacks() as callbacks:
+                buy_product(product_id=self.product, amount_products=1,
+                            buyer=self.buyer)
+                buy_product(product_id=self.product, amount_products=2,
+                            buyer=self.buyer)
+            return callbacks
+
+        sent = self.stream(
+            "http", prepare, query_string=f"token={self.token}".encode()
+        )
+        assert sent[0]["status"] == 200
+        assert (b"content-type", b"text/event-stream") in sent[0]["headers"]
+
+        events = b"".join(m.get("body", b"") for m in sent[1:])
+        product_events = [
+            json.loads(line[len(b"data: "):])
+            for line in events.split(b"\n") if line.startswith(b"data: ")
+        ]
+        # Both purchases are published together and coalesced into one event
+        assert product_events == [{
+            "id": self.product.id, "name": "Product 0", "cost": 10,
+            "amount_available": 2
+        }]
+
+    def test_websocket(self):
+        def prepare():
+            return [lambda: broker.publish({"id": self.product.id,
+                                            "cost": 15})]
+
+        sent = self.stream(
+            "websocket", prepare,
+            headers=[(b"authorization", f"Bearer {self.token}".encode())]
+        )
+        assert sent[0] == {"type": "websocket.accept"}
+        assert json.loads(sent[1]["text"]) == {
+            "type": "product", "data": {"id": self.product.id, "cost": 15}
+        }
@@ -0,0 +1,100 @@
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from rest_framework import status
+from rest_framework.reverse import reverse
+from rest_framework.test import APITestCase
+
+from apps.accounts.choices import UserRole
+from apps.accounts.models import User
+from apps.products.models import Product
+from apps.products.services import buy_product
+
+
+class ProductVersioningTestCase(APITestCase):
+
+    def setUp(self):
+        self.seller = User.objects.create_user(
+            username="mrsmith", password="1234test", role=UserRole.SELLER
+        )
+        self.product = Product.objects.create(
+            name="Product 0", cost=10, amount_available=5, seller=self.seller
+        )
+        self.url = reverse("products-detail", args=[self.product.pk])
+        self.client.force_login(self.seller)
+
+    def test_retrieve_returns_etag(self):
+        response = self.client.get(self.url)
+        assert response.status_code == status.HTTP_200_OK
+        assert response["ETag"] == '"1"'
+
+    def test_update_with_matching_version(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.put(self.url, data={"cost": 20},
+                                       HTTP_IF_MATCH='"1"')
+        assert response.status_code == status.HTTP_200_OK
+        assert response["ETag"] == '"2"'
+        updates = [query["sql"] for query in queries.captured_queries
+                   if query["sql"].startswith("UPDATE")]
+        assert len(updates) == 1
+        assert '"version" = 1' in updates[0]
+        assert '"name"' not in updates[0]
+
+        self.product.refresh_from_db()
+        assert (self.product.cost, self.product.version) == (20, 2)
+
+    def test_purchase_reads_the_row_back_from_its_update(self):
+        buyer = User.objects.create_user(
+            username="johndoe", password="1234test", role=UserRole.BUYER,
+            deposit=100
+        )
+        Product.objects.filter(pk=self.product.pk).update(name="Renamed")
+
+        with CaptureQueriesContext(connection) as queries:
+            response, errors = buy_product(product_id=self.product,
+                                           amount_products=2, buyer=buyer)
+        assert errors == {}
+        assert response == {"change": 80, "product_name": "Renamed",
+                            "total_cost": 20}
+        assert not any(query["sql"].startswith("SELECT")
+                       and "products_product" in query["sql"]
+                       for query in queries.captured_queries)
+
+        self.product.refresh_from_db()
+        assert (self.product.amount_available, self.product.units_sold,
+                self.product.version) == (3, 2, 2)
+
+    def test_stale_update_is_rejected(self):
+        Product.objects.filter(pk=self.product.pk).update(amount_available=1,
+                                                          version=2)
+
+        response = self.client.put(self.url, data={"amount_available": 9},
+                                   HTTP_IF_MATCH='"1"')
+        assert response.status_code == status.HTTP_412_PRECONDITION_FAILED
+        assert "version" in response.data
+
+        self.product.refresh_from_db()
+        assert self.product.amount_available == 1
+
+    def test_malformed_if_match_is_rejected(self):
+        for value in ('W/"1"', "1", '"1", "2"', '"abc"'):
+            response = self.client.put(self.url, data={"cost": 20},
+                                       HTTP_IF_MATCH=value)
+            assert response.status_code == \
+                status.HTTP_412_PRECONDITION_FAILED, value
+
+    def test_update_without_if_match_touches_changed_fields_only(self):
+        Product.objects.filter(pk=self.product.pk).update(amount_available=1)
+
+        response = self.client.put(self.url, data={"cost": 20})
+        assert response.status_code == status.HTTP_200_OK
+        assert response["ETag"] == '"2"'
+
+        self.product.refresh_from_db()
+        assert (self.product.cost, self.product.amount_available) == (20, 1)
+
+    def test_wildcard_if_match(self):
+        response = self.client.put(self.url, data={"name": "Renamed"},
+                                   HTTP_IF_MATCH="*")
+        assert response.status_code == status.HTTP_200_OK
+        self.product.refresh_from_db()
+        assert self.product.name == "Renamed"
@@ -1,21 +1,99 @@
+from django.conf import settings
+from django.db import transaction
 from rest_framework.response import Response
 from rest_framework import serializers, status
+from rest_framework.decorators import action
 from rest_framework.settings import api_settings
 from rest_framework.viewsets import ModelViewSet, GenericViewSet
 
+from apps.products.catalog import SnapshotBusy, get_catalog, lookup_product
+from apps.products.changes import changes_since
+from apps.products.inventory import get_inventory_client
+from apps.products.leaderboard import get_leaderboard
 from apps.products.models import Product
+from apps.products.purchasing import get_purchase_engine
 from apps.accounts.permissions import (
     BuyerAllowedOnly,
     IsSellerProductOwner,
     SellerAllowedOnly
 )
+from apps.core.compiled import compile_serializer
+from apps.core.idempotency import idempotent
+from apps.core.sparse import SparseFieldsetMixin, parse_fieldset
+from apps.core.throttling import (
+    IPTokenBucketThrottle,
+    UserTokenBucketThrottle
+)
 from apps.products.services import (
     buy_product,
     create_product,
+    delete_products,
     update_product
 )
 
 
+class CatalogProductField(serializers.PrimaryKeyRelatedField):
+    """
+    Resolves the product from the catalog snapshot when there is one, and
+    from the database otherwise.
+    """
+
+    def __init__(self, **kwargs):
+        super().__init__(queryset=Product.objects.all(), **kwargs)
+
+    def to_internal_value(self, data):
+        if isinstance(data, bool):
+            self.fail("incorrect_type", data_type=type(data).__name__)
+        try:
+            pk = int(data)
+        except (TypeError, ValueError):
+            self.fail("incorrect_type", data_type=type(data).__name__)
+        product = lookup_product(pk)
+        if product is None:
+            self.fail("does_not_exist", pk_value=data)
+        return product
+
+
+def product_etag(product) -> str:
+    return f'"{product.version}"'
+
+
+def parse_if_match(value: str):
+    """
+    Returns the version named by an ``If-Match`` header, ``None`` for ``*``,
+    or raises ``ValueError`` for anything that is not one strong ETag.
+    """
+    value = value.strip()
+    if value == "*":
+        return None
+    if len(value) < 3 or value[0] != '"' or value[-1] != '"':
+        raise ValueError(value)
+    version = value[1:-1]
+    if not version.isdigit():
+        raise ValueError(value)
+    return int(version)
+
+
+class SellerOutputSerializer(serializers.Serializer):
+    id = serializers.IntegerField(read_only=True)
+    username = serializers.CharField(read_only=True)
+
+
+class ChangedProductSerializer(serializers.Serializer):
+    id = serializers.IntegerField(read_only=True)
+    name = serializers.CharField(read_only=True)
+    seller_id = serializers.IntegerField(read_only=True)
+    amount_available = serializers.IntegerField(read_only=True)
+    cost = serializers.IntegerField(read_only=True)
+
+
+class ProductChangeSerializer(serializers.Serializer):
+    seq = serializers.IntegerField(read_only=True)
+    id = serializers.IntegerField(read_only=True)
+    deleted = serializers.BooleanField(read_only=True)
+    product = ChangedProductSerializer(read_only=True, allow_null=True)
+
+
 class ProductViewSet(ModelViewSet):
 
     class CreateInputSerializer(serializers.Serializer):
@@ -31,19 +109,53 @@ class ProductViewSet(ModelViewSet):
         amount_available = serializers.IntegerField(read_only=True)
         cost = serializers.IntegerField(read_only=True)
 
-    class RetrieveOutputSerializer(serializers.Serializer):
+    class RetrieveOutputSerializer(SparseFieldsetMixin,
+                                   serializers.Serializer):
+        expandable_fields = ("seller",)
+
         id = serializers.IntegerField(read_only=True)
         name = serializers.CharField(read_only=True)
         seller_id = serializers.IntegerField(read_only=True)
         amount_available = serializers.IntegerField(read_only=True)
         cost = serializers.IntegerField(read_only=True)
+        seller = SellerOutputSerializer(read_only=True)
+
+    class ListOutputSerializer(SparseFieldsetMixin, serializers.Serializer):
+        expandable_fields = ("seller",)
 
-    class ListOutputSerializer(serializers.Serializer):
         id = serializers.IntegerField(read_only=True)
         name = serializers.CharField(read_only=True)
         seller_id = serializers.IntegerField(read_only=True)
         amount_available = serializers.IntegerField(read_only=True)
         cost = serializers.IntegerField(read_only=True)
+        seller = SellerOutputSerializer(read_only=True)
+
+    class LeaderboardInputSerializer(serializers.Serializer):
+        seller = serializers.IntegerField(required=False)
+
+        def get_fields(self):
+            # Bounded by the board's size, a setting read per request.
+            fields = super().get_fields()
+            fields["limit"] = serializers.IntegerField(
+                min_value=1, max_value=settings.LEADERBOARD["size"],
+                required=False
+            )
+            return fields
+
+    class LeaderboardOutputSerializer(serializers.Serializer):
+        id = serializers.IntegerField(read_only=True)
+        name = serializers.CharField(read_only=True)
+        seller_id = serializers.IntegerField(read_only=True)
+        units_sold = serializers.IntegerField(read_only=True)
+
+    class ChangesInputSerializer(serializers.Serializer):
+        since = serializers.IntegerField(min_value=0)
+        client = serializers.CharField(max_length=64, default="default")
+
+    class ChangesOutputSerializer(serializers.Serializer):
+        seq = serializers.IntegerField(read_only=True)
+        more = serializers.BooleanField(read_only=True)
+        changes = ProductChangeSerializer(read_only=True, many=True)
 
     class UpdateInputSerializer(serializers.Serializer):
         name = serializers.CharField(max_length=250, required=False)
@@ -69,6 +181,10 @@ class ProductViewSet(ModelViewSet):
             self.serializer_class = self.ListOutputSerializer
         elif self.action == "update":
             self.serializer_class = self.UpdateInputSerializer
+        elif self.action == "leaderboard":
+            self.serializer_class = self.LeaderboardOutputSerializer
+        elif self.action == "changes":
+            self.serializer_class = self.ChangesOutputSerializer
         else:  # pragma: no cover
             self.serializer_class = self.ListOutputSerializer
 
@@ -82,7 +198,51 @@ class ProductViewSet(ModelViewSet):
 
         return super(ProductViewSet, self).get_permissions()
 
-    queryset = Product.objects.all().order_by("id")
+    queryset = Product.objects.listed().order_by("id")
+
+    # Output field -> model field to load for it
+    sparse_fields = {
+        "id": "id",
+        "name": "name",
+        "seller_id": "seller",
+        "amount_available": "amount_available",
+        "cost": "cost",
+    }
+
+    @property
+    def fieldset(self):
+        if not hasattr(self, "_fieldset"):
+            self._fieldset = parse_fieldset(
+                self.request, fields=self.sparse_fields, expandable=["seller"]
+            )
+        return self._fieldset
+
+    def get_serializer_context(self):
+        context = super().get_serializer_context()
+        if self.action in ["list", "retrieve"]:
+            context["fields"], context["expand"] = self.fieldset
+        return context
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        if self.action not in ["list", "retrieve"]:
+            return queryset
+        fields, expand = self.fieldset
+        if fields is None and not expand:
+            return queryset
+        columns = {
+            self.sparse_fields[field]
+            for field in (self.sparse_fields if fields is None else fields)
+        }
+        columns |= {"id", "version"} if self.action == "retrieve" else {"id"}
+        if "seller" in expand:
+            queryset = queryset.select_related("seller")
+            columns |= {"seller", "seller__id", "seller__username"}
+        return queryset.only(*columns)
+
+    def get_catalog(self):
+        # The snapshot has no seller columns to expand.
+        return None if self.fieldset[1] else get_catalog()
 
     def create(self, request, *args, **kwargs):
         serializer = self.get_serializer(data=request.data)
@@ -108,34 +268,122 @@ class ProductViewSet(ModelViewSet):
         except (TypeError, KeyError):
             return {}
 
+    def list(self, request, *args, **kwargs):
+        snapshot = self.get_catalog()
+        try:
+            page = None if snapshot is None else \
+                self.paginate_queryset(snapshot)
+        except SnapshotBusy:
+            page = None
+        if page is None:
+            return super().list(request, *args, **kwargs)
+        serializer = self.get_serializer(page, many=True)
+        return self.get_paginated_response(serializer.data)
+
+    def retrieve(self, request, *args, **kwargs):
+        snapshot, pk = self.get_catalog(), self.kwargs[self.lookup_field]
+        instance = None
+        if snapshot is not None and pk.isdigit():
+            try:
+                instance = snapshot.get(int(pk))
+            except SnapshotBusy:
+                pass
+        if instance is None:
+            instance = self.get_object()
+        else:
+            self.check_object_permissions(request, instance)
+        serializer = self.get_serializer(instance)
+        return Response(
+            data=serializer.data,
+            headers={"ETag": product_etag(instance)}
+        )
+
+    @action(["GET"], detail=False)
+    def leaderboard(self, request, *args, **kwargs):
+        """
+        Best selling products, overall or for ``?seller=<id>``; at most
+        ``?limit=`` of them, up to and by default ``LEADERBOARD["size"]``.
+        """
+        serializer = self.LeaderboardInputSerializer(data=request.query_params)
+        serializer.is_valid(raise_exception=True)
+        entries = get_leaderboard().top(
+            seller_id=serializer.validated_data.get("seller"),
+            limit=serializer.validated_data.get("limit"),
+        )
+        return Response(data=self.get_serializer(entries, many=True).data)
+
+    @action(["GET"], detail=False)
+    def changes(self, request, *args, **kwargs):
+        """
+        Product changes after ``?since=<seq>``, for clients that keep a
+        local copy of the catalog: start from 0 (or from the ``seq`` of a
+        410 response after a full download) and continue with the returned
+        ``seq`` while ``more`` is set. Deleted products come back with
+        ``deleted`` set and no ``product``.
+        """
+        serializer = self.ChangesInputSerializer(data=request.query_params)
+        serializer.is_valid(raise_exception=True)
+        feed, errors = changes_since(**serializer.validated_data,
+                                     user=request.user)
+        if errors:
+            return Response(data=errors, status=status.HTTP_410_GONE)
+        return Response(data=self.get_serializer(feed).data)
+
+    def perform_destroy(self, instance):
+        delete_products(queryset=Product.objects.filter(pk=instance.pk))
+
     def update(self, request, *args, **kwargs):
         partial = kwargs.pop('partial', False)
         instance = self.get_object()
         serializer = self.get_serializer(instance, data=request.data,
                                          partial=partial)
         serializer.is_valid(raise_exception=True)
+
+        if_match = request.headers.get("If-Match")
+        try:
+            expected_version = (
+                parse_if_match(if_match) if if_match is not None else None
+            )
+        except ValueError:
+            return Response(
+                data={"version": ["If-Match must be a single strong ETag."]},
+                status=status.HTTP_412_PRECONDITION_FAILED
+            )
+
         product, errors = update_product(
-            **serializer.validated_data, instance=instance
+            **serializer.validated_data,
+            instance=instance,
+            expected_version=expected_version
         )
 
+        if "version" in errors:
+            return Response(
+                data=errors, status=status.HTTP_412_PRECONDITION_FAILED
+            )
         if errors:
             return Response(data=errors, status=status.HTTP_400_BAD_REQUEST)
 
+        inventory = get_inventory_client()
+        if inventory is not None and "amount_available" in \
+                serializer.validated_data:
+            inventory.set_stock(product=product)
+
         response_serializer = self.CreateOutputSerializer(instance=product)
         return Response(
             data=response_serializer.data,
-            status=status.HTTP_200_OK
+            status=status.HTTP_200_OK,
+            headers={"ETag": product_etag(product)}
         )
 
 
 class BuyProductViewSet(GenericViewSet):
 
     class InputSerializer(serializers.Serializer):
-        product_id = serializers.PrimaryKeyRelatedField(
-            queryset=Product.objects.all()
-        )
+        product_id = CatalogProductField()
         amount_products = serializers.IntegerField(min_value=1, max_value=1000)
 
+    validate_input = staticmethod(compile_serializer(InputSerializer))
+
     class OutputSerializer(serializers.Serializer):
         change = serializers.IntegerField()
         product_name = serializers.CharField()
@@ -143,15 +391,26 @@ class BuyProductViewSet(GenericViewSet):
 
     permission_classes = [BuyerAllowedOnly]
     serializer_class = InputSerializer
+    throttle_classes = [UserTokenBucketThrottle, IPTokenBucketThrottle]
+    throttle_scope = "buy"
 
+    @idempotent
     def create(self, request, *args, **kwargs):
         buyer = request.user
 
-        serializer = self.InputSerializer(data=request.data)
-        serializer.is_valid(raise_exception=True)
-        product, errors = buy_product(
-            **serializer.validated_data, buyer=buyer
-        )
+        validated_data = self.validate_input(request.data)
+        # The engine commits on its own connection, so purchases that have
+        # to share the caller's transaction (idempotent ones) run inline.
+        engine = get_purchase_engine()
+        in_transaction = transaction.get_connection().in_atomic_block
+        inventory = get_inventory_client()
+        if inventory is not None:
+            buy = inventory.buy_product
+        elif engine is not None and not in_transaction:
+            buy = engine.buy
+        else:
+            buy = buy_product
+        product, errors = buy(**validated_data, buyer=buyer)
 
         if errors:
             return Response(data=errors, status=status.HTTP_400_BAD_REQUEST)
@@ -0,0 +1,60 @@
+"""
+Compares per-request latency of the full middleware stack with the lean
+API-only pipeline for the same bearer token request.
+
+    python -m benchmarks.lean_api [iterations]
+"""
+import sys
+from wsgiref.util import setup_testing_defaults
+
+from benchmarks.utils import report, setup_django
+
+
+def main(iterations=2000):
+    setup_django(migrate=True)
+
+    from django.core.handlers.wsgi import WSGIHandler
+
+    from apps.accounts.choices import UserRole
+    from apps.accounts.models import User
+    from apps.accounts.services import generate_jwt_token
+    from apps.core.lean import LeanWSGIDispatcher
+    from apps.products.models import Product
+
+    seller = User.objects.create_user(
+        username="seller", password="1234test", role=UserRole.SELLER
+    )
+    Product.objects.bulk_create(
+        Product(name=f"Product {i}", cost=5, amount_available=10,
+                seller=seller)
+        for i in range(10)
+    )
+    token, _ = generate_jwt_token(seller)
+    application = LeanWSGIDispatcher(WSGIHandler())
+
+    def get(path):
+        environ = {
+            "PATH_INFO": path,
+            "REQUEST_METHOD": "GET",
+            "HTTP_AUTHORIZATION": f"Bearer {token}",
+        }
+        setup_testing_defaults(environ)
+        b"".join(application(environ, lambda *args: None))
+
+    # Interleaved rounds, best of each, so machine noise hits both sides
+    before = after = float("inf")
+    for _ in range(5):
+        before = min(before, report(
+            "full /api/v1/", lambda: get("/api/v1/products/"),
+            iterations // 5
+        ))
+        after = min(after, report(
+            "lean /api/lean/v1/", lambda: get("/api/lean/v1/products/"),
+            iterations // 5
+        ))
+    print(f"{'saved':>28}: {(before - after) * 1e6:9.1f} us/request "
+          f"({(1 - after / before) * 100:.1f}%)")
+
+
+if __name__ == "__main__":
+    main(*map(int, sys.argv[1:2]))
@@ -0,0 +1,86 @@
+"""
+Throughput and latency of concurrent purchases of one hot product: one
+transaction per purchase versus the group-commit engine at several batch
+windows.
+
+    python -m benchmarks.purchase_engine [threads] [purchases_per_thread]
+"""
+import statistics
+import sys
+import threading
+import time
+
+from benchmarks.utils import setup_django
+
+
+def run(label, buy, buyers, purchases):
+    from django.db import OperationalError, close_old_connections
+
+    latencies, failures = [], []
+    start = threading.Barrier(len(buyers) + 1)
+
+    def worker(buyer):
+        start.wait()
+        for _ in range(purchases):
+            began = time.perf_counter()
+            try:
+                buy(buyer)
+            except OperationalError:
+                failures.append(1)
+            latencies.append(time.perf_counter() - began)
+        close_old_connections()
+
+    threads = [threading.Thread(target=worker, args=(buyer,))
+               for buyer in buyers]
+    for thread in threads:
+        thread.start()
+    start.wait()
+    began = time.perf_counter()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - began
+
+    latencies.sort()
+    p99 = latencies[int(len(latencies) * 0.99) - 1]
+    print(f"{label:>28}: {len(latencies) / elapsed:8,.0f} buys/s  "
+          f"p50 {statistics.median(latencies) * 1e3:6.1f} ms  "
+          f"p99 {p99 * 1e3:6.1f} ms  failed {len(failures)}")
+
+
+def main(threads=32, purchases=50):
+    setup_django(migrate=True)
+
+    from django.db import transaction
+
+    from apps.accounts.choices import UserRole
+    from apps.accounts.models import User
+    from apps.products.models import Product
+    from apps.products.purchasing import PurchaseEngine
+    from apps.products.services import buy_product
+
+    seller = User.objects.create_user(
+        username="seller", password="1234test", role=UserRole.SELLER
+    )
+    product = Product.objects.create(
+        name="Hot product", cost=5, amount_available=10 ** 9, seller=seller
+    )
+    buyers = User.objects.bulk_create(
+        User(username=f"buyer{i}", role=UserRole.BUYER, deposit=10 ** 9)
+        for i in range(threads)
+    )
+
+    def per_request(buyer):
+        with transaction.atomic():
+            buy_product(product_id=product, amount_products=1, buyer=buyer)
+
+    run("one transaction per buy", per_request, buyers, purchases)
+    for window in (0, 0.001, 0.002, 0.005, 0.01):
+        engine = PurchaseEngine(window=window, max_batch=256)
+        run(f"group commit {window * 1e3:g} ms window",
+            lambda buyer: engine.buy(product_id=product, amount_products=1,
+                                     buyer=buyer),
+            buyers, purchases)
+
+
+if __name__ == "__main__":
+    main(*map(int, sys.argv[1:3]))
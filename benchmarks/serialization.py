@@ -0,0 +1,51 @@
+"""
+Compares DRF's JSON renderer/parser with the orjson and MessagePack ones
+on a /products page and a /buy response.
+
+    python -m benchmarks.serialization [iterations]
+"""
+import io
+import sys
+
+from benchmarks.utils import report, setup_django
+
+
+def main(iterations=20000):
+    setup_django()
+
+    from rest_framework.parsers import JSONParser
+    from rest_framework.renderers import JSONRenderer
+
+    from apps.core.parsers import FastJSONParser, MessagePackParser
+    from apps.core.renderers import FastJSONRenderer, MessagePackRenderer
+
+    payloads = {
+        "products page": {
+            "count": 1000,
+            "next": "http://localhost:8000/api/v1/products/?page=2",
+            "previous": None,
+            "results": [
+                {"id": i, "name": f"Product {i}", "seller_id": i % 7,
+                 "amount_available": 100 + i, "cost": 5 * (i % 20)}
+                for i in range(10)
+            ],
+        },
+        "buy": {"change": 35, "product_name": "Product 1", "total_cost": 15},
+    }
+    renderers = (JSONRenderer(), FastJSONRenderer(), MessagePackRenderer())
+    parsers = (JSONParser(), FastJSONParser(), MessagePackParser())
+
+    for name, data in payloads.items():
+        print(name)
+        for renderer, parser in zip(renderers, parsers):
+            body = renderer.render(data)
+            label = type(renderer).__name__
+            report(f"{label} render", lambda: renderer.render(data),
+                   iterations)
+            report(f"{type(parser).__name__} parse",
+                   lambda: parser.parse(io.BytesIO(body)), iterations)
+            print(f"{label + ' size':>28}: {len(body):9} bytes")
+
+
+if __name__ == "__main__":
+    main(*map(int, sys.argv[1:2]))
@@ -0,0 +1,148 @@
+"""
+Compares ``manage.py serve`` (with and without gc.freeze()) against the
+same number of separate server processes that each import Django. Reports
+cold start (launch until every server answers) and memory after some
+traffic: PSS of all processes per worker (shared pages are split between
+the processes sharing them), and the median worker's RSS and private
+memory. Linux only, since it reads /proc.
+
+    python -m benchmarks.serve [workers] [requests]
+"""
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import time
+import urllib.error
+import urllib.request
+
+from benchmarks.utils import setup_django
+
+
+# The status quo: every worker is its own interpreter importing Django
+SEPARATE = """
+import sys
+import config.wsgi
+from django.core.servers.basehttp import run
+run("127.0.0.1", int(sys.argv[1]), config.wsgi.application)
+"""
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def get(url, token=None):
+    request = urllib.request.Request(url)
+    if token:
+        request.add_header("Authorization", f"Bearer {token}")
+    try:
+        with urllib.request.urlopen(request, timeout=5) as response:
+            return response.status
+    except urllib.error.HTTPError as e:
+        return e.code
+
+
+def memory(pid) -> dict:
+    fields = {}
+    with open(f"/proc/{pid}/smaps_rollup") as f:
+        for line in f:
+            parts = line.split()
+            if len(parts) == 3 and parts[2] == "kB":
+                fields[parts[0].rstrip(":")] = int(parts[1]) / 1024
+    return {
+        "rss": fields["Rss"],
+        "pss": fields["Pss"],
+        "private": fields["Private_Clean"] + fields["Private_Dirty"],
+    }
+
+
+def children(pid) -> list:
+    with open(f"/proc/{pid}/task/{pid}/children") as f:
+        return [int(child) for child in f.read().split()]
+
+
+def wait_until_up(url, token):
+    while True:
+        try:
+            if get(url, token) == 200:
+                return
+        except OSError:
+            time.sleep(0.005)
+
+
+def measure(commands, workers, requests, token):
+    """
+    Starts ``commands`` (argv, port) and returns the cold start and the
+    memory figures once ``requests`` requests were spread over them.
+    """
+    started = time.perf_counter()
+    processes = [subprocess.Popen(argv, stdout=subprocess.DEVNULL,
+                                  stderr=subprocess.DEVNULL)
+                 for argv, _ in commands]
+    urls = [f"http://127.0.0.1:{port}/api/v1/products/"
+            for _, port in commands]
+    try:
+        for url in urls:
+            wait_until_up(url, token)
+        cold_start = time.perf_counter() - started
+        for i in range(requests):
+            get(urls[i % len(urls)], token)
+        parents = [process.pid for process in processes]
+        forked = [child for pid in parents for child in children(pid)]
+        samples = {pid: memory(pid) for pid in parents + forked}
+    finally:
+        for process in processes:
+            process.terminate()
+            process.wait()
+    serving = [samples[pid] for pid in forked or parents]
+    return cold_start, {
+        "pss": sum(sample["pss"] for sample in samples.values()) / workers,
+        "rss": statistics.median(sample["rss"] for sample in serving),
+        "private": statistics.median(sample["private"]
+                                     for sample in serving),
+    }
+
+
+def main(workers=4, requests=400):
+    setup_django(migrate=True)
+
+    from apps.accounts.choices import UserRole
+    from apps.accounts.models import User
+    from apps.accounts.services import generate_jwt_token
+    from apps.products.models import Product
+
+    seller = User.objects.create_user(username="seller", password="x",
+                                      role=UserRole.SELLER)
+    Product.objects.bulk_create(
+        Product(name=f"Product {i}", cost=5, amount_available=10,
+                seller=seller)
+        for i in range(50)
+    )
+    token, _ = generate_jwt_token(seller)
+    os.environ["BACKGROUND_JOBS_AUTOSTART"] = "false"
+
+    print(f"{workers} workers, {requests} requests, MB")
+    port = free_port()
+    serve = [sys.executable, "manage.py", "serve", f"--workers={workers}",
+             f"--bind=127.0.0.1:{port}"]
+    ports = [free_port() for _ in range(workers)]
+    modes = {
+        "serve": [(serve, port)],
+        "serve --no-freeze": [(serve + ["--no-freeze"], port)],
+        "separate processes": [
+            ([sys.executable, "-c", SEPARATE, str(p)], p) for p in ports
+        ],
+    }
+    for name, commands in modes.items():
+        cold_start, mem = measure(commands, workers, requests, token)
+        print(f"{name:>20}: cold start {cold_start * 1000:5.0f} ms, "
+              f"PSS/worker {mem['pss']:5.1f}, worker RSS {mem['rss']:5.1f}, "
+              f"private {mem['private']:5.1f}")
+
+
+if __name__ == "__main__":
+    main(*map(int, sys.argv[1:3]))
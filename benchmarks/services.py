@@ -0,0 +1,184 @@
+"""
+Runs the hot service-layer calls one at a time against a seeded in-memory
+database and reports ops/s and memory allocated per call. Results are
+written to benchmark-results/services.json; with a baseline saved on the
+same machine, calls that got slower or allocate more than ``--threshold``
+are flagged and the exit status is 1.
+
+    python -m benchmarks.services [--save-baseline] [--threshold 0.15]
+                                  [--only buy_product ...]
+"""
+import argparse
+import json
+import os
+import platform
+import sys
+import timeit
+import tracemalloc
+from types import SimpleNamespace
+
+from benchmarks.utils import setup_django
+
+
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.dirname(
+    os.path.abspath(__file__))), "benchmark-results")
+RESULTS_PATH = os.path.join(RESULTS_DIR, "services.json")
+BASELINE_PATH = os.path.join(RESULTS_DIR, "services.baseline.json")
+
+
+def seed():
+    from apps.accounts.choices import UserRole
+    from apps.accounts.models import User
+    from apps.products.models import Product
+
+    sellers = [
+        User.objects.create_user(username=f"seller{i}", password="x",
+                                 role=UserRole.SELLER)
+        for i in range(10)
+    ]
+    buyer = User.objects.create_user(username="buyer", password="x",
+                                     role=UserRole.BUYER)
+    Product.objects.bulk_create(
+        Product(name=f"Product {i}", cost=5 * (i % 20 + 1),
+                amount_available=100 + i, seller=sellers[i % len(sellers)])
+        for i in range(1000)
+    )
+    # Enough stock and money that no buy in the run fails.
+    product = Product.objects.create(name="Hot product", cost=5,
+                                     amount_available=10 ** 9,
+                                     seller=sellers[0])
+    buyer.deposit = 10 ** 12
+    buyer.save()
+    return buyer, product
+
+
+def cases(buyer, product) -> dict:
+    from apps.accounts.authentication import JWTAuthentication
+    from apps.accounts.services import deposit_amount, generate_jwt_token
+    from apps.products.models import Product
+    from apps.products.services import buy_product, validate_buy
+    from apps.products.views import BuyProductViewSet, ProductViewSet
+
+    token, _ = generate_jwt_token(buyer)
+    request = SimpleNamespace(META={"HTTP_AUTHORIZATION": f"Bearer {token}"})
+    authentication = JWTAuthentication()
+    page = list(Product.objects.order_by("id")[:10])
+
+    return {
+        "validate_buy": lambda: validate_buy(product=product, amount=1,
+                                             buyer=buyer),
+        "buy_product": lambda: buy_product(product_id=product,
+                                           amount_products=1, buyer=buyer),
+        "deposit_amount": lambda: deposit_amount(amount=5, buyer=buyer),
+        "generate_jwt_token": lambda: generate_jwt_token(buyer),
+        "JWTAuthentication.authenticate":
+            lambda: authentication.authenticate(request),
+        "product list serializer":
+            lambda: ProductViewSet.ListOutputSerializer(page, many=True).data,
+        "product retrieve serializer":
+            lambda: ProductViewSet.RetrieveOutputSerializer(product).data,
+        "buy input validation": lambda: BuyProductViewSet.validate_input(
+            {"product_id": product.pk, "amount_products": 1}
+        ),
+    }
+
+
+def measure(func, *, repeat=5, samples=200) -> dict:
+    """
+    Times ``func`` in ``repeat`` runs of about 0.2 s each and keeps the
+    fastest, then runs it ``samples`` more times under tracemalloc for the
+    memory it allocates at its peak and still holds afterwards.
+    """
+    for _ in range(100):
+        func()
+    timer = timeit.Timer(func)
+    number, _ = timer.autorange()
+    best = min(timer.repeat(repeat=repeat, number=number)) / number
+
+    tracemalloc.start()
+    peak = 0
+    start, _ = tracemalloc.get_traced_memory()
+    for _ in range(samples):
+        current, _ = tracemalloc.get_traced_memory()
+        tracemalloc.reset_peak()
+        func()
+        peak += tracemalloc.get_traced_memory()[1] - current
+    retained = tracemalloc.get_traced_memory()[0] - start
+    tracemalloc.stop()
+
+    return {
+        "ops_per_sec": 1 / best,
+        "peak_bytes": peak / samples,
+        "retained_bytes": retained / samples,
+    }
+
+
+def compare(result: dict, baseline: dict, threshold: float) -> list:
+    regressions = []
+    if result["ops_per_sec"] < baseline["ops_per_sec"] * (1 - threshold):
+        regressions.append(
+            f"{1 - result['ops_per_sec'] / baseline['ops_per_sec']:.0%} "
+            f"slower"
+        )
+    # A few bytes either way are noise, not a regression.
+    if result["peak_bytes"] > baseline["peak_bytes"] * (1 + threshold) + 64:
+        regressions.append(
+            f"{result['peak_bytes'] / baseline['peak_bytes'] - 1:.0%} "
+            f"more memory"
+        )
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--only", nargs="+", metavar="NAME",
+                        help="Run only these benchmarks.")
+    parser.add_argument("--threshold", type=float, default=0.15,
+                        help="Relative change flagged as a regression.")
+    parser.add_argument("--save-baseline", action="store_true",
+                        help="Store this run as the baseline.")
+    options = parser.parse_args(argv)
+
+    setup_django(migrate=True, in_memory=True)
+    from django.conf import settings
+    # Query logging would show up as memory retained by every call.
+    settings.DEBUG = False
+    benchmarks = cases(*seed())
+    if options.only:
+        benchmarks = {name: func for name, func in benchmarks.items()
+                      if name in options.only}
+
+    baseline = {}
+    if os.path.exists(BASELINE_PATH) and not options.save_baseline:
+        with open(BASELINE_PATH) as f:
+            baseline = json.load(f)["results"]
+
+    results, regressed = {}, False
+    for name, func in benchmarks.items():
+        result = results[name] = measure(func)
+        line = (f"{name:>30}: {result['ops_per_sec']:>10,.0f} ops/s "
+                f"{result['peak_bytes'] / 1024:8.1f} KiB peak "
+                f"{result['retained_bytes']:8.0f} B retained")
+        if name in baseline:
+            regressions = compare(result, baseline[name], options.threshold)
+            if regressions:
+                regressed = True
+                line += "  REGRESSION: " + ", ".join(regressions)
+        print(line)
+
+    run = {
+        "python": platform.python_version(),
+        "machine": platform.node(),
+        "results": results,
+    }
+    os.makedirs(RESULTS_DIR, exist_ok=True)
+    paths = [RESULTS_PATH] + [BASELINE_PATH] * options.save_baseline
+    for path in paths:
+        with open(path, "w") as f:
+            json.dump(run, f, indent=2)
+    print(f"Results written to {', '.join(paths)}")
+    return 1 if regressed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,70 @@
+"""
+Measures worker cold start: ``import config.wsgi`` and the first request,
+each in a fresh interpreter. ``eager docs`` also imports the docs stack up
+front the way ``include_docs_urls`` used to. Also compares building the
+docs schema by introspection with loading the build time artifact.
+
+    python -m benchmarks.startup [runs]
+"""
+import json
+import statistics
+import subprocess
+import sys
+import tempfile
+
+from benchmarks.utils import report, setup_django
+
+
+SCRIPT = """
+import json, sys, time
+from wsgiref.util import setup_testing_defaults
+start = time.perf_counter()
+import config.wsgi
+if {eager_docs}:
+    import rest_framework.documentation
+imported = time.perf_counter()
+environ = {{"PATH_INFO": "/api/v1/products/", "REQUEST_METHOD": "GET"}}
+setup_testing_defaults(environ)
+b"".join(config.wsgi.application(environ, lambda *args: None))
+done = time.perf_counter()
+print(json.dumps([imported - start, done - imported]))
+"""
+
+
+def measure(runs, eager_docs):
+    samples = [
+        json.loads(subprocess.check_output(
+            [sys.executable, "-c", SCRIPT.format(eager_docs=eager_docs)],
+            stderr=subprocess.DEVNULL
+        ))
+        for _ in range(runs)
+    ]
+    return [statistics.median(column) * 1000 for column in zip(*samples)]
+
+
+def main(runs=10):
+    for name, eager_docs in (("eager docs", True), ("lazy docs", False)):
+        imported, first_request = measure(runs, eager_docs)
+        print(f"{name:>12}: import config.wsgi {imported:7.1f} ms, "
+              f"first request {first_request:7.1f} ms, "
+              f"total {imported + first_request:7.1f} ms")
+
+    setup_django()
+
+    from django.conf import settings
+    from django.core.management import call_command
+    from rest_framework.schemas.coreapi import SchemaGenerator
+
+    from apps.core.docs import load_schema
+
+    with tempfile.NamedTemporaryFile(suffix=".corejson") as artifact:
+        settings.API_SCHEMA = {**settings.API_SCHEMA, "path": artifact.name}
+        call_command("generate_api_schema", verbosity=0)
+        report("introspected schema", lambda: SchemaGenerator(
+            title="MVP API project"
+        ).get_schema(public=True), runs * 10, warmup=1)
+        report("precomputed schema", load_schema, runs * 10, warmup=1)
+
+
+if __name__ == "__main__":
+    main(*map(int, sys.argv[1:2]))
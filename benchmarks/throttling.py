@@ -0,0 +1,32 @@
+"""
+Measures the latency the token bucket throttle adds to a request.
+
+    python -m benchmarks.throttling [iterations]
+"""
+import itertools
+import os
+import sys
+import tempfile
+
+from benchmarks.utils import report, setup_django
+
+
+def main(iterations=20000):
+    setup_django()
+
+    from apps.core.throttling import TokenBucketStore
+
+    with tempfile.TemporaryDirectory() as tmp:
+        store = TokenBucketStore(os.path.join(tmp, "throttle.sqlite3"))
+        keys = itertools.cycle([f"buy.user:{i}" for i in range(1000)])
+
+        report("hot key",
+               lambda: store.consume("buy.user:0", 10 ** 9, 10 ** 9),
+               iterations)
+        report("1000 keys",
+               lambda: store.consume(next(keys), 10 ** 9, 10 ** 9),
+               iterations)
+
+
+if __name__ == "__main__":
+    main(*map(int, sys.argv[1:2]))
@@ -0,0 +1,42 @@
+import os
+import tempfile
+import timeit
+
+
+def setup_django(*, migrate=False, in_memory=False):
+    """
+    Configures Django for a benchmark run. With ``migrate`` the schema is
+    created in a throwaway SQLite file so the real database is never used,
+    or with ``in_memory`` as well in an in-memory database, which keeps
+    disk I/O out of the numbers.
+    """
+    os.environ.setdefault("DJANGO_SETTINGS_MODULE", "config.settings")
+    if migrate:
+        tmp = tempfile.mkdtemp(prefix="bench-")
+        os.environ["SQLITE_BD_NAME"] = os.path.join(tmp, "db.sqlite3")
+        os.environ["THROTTLE_DB_NAME"] = os.path.join(tmp, "throttle.sqlite3")
+        os.environ["JOBS_DB_NAME"] = os.path.join(tmp, "jobs.sqlite3")
+        os.environ["INVALIDATION_DB_NAME"] = os.path.join(
+            tmp, "invalidation.sqlite3"
+        )
+
+    import django
+    django.setup()
+
+    if migrate and in_memory:
+        # Before the first connection is made
+        from django.conf import settings
+        settings.DATABASES["default"]["NAME"] = ":memory:"
+
+    if migrate:
+        from django.core.management import call_command
+        call_command("migrate", verbosity=0)
+
+
+def report(name, func, iterations, warmup=100):
+    for _ in range(warmup):
+        func()
+    seconds = timeit.timeit(func, number=iterations)
+    print(f"{name:>28}: {seconds / iterations * 1e6:9.1f} us/op "
+          f"({iterations / seconds:,.0f} ops/s)")
+    return seconds / iterations
@@ -0,0 +1,44 @@
+"""
+Compares DRF serializers with the compiled validators on the /deposit and
+/buy request bodies.
+
+    python -m benchmarks.validation [iterations]
+"""
+import sys
+
+from benchmarks.utils import report, setup_django
+
+
+def main(iterations=20000):
+    setup_django(migrate=True)
+
+    from apps.accounts.choices import UserRole
+    from apps.accounts.models import User
+    from apps.accounts.views import DepositViewsSet
+    from apps.products.models import Product
+    from apps.products.views import BuyProductViewSet
+
+    seller = User.objects.create_user(username="seller", password="x",
+                                      role=UserRole.SELLER)
+    product = Product.objects.create(name="Product 0", cost=5,
+                                     amount_available=10, seller=seller)
+    payloads = {
+        "deposit": (DepositViewsSet, {"amount": 50}),
+        "buy": (BuyProductViewSet, {"product_id": product.pk,
+                                    "amount_products": 2}),
+    }
+
+    for name, (view, data) in payloads.items():
+        print(name)
+
+        def serializer():
+            serializer = view.InputSerializer(data=data)
+            serializer.is_valid(raise_exception=True)
+            return serializer.validated_data
+
+        report("serializer", serializer, iterations)
+        report("compiled", lambda: view.validate_input(data), iterations)
+
+
+if __name__ == "__main__":
+    main(*map(int, sys.argv[1:2]))
@@ -14,3 +14,18 @@ from django.core.asgi import get_asgi_application
 os.environ.setdefault("DJANGO_SETTINGS_MODULE", "config.settings")
 
 application = get_asgi_application()
+
+from django.conf import settings  # noqa: E402
+
+if settings.LEAN_API["enabled"]:
+    from apps.core.lean import LeanASGIDispatcher  # noqa: E402
+
+    application = LeanASGIDispatcher(application)
+
+from apps.products.streaming import ProductStreamApplication  # noqa: E402
+
+application = ProductStreamApplication(application)
+
+from apps.accounts.streaming import CoinStreamApplication  # noqa: E402
+
+application = CoinStreamApplication(application)
@@ -46,12 +46,14 @@ INSTALLED_APPS = [
     # Third Party dependencies
     'rest_framework',
     # Project Dependencies
+    "apps.core",
     "apps.accounts",
     "apps.products"
 ]
 
 MIDDLEWARE = [
     "django.middleware.security.SecurityMiddleware",
+    "apps.core.profiling.ProfilingMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
     "django.middleware.csrf.CsrfViewMiddleware",
@@ -80,6 +82,15 @@ TEMPLATES = [
 
 WSGI_APPLICATION = "config.wsgi.application"
 
+# `manage.py serve`: the application is imported once by the master and
+# shared copy-on-write by the forked workers.
+SERVE = {
+    "bind": env.str("SERVE_BIND", default="127.0.0.1:8000"),
+    "workers": env.int("WEB_WORKERS", default=os.cpu_count() or 1),
+    # Seconds workers get to finish in-flight requests on stop or reload
+    "graceful_timeout": 30,
+}
+
 
 # Database
 # https://docs.djangoproject.com/en/4.0/ref/settings/#databases
@@ -96,6 +107,25 @@ DATABASES = {
 # Password validation
 # https://docs.djangoproject.com/en/4.0/ref/settings/#auth-password-validators
 
+# Django's default list, with PBKDF2 run in a process pool (same algorithm
+# and encoding, so stored hashes are unaffected).
+PASSWORD_HASHERS = [
+    "apps.accounts.hashers.PooledPBKDF2PasswordHasher",
+    "django.contrib.auth.hashers.PBKDF2SHA1PasswordHasher",
+    "django.contrib.auth.hashers.Argon2PasswordHasher",
+    "django.contrib.auth.hashers.BCryptSHA256PasswordHasher",
+    "django.contrib.auth.hashers.ScryptPasswordHasher",
+]
+
+# Hashing pool per worker process. "workers": 0 hashes inline. At most
+# "max_pending" hashes wait or run at once; a caller waiting longer than
+# "timeout" seconds gets a 503.
+PASSWORD_HASHING = {
+    "workers": env.int("PASSWORD_HASHING_WORKERS", default=2),
+    "max_pending": env.int("PASSWORD_HASHING_MAX_PENDING", default=64),
+    "timeout": 5,
+}
+
 AUTH_PASSWORD_VALIDATORS = [
     {
         "NAME": "django.contrib.auth.password_validation.UserAttributeSimilarityValidator",
@@ -136,8 +166,15 @@ DEFAULT_AUTO_FIELD = "django.db.models.BigAutoField"
 
 REST_FRAMEWORK = {
     "DEFAULT_RENDERER_CLASSES": (
-        "rest_framework.renderers.JSONRenderer",
+        "apps.core.renderers.FastJSONRenderer",
         "rest_framework.renderers.BrowsableAPIRenderer",
+        "apps.core.renderers.MessagePackRenderer",
+    ),
+    "DEFAULT_PARSER_CLASSES": (
+        "apps.core.parsers.FastJSONParser",
+        "apps.core.parsers.MessagePackParser",
+        "rest_framework.parsers.FormParser",
+        "rest_framework.parsers.MultiPartParser",
     ),
     "DEFAULT_PERMISSION_CLASSES": (
         "rest_framework.permissions.IsAuthenticated",
@@ -148,10 +185,180 @@ REST_FRAMEWORK = {
         "rest_framework.pagination.PageNumberPagination"),
     "PAGE_SIZE": 10,
     "DEFAULT_AUTHENTICATION_CLASSES": [
+        "apps.core.authentication.BatchAuthentication",
         "apps.accounts.authentication.JWTAuthentication",
         "rest_framework.authentication.SessionAuthentication",
         "rest_framework.authentication.BasicAuthentication",
     ],
+    # Token buckets: "<capacity>/<refill period>", keyed "<scope>.<kind>"
+    "DEFAULT_THROTTLE_RATES": {
+        "login.user": "5/min",
+        "login.ip": "30/min",
+        "deposit.user": "60/min",
+        "deposit.ip": "300/min",
+        "buy.user": "60/min",
+        "buy.ip": "300/min",
+    },
+    # Proxies in front of the app; X-Forwarded-For is ignored while unset
+    "NUM_PROXIES": env.int("NUM_PROXIES", default=None),
+}
+
+# POST /api/v1/batch/ runs up to "max_requests" API calls in one request.
+BATCH_REQUESTS = {
+    "max_requests": 20,
+}
+
+# Built by "manage.py generate_api_schema" and served by the docs view.
+API_SCHEMA = {
+    "title": "MVP API project",
+    "path": BASE_DIR / "config" / "schema.corejson",
+}
+
+# API-only profile: bearer token requests under "prefix" skip the session,
+# CSRF, messages and clickjacking middleware and only use JWT auth.
+LEAN_API = {
+    "enabled": env.bool("LEAN_API", default=False),
+    "prefix": "/api/lean/v1/",
+    "urlconf": "config.urls_lean",
+    "middleware": [
+        "django.middleware.security.SecurityMiddleware",
+        "apps.core.profiling.ProfilingMiddleware",
+        "apps.core.lean.LeanURLConfMiddleware",
+    ],
+}
+
+# Product stock/price push channel, served by config/asgi.py only.
+PRODUCT_STREAM = {
+    "path": "/api/v1/products/stream",
+    # Products a client may have pending before it is told to resync
+    "max_pending": 1000,
+    # Seconds between keep-alives on an idle stream
+    "heartbeat": 15,
+}
+
+# Coin insertion channel for machines, served by config/asgi.py only. Coins
+# are added to the deposit in batches of the ones that arrive within
+# "window" seconds, at most "max_batch" per batch.
+COIN_STREAM = {
+    "path": "/api/v1/deposit/stream",
+    "window": 0.05,
+    "max_batch": 50,
+}
+
+# Request profiling. When enabled, requests with a signed X-Profile header
+# (`manage.py profile_token <name>`) and "sample_rate" of all traffic are
+# sampled every "interval" seconds; `manage.py profile_report` merges the
+# results per endpoint.
+PROFILING = {
+    "enabled": env.bool("PROFILING", default=False),
+    "sample_rate": env.float("PROFILING_SAMPLE_RATE", default=0.0),
+    "interval": 0.005,
+    "directory": BASE_DIR / env.str("PROFILING_DIR", default="profiles"),
+    "token_max_age": 3600,
+}
+
+# Memory-mapped product snapshot shared by all workers on a host. Build it
+# with `manage.py build_catalog_snapshot`; writes keep it current after that.
+CATALOG_SNAPSHOT = {
+    "enabled": env.bool("CATALOG_SNAPSHOT", default=False),
+    "path": BASE_DIR / env.str("CATALOG_SNAPSHOT_PATH",
+                               default="catalog.snapshot"),
+}
+
+# GET /api/v1/products/changes/?since=<seq>. Entries every client has
+# synced past are removed by `manage.py compact_change_feed`; clients that
+# have not synced for "client_retention" no longer hold that back.
+CHANGE_FEED = {
+    "page_size": 500,
+    "client_retention": datetime.timedelta(days=7),
+}
+
+# Sellers removed with delete_seller() are deactivated at once and their
+# products deleted in the background, "batch_size" per transaction.
+SELLER_DELETION = {
+    "batch_size": 500,
+}
+
+# Best sellers, served from memory by each worker. Boards hold the top
+# "size" products and are reloaded from the database every "refresh"
+# seconds to pick up sales made by other workers.
+LEADERBOARD = {
+    "size": env.int("LEADERBOARD_SIZE", default=10),
+    "refresh": env.float("LEADERBOARD_REFRESH", default=30.0),
+    "max_sellers": 1000,
+}
+
+# Opt-in group commit for purchases: concurrent buys are applied in batches
+# of up to "max_batch", one transaction each, waiting at most "window"
+# seconds for a batch to fill.
+PURCHASE_ENGINE = {
+    "enabled": env.bool("PURCHASE_ENGINE", default=False),
+    "window": env.float("PURCHASE_ENGINE_WINDOW", default=0.002),
+    "max_batch": 256,
+    # Seconds a purchase may wait for its batch before failing with a 503
+    "timeout": env.float("PURCHASE_ENGINE_TIMEOUT", default=5.0),
+}
+
+# Event-day backend for purchases and deposits: stock and deposits live in
+# memory in one owner process (`manage.py run_inventory_engine`), journaled
+# to "journal_dir" and written back to the tables every
+# "checkpoint_interval" seconds. While enabled the engine owns
+# Product.amount_available and User.deposit.
+INVENTORY_ENGINE = {
+    "enabled": env.bool("INVENTORY_ENGINE", default=False),
+    "socket": BASE_DIR / env.str("INVENTORY_SOCKET", default="inventory.sock"),
+    "journal_dir": BASE_DIR / env.str("INVENTORY_JOURNAL_DIR",
+                                      default="inventory-journal"),
+    "checkpoint_interval": 5,
+}
+
+# In-process executor for side work that must not delay responses. Jobs are
+# queued in a local SQLite file and run after the request's transaction
+# commits; see apps/core/jobs.py.
+BACKGROUND_JOBS = {
+    "NAME": BASE_DIR / env.str("JOBS_DB_NAME", default="jobs.sqlite3"),
+    "workers": env.int("BACKGROUND_JOB_WORKERS", default=4),
+    "max_attempts": 5,
+    # Seconds before the first retry; doubles with every attempt
+    "backoff": 2,
+    "max_backoff": 300,
+    # Seconds a claimed job is hidden from other workers. A job still
+    # running when its lease runs out may be started again.
+    "lease": 300,
+    # Seconds to wait for running jobs when the process exits
+    "shutdown_timeout": 10,
+    # Start the pool on first use; tests run jobs with run_pending() instead
+    "autostart": env.bool("BACKGROUND_JOBS_AUTOSTART", default=True),
+}
+
+# Keeps in-process caches of users and products in step across workers:
+# committed writes publish the keys they change to a local SQLite file, and
+# each worker applies them before serving from its cache if it last looked
+# more than "poll_interval" seconds ago. `manage.py cache_stats` shows hit
+# rates and staleness.
+INVALIDATION_BUS = {
+    "NAME": BASE_DIR / env.str("INVALIDATION_DB_NAME",
+                               default="invalidation.sqlite3"),
+    "poll_interval": 0.5,
+    # Seconds invalidations and worker statistics are kept
+    "retention": 300,
+    # Seconds between statistics reports of each worker
+    "stats_interval": 10,
+}
+
+# Per-worker cache of product rows for purchases when there is no catalog
+# snapshot, kept current by the invalidation bus.
+PRODUCT_CACHE = {
+    "enabled": env.bool("PRODUCT_CACHE", default=False),
+    "max_size": 10000,
+}
+
+IDEMPOTENCY = {
+    "retention": datetime.timedelta(hours=24),
+}
+
+THROTTLE_STORE = {
+    "NAME": BASE_DIR / env.str("THROTTLE_DB_NAME", default="throttle.sqlite3"),
 }
 
 JWT = {
@@ -1,12 +1,22 @@
 from django.contrib import admin
 from django.urls import include, path
-from rest_framework.documentation import include_docs_urls
+
+from apps.accounts.urls import account_router
+from apps.accounts.views import LoginViewsSet
+from apps.core.batch import BatchView
+from apps.core.docs import include_lazy_docs_urls
+from apps.products.urls import products_router
 
 
 urlpatterns = [
     path("admin/", admin.site.urls),
+    path("api/v1/batch/", BatchView.as_view(
+        routers=[account_router, products_router],
+        login_viewset=LoginViewsSet
+    ), name="batch"),
     path("api/v1/", include("apps.accounts.urls")),
     path("api/v1/", include("apps.products.urls")),
     path("api/v1/auth/", include('rest_framework.urls')),
-    path("", include_docs_urls(title='MVP API project'))
+    path("", include("config.urls_lean")),
+    path("", include_lazy_docs_urls())
 ]
@@ -0,0 +1,12 @@
+from django.conf import settings
+from django.urls import include, path
+
+from apps.accounts.urls import account_router
+from apps.core.lean import lean_router
+from apps.products.urls import products_router
+
+
+urlpatterns = [
+    path(settings.LEAN_API["prefix"].lstrip("/"),
+         include(lean_router(account_router, products_router).urls)),
+]
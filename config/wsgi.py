@@ -14,3 +14,10 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault("DJANGO_SETTINGS_MODULE", "config.settings")
 
 application = get_wsgi_application()
+
+from django.conf import settings  # noqa: E402
+
+if settings.LEAN_API["enabled"]:
+    from apps.core.lean import LeanWSGIDispatcher  # noqa: E402
+
+    application = LeanWSGIDispatcher(application)